@@ -0,0 +1,34 @@
+"""Replacing files without ever exposing them half-written."""
+
+
+import os
+import tempfile
+from contextlib import suppress as suppress_exceptions
+from pathlib import Path
+
+
+def write_file_atomically(
+        file_path: Path,
+        file_data: bytes,
+        temp_suffix: str = '',
+) -> None:
+    """Write a temporary file next to the target and move it in place.
+
+    The concurrent builds and parallel readers see either the previous
+    contents or the new ones. The parent dirs are created as needed and
+    the temporary file is removed when the write fails.
+    """
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    temp_fd, temp_path = tempfile.mkstemp(
+        prefix=f'.{file_path.name!s}.',
+        suffix=temp_suffix,
+        dir=file_path.parent,
+    )
+    try:
+        with os.fdopen(temp_fd, 'wb') as temp_file:
+            temp_file.write(file_data)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        with suppress_exceptions(OSError):
+            os.unlink(temp_path)
+        raise
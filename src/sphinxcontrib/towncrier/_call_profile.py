@@ -0,0 +1,139 @@
+"""Opt-in :mod:`cProfile` capture of the extension's own work.
+
+Each profiled piece of work is labeled, like with the name of the
+document a directive is in. The calls under the same label in one
+process are accumulated into a single profile that's written out as
+``<label>.<pid>.pstats`` so that the parallel readers don't overwrite
+each other's profiles. At the end of the build, all of them are merged
+into one more file.
+"""
+
+
+import cProfile
+import os
+import pstats
+import re
+import threading
+from contextlib import contextmanager
+from contextlib import suppress as suppress_exceptions
+from functools import wraps
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional, TypeVar
+
+
+PROFILE_FILE_SUFFIX = '.pstats'
+MERGED_PROFILE_FILE_NAME = f'merged{PROFILE_FILE_SUFFIX!s}'
+
+_UNSAFE_LABEL_CHARS_REGEX = re.compile(r'[^\w.-]+')
+
+_CallableT = TypeVar('_CallableT', bound=Callable[..., Any])
+
+_profiles: Dict[str, cProfile.Profile] = {}
+_profiles_lock = threading.Lock()
+_active_profile = threading.local()
+_profile_dir: Optional[Path] = None
+
+
+def _forget_parent_profiles() -> None:
+    """Make a forked reader only write its own profiles."""
+    _profiles.clear()
+
+
+if hasattr(os, 'register_at_fork'):  # noqa: WPS421
+    os.register_at_fork(after_in_child=_forget_parent_profiles)
+
+
+def get_profile_file_name(label: str, process_id: int) -> str:
+    """Make a file name for the profile of a label in a process."""
+    safe_label = _UNSAFE_LABEL_CHARS_REGEX.sub('_', label).strip('_.')
+    return f'{safe_label or "_"!s}.{process_id:d}{PROFILE_FILE_SUFFIX!s}'
+
+
+def start_call_profiles(profile_dir: Optional[Path]) -> None:
+    """Start profiling into a dir, or stop it for :data:`None`.
+
+    The profiles left in the dir by the previous builds are removed.
+    """
+    global _profile_dir  # noqa: WPS420  # pylint: disable=global-statement
+
+    with _profiles_lock:
+        _profiles.clear()
+    _profile_dir = profile_dir
+    if profile_dir is None:
+        return
+
+    profile_dir.mkdir(parents=True, exist_ok=True)
+    for stale_profile_path in profile_dir.glob(f'*{PROFILE_FILE_SUFFIX!s}'):
+        with suppress_exceptions(OSError):
+            stale_profile_path.unlink()
+
+
+@contextmanager
+def profile_calls(label: str) -> Iterator[None]:
+    """Profile the block under a label, if profiling is enabled.
+
+    The work done while another block is being profiled in the same
+    thread ends up in that outer profile. The profile of the label is
+    written out again each time, for the forked readers that exit
+    without a notice.
+    """
+    profile_dir = _profile_dir
+    if profile_dir is None or getattr(_active_profile, 'label', None):
+        yield
+        return
+
+    with _profiles_lock:
+        profile = _profiles.setdefault(label, cProfile.Profile())
+    try:
+        profile.enable()
+    except ValueError:
+        # Another profiler is active already
+        yield
+        return
+
+    _active_profile.label = label
+    try:
+        yield
+    finally:
+        profile.disable()
+        _active_profile.label = None
+        with suppress_exceptions(OSError):
+            profile.dump_stats(
+                profile_dir / get_profile_file_name(label, os.getpid()),
+            )
+
+
+def profiled(label: str) -> Callable[[_CallableT], _CallableT]:
+    """Profile every call of a function under a fixed label."""
+    def _decorate(profiled_function: _CallableT) -> _CallableT:
+        @wraps(profiled_function)
+        def _profiled_function(*args: Any, **kwargs: Any) -> Any:
+            with profile_calls(label):
+                return profiled_function(*args, **kwargs)
+
+        return _profiled_function  # type: ignore[return-value]
+
+    return _decorate
+
+
+def merge_call_profiles() -> Optional[Path]:
+    """Combine the profiles written during the build into one file.
+
+    :returns: The merged profile path or :data:`None` if profiling is
+        off or nothing has been profiled.
+    """
+    profile_dir = _profile_dir
+    if profile_dir is None:
+        return None
+
+    profile_paths = sorted(
+        str(profile_path)
+        for profile_path in profile_dir.glob(f'*{PROFILE_FILE_SUFFIX!s}')
+        if profile_path.name != MERGED_PROFILE_FILE_NAME
+    )
+    if not profile_paths:
+        return None
+
+    merged_profile_path = profile_dir / MERGED_PROFILE_FILE_NAME
+    pstats.Stats(*profile_paths).dump_stats(merged_profile_path)
+    return merged_profile_path
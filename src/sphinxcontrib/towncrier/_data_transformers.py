@@ -1,6 +1,16 @@
 """Data transformation helpers."""
 
 
+import re
+from typing import Iterator
+
+
+# The same line boundaries that ``str.splitlines()`` recognizes
+LINE_BOUNDARY_REGEX = re.compile(
+    '\r\n|[\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029]',
+)
+
+
 def escape_project_version_rst_substitution(version: str) -> str:
     """Prepend an escaped whitespace before RST substitution."""
     if not version.startswith('|') or version.count('|') <= 1:
@@ -15,3 +25,20 @@ def escape_project_version_rst_substitution(version: str) -> str:
     # the substitution gets processed properly so the result would
     # be something like `v1.0` as expected.
     return rf'\ {version}'
+
+
+def iter_markup_lines(markup_source: str, tab_width: int = 8) -> Iterator[str]:
+    """Split the markup into lines the way docutils' ``string2lines`` does.
+
+    Unlike ``string2lines``, this doesn't make an intermediate list of
+    the raw lines so a large draft is only held once while being fed to
+    the parser.
+    """
+    line_start = 0
+    for line_boundary in LINE_BOUNDARY_REGEX.finditer(markup_source):
+        yield markup_source[
+            line_start:line_boundary.start()
+        ].expandtabs(tab_width).rstrip()
+        line_start = line_boundary.end()
+    if line_start < len(markup_source):
+        yield markup_source[line_start:].expandtabs(tab_width).rstrip()
@@ -0,0 +1,213 @@
+"""Pickled draft node trees reused between builds.
+
+Running the RST parser over a large rendered draft is what re-reading
+a document showing it mostly costs. When the draft text is the same as
+in one of the previous builds, the nodes parsed back then are unpickled
+instead. The document-wide state that the parser would have set up,
+like the section and hyperlink targets and the named references, is
+then registered with the new document.
+"""
+
+
+import pickle  # noqa: S403
+from typing import Iterator, List, Optional, Tuple
+
+from docutils import nodes
+
+from ._draft_nodes import adopt_for_document  # noqa: WPS436
+
+
+DOCTREE_CACHE_DIR_NAME = 'towncrier-draft-doctrees'
+DOCTREE_CACHE_FORMAT_VERSION = 2  # bumped on the pickle layout changes
+RELEASE_DOCTREE_CACHE_DIR_NAME = 'towncrier-release-doctrees'
+RELEASE_DOCTREE_CACHE_MAX_SIZE = 256 * 1024 * 1024  # bytes
+DUPLICATE_NAME_MSG_LEVEL = 1  # info
+DUPLICATE_NAME_MSG_PREFIXES = (
+    'Duplicate implicit target name',
+    'Duplicate name ',  # same URI under the same name
+)
+
+_UNREUSABLE_NODE_TYPES = (
+    nodes.citation,
+    nodes.citation_reference,
+    nodes.footnote,
+    nodes.footnote_reference,
+    nodes.substitution_definition,
+    nodes.system_message,
+)
+_RENAMEABLE_NODE_TYPES = nodes.section, nodes.target
+
+
+def _is_anonymous_target(node: nodes.Element) -> bool:
+    return isinstance(node, nodes.target) and bool(node.get('anonymous'))
+
+
+def _is_reusable(draft_node: nodes.Node) -> bool:
+    """Check that the parsed nodes hold no state that can't be redone.
+
+    The section titles and the hyperlink targets are the only names
+    that can be registered with another document again.
+    """
+    if not isinstance(draft_node, nodes.Element):
+        return True
+
+    return not any(
+        isinstance(node, _UNREUSABLE_NODE_TYPES)
+        or node['dupnames']
+        or (node['names'] and not isinstance(node, _RENAMEABLE_NODE_TYPES))
+        or (
+            node['ids'] and not node['names']
+            and not _is_anonymous_target(node)
+        )
+        for node in draft_node.findall(nodes.Element)
+    )
+
+
+def _is_duplicate_name_message(node: nodes.Node) -> bool:
+    return (
+        isinstance(node, nodes.system_message)
+        and node['level'] == DUPLICATE_NAME_MSG_LEVEL
+        and nodes.Element.astext(node).startswith(
+            DUPLICATE_NAME_MSG_PREFIXES,
+        )
+    )
+
+
+def _restore_target_names(detached_node: nodes.Node) -> None:
+    """Undo the deduplication of the target names within the document.
+
+    The sections titled the same as others in the document and the
+    links repeating a named URI get their names moved to ``dupnames``
+    and an info message attached. Both are redone when the nodes are
+    registered with a document again.
+    """
+    if not isinstance(detached_node, nodes.Element):
+        return
+
+    for renamed_node in list(detached_node.findall(nodes.Element)):
+        if isinstance(renamed_node, _RENAMEABLE_NODE_TYPES):
+            renamed_node['names'].extend(renamed_node['dupnames'])
+            renamed_node['dupnames'] = []
+        for message in list(renamed_node.children):
+            if _is_duplicate_name_message(message):
+                renamed_node.remove(message)
+
+
+def _list_explicit_targets(
+        draft_nodes: List[nodes.Node],
+) -> Tuple[bool, ...]:
+    """Tell which targets were registered as explicit, in the tree order.
+
+    Depending on the docutils version, the URIs embedded into the
+    references make either implicit or explicit targets. The document
+    remembers which one the parser has noted.
+    """
+    return tuple(
+        any(
+            target.document is not None
+            and target.document.nametypes.get(target_name, False)
+            for target_name in target['names']
+        )
+        for draft_node in draft_nodes
+        if isinstance(draft_node, nodes.Element)
+        for target in draft_node.findall(nodes.target)
+    )
+
+
+def _note_target(
+        document: nodes.document,
+        target: nodes.target,
+        explicit: bool,
+) -> None:
+    """Register a hyperlink target like the RST parser does."""
+    if _is_anonymous_target(target):
+        document.note_anonymous_target(target)
+    elif explicit:
+        document.note_explicit_target(target, target.parent)
+    else:
+        document.note_implicit_target(target, target.parent)
+    if 'refname' in target:
+        document.note_indirect_target(target)
+
+
+def dump_draft_nodes(
+        draft_nodes: List[nodes.Node],
+        line_offset: int = 0,
+) -> Optional[bytes]:
+    """Pickle the parsed nodes detached from their document.
+
+    The line numbers are stored relative to ``line_offset``.
+    :data:`None` is returned for the nodes that cannot be reused.
+    """
+    explicit_targets = _list_explicit_targets(draft_nodes)
+    detached_nodes = [draft_node.deepcopy() for draft_node in draft_nodes]
+    for detached_node in detached_nodes:
+        _restore_target_names(detached_node)
+    if not all(map(_is_reusable, detached_nodes)):
+        return None
+
+    for detached_node in detached_nodes:
+        for node in detached_node.findall():
+            node.document = None
+            if node.line is not None:
+                node.line -= line_offset
+            if isinstance(node, nodes.Element):
+                node['ids'] = []  # assigned anew by the next document
+    return pickle.dumps(
+        (detached_nodes, explicit_targets),
+        protocol=pickle.HIGHEST_PROTOCOL,
+    )
+
+
+def load_draft_nodes(
+        pickled_nodes: bytes,
+        document: nodes.document,
+        docname: str,
+        line_offset: int = 0,
+) -> Optional[List[nodes.Node]]:
+    """Unpickle the parsed nodes and attach them to a document.
+
+    :data:`None` is returned when the pickle is unusable.
+    """
+    try:
+        draft_nodes: List[nodes.Node]
+        explicit_targets: Tuple[bool, ...]
+        draft_nodes, explicit_targets = pickle.loads(  # noqa: S301
+            pickled_nodes,
+        )
+    except (
+            pickle.UnpicklingError, AttributeError, EOFError, ImportError,
+            TypeError, ValueError,
+    ):
+        return None
+
+    explicit_target_flags = iter(explicit_targets)
+    for draft_node in draft_nodes:
+        _attach_to_document(
+            draft_node, document, line_offset, explicit_target_flags,
+        )
+        if isinstance(draft_node, nodes.Element):
+            adopt_for_document(draft_node, docname)
+    return draft_nodes
+
+
+def _attach_to_document(
+        draft_node: nodes.Node,
+        document: nodes.document,
+        line_offset: int,
+        explicit_target_flags: Iterator[bool],
+) -> None:
+    """Register the names and references of the nodes with a document."""
+    # Top-down, for the targets to be registered in the parser order
+    for node in draft_node.findall():
+        node.document = document
+        if node.line is not None:
+            node.line += line_offset
+        if not isinstance(node, nodes.Element):
+            continue
+        if isinstance(node, nodes.section) and node['names']:
+            document.note_implicit_target(node, node)
+        if isinstance(node, nodes.target):
+            _note_target(document, node, next(explicit_target_flags, False))
+        elif 'refname' in node:
+            document.note_refname(node)
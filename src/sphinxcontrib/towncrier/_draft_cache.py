@@ -0,0 +1,145 @@
+"""A host-wide on-disk cache of rendered changelog drafts."""
+
+
+import hashlib
+import os
+import time
+from contextlib import suppress as suppress_exceptions
+from pathlib import Path
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from ._atomic_write import write_file_atomically  # noqa: WPS436
+
+
+DRAFT_CACHE_DIR_NAME = 'sphinxcontrib-towncrier'
+DEFAULT_DRAFT_CACHE_MAX_SIZE = 64 * 1024 * 1024  # bytes
+DEFAULT_DRAFT_CACHE_MAX_AGE = 30 * 24 * 60 * 60  # seconds
+DRAFT_CACHE_TEMP_SUFFIX = '.tmp'
+
+
+def get_default_draft_cache_dir() -> Path:
+    """Locate the per-user cache directory following the XDG spec."""
+    xdg_cache_home = os.environ.get('XDG_CACHE_HOME')
+    cache_home = (
+        Path(xdg_cache_home) if xdg_cache_home
+        else Path.home() / '.cache'
+    )
+    return cache_home / DRAFT_CACHE_DIR_NAME
+
+
+def compute_draft_cache_key(key_parts: Iterable[str]) -> str:
+    """Digest everything a rendered draft depends on into a cache key."""
+    key_hash = hashlib.sha256()
+    for key_part in key_parts:
+        key_hash.update(key_part.encode('utf-8', errors='surrogateescape'))
+        key_hash.update(b'\0')
+    return key_hash.hexdigest()
+
+
+class SharedDraftCache(NamedTuple):
+    """A draft cache directory that many builds can use at once.
+
+    Each entry is a file named after its content digest key. Entries
+    are written to a temporary file and moved in place atomically so
+    concurrent readers never see partial writes. Reading an entry
+    bumps its modification time, which the eviction treats as the last
+    access time. Since the keys are content digests, two builds racing
+    to store the same entry write identical data and either one wins.
+    """
+
+    cache_dir: str
+    max_size: int = DEFAULT_DRAFT_CACHE_MAX_SIZE
+    max_age: int = DEFAULT_DRAFT_CACHE_MAX_AGE
+
+    def _get_entry_path(self, cache_key: str) -> Path:
+        return Path(self.cache_dir) / cache_key[:2] / cache_key
+
+    def get(self, cache_key: str) -> Optional[str]:
+        """Return the cached draft, if any."""
+        entry_bytes = self.get_bytes(cache_key)
+        return None if entry_bytes is None else entry_bytes.decode('utf-8')
+
+    def put(self, cache_key: str, draft_text: str) -> None:
+        """Store a draft and trim the cache down to its limits."""
+        self.put_bytes(cache_key, draft_text.encode('utf-8'))
+
+    def get_bytes(self, cache_key: str) -> Optional[bytes]:
+        """Return the raw cache entry, if any."""
+        entry_path = self._get_entry_path(cache_key)
+        try:
+            entry_bytes = entry_path.read_bytes()
+        except OSError:
+            return None
+
+        with suppress_exceptions(OSError):
+            os.utime(entry_path)  # mark as recently used
+
+        return entry_bytes
+
+    def put_bytes(
+            self,
+            cache_key: str,
+            entry_bytes: bytes,
+            evict: bool = True,
+    ) -> None:
+        """Store a raw cache entry and trim the cache to its limits.
+
+        Storing many entries at once, the trimming can be left for a
+        single :py:meth:`evict` call afterwards.
+        """
+        write_file_atomically(
+            self._get_entry_path(cache_key),
+            entry_bytes,
+            temp_suffix=DRAFT_CACHE_TEMP_SUFFIX,
+        )
+
+        if evict:
+            self.evict()
+
+    def _iter_entry_stats(self) -> Iterator[Tuple[float, int, str]]:
+        """Yield the modification time, size and path of every file."""
+        with suppress_exceptions(OSError), os.scandir(
+                self.cache_dir,
+        ) as shard_dirs:
+            for shard_dir in shard_dirs:
+                if not shard_dir.is_dir(follow_symlinks=False):
+                    continue
+                with suppress_exceptions(OSError), os.scandir(
+                        shard_dir.path,
+                ) as cache_entries:
+                    for cache_entry in cache_entries:
+                        with suppress_exceptions(OSError):
+                            entry_stat = cache_entry.stat(
+                                follow_symlinks=False,
+                            )
+                            yield (
+                                entry_stat.st_mtime,
+                                entry_stat.st_size,
+                                cache_entry.path,
+                            )
+
+    def evict(self) -> None:
+        """Drop the expired entries and then the least recently used.
+
+        Concurrent builds may evict the same entries at the same time,
+        so the files vanishing midway are not treated as errors.
+        """
+        expiry_time = time.time() - self.max_age
+        live_entries: List[Tuple[float, int, str]] = []
+        for entry_mtime, entry_size, entry_path in self._iter_entry_stats():
+            if entry_mtime < expiry_time:
+                with suppress_exceptions(OSError):
+                    os.unlink(entry_path)
+            elif not entry_path.endswith(DRAFT_CACHE_TEMP_SUFFIX):
+                live_entries.append((entry_mtime, entry_size, entry_path))
+
+        total_size = sum(
+            entry_size for _entry_mtime, entry_size, _entry_path in live_entries
+        )
+        live_entries.sort()
+        for _entry_mtime, entry_size, entry_path in live_entries:
+            if total_size <= self.max_size:
+                break
+            with suppress_exceptions(OSError):
+                os.unlink(entry_path)
+            total_size -= entry_size
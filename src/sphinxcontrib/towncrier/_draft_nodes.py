@@ -0,0 +1,269 @@
+"""Docutils node tree construction for changelog drafts.
+
+This mirrors the structure that towncrier's stock RST template renders
+but builds the sections, the bullet lists and the plain paragraphs
+directly. Only the fragment bodies that need it go through the RST
+parser. The parsed entries can also be cached so that an unchanged
+entry is never parsed twice.
+"""
+
+
+import hashlib
+import re
+from collections import OrderedDict
+from typing import Iterator, List, Mapping, Optional, Tuple
+
+from docutils import nodes, statemachine
+from docutils.parsers.rst.states import RSTState
+from sphinx import addnodes
+
+from ._towncrier import DraftEntries  # noqa: WPS436
+
+
+DRAFT_UNIT_CACHE_SIZE = 8192
+DRAFT_MARKUP_SOURCE = '[towncrier-fragments]'
+NO_SIGNIFICANT_CHANGES_TEXT = 'No significant changes.'
+
+ENTRY_CONTINUATION_INDENT = '  '
+# Single lines starting like this are paragraphs of inline markup, as
+# opposed to the block-level constructs like lists, field lists,
+# directives, line blocks or doctests:
+PLAIN_PARAGRAPH_REGEX = re.compile(
+    r'(?![A-Za-z0-9]{1,3}[.)]\s)(?:[^\W_]|["\'`]|\*(?=\S))',
+)
+
+DraftUnitKey = Tuple[str, str, str]
+"""A section name, a change type and an entry markup digest."""
+
+_UNCACHEABLE_NODE_TYPES = (
+    nodes.citation,
+    nodes.footnote,
+    nodes.substitution_definition,
+    nodes.system_message,
+    nodes.target,
+)
+
+
+class DraftUnitCache:
+    """An LRU cache of parsed draft entries.
+
+    Each unit corresponds to one bullet entry of a (section, type)
+    pair. Entries carrying document-global state like targets or
+    parser messages are never cached since reusing them would skip
+    registering that state with the new document.
+    """
+
+    def __init__(self, maxsize: int = DRAFT_UNIT_CACHE_SIZE) -> None:
+        """Initialize an empty cache."""
+        self._maxsize = maxsize
+        self._parsed_units: 'OrderedDict[DraftUnitKey, nodes.list_item]' = (
+            OrderedDict()
+        )
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        """Return the number of cached units."""
+        return len(self._parsed_units)
+
+    def get(self, unit_key: DraftUnitKey) -> Optional[nodes.list_item]:
+        """Return a fresh copy of a cached entry, if any."""
+        try:
+            list_item = self._parsed_units[unit_key]
+        except KeyError:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._parsed_units.move_to_end(unit_key)
+        return list_item.deepcopy()
+
+    def put(self, unit_key: DraftUnitKey, list_item: nodes.list_item) -> None:
+        """Remember a parsed entry unless it's document-specific."""
+        if not _is_cacheable(list_item):
+            return
+
+        self._parsed_units[unit_key] = list_item.deepcopy()
+        self._parsed_units.move_to_end(unit_key)
+        while len(self._parsed_units) > self._maxsize:
+            self._parsed_units.popitem(last=False)
+
+    def update(self, other: 'DraftUnitCache') -> None:
+        """Pull in the entries parsed by another cache instance."""
+        for unit_key, list_item in other._parsed_units.items():  # noqa: WPS437
+            self._parsed_units[unit_key] = list_item
+            self._parsed_units.move_to_end(unit_key)
+        while len(self._parsed_units) > self._maxsize:
+            self._parsed_units.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop all the cached entries and the statistics."""
+        self._parsed_units.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+def _is_cacheable(list_item: nodes.list_item) -> bool:
+    return not any(
+        isinstance(node, _UNCACHEABLE_NODE_TYPES)
+        or node['ids'] or node['names']
+        for node in list_item.findall(nodes.Element)
+    )
+
+
+def render_draft_entry_markup(entry_text: str, issues: List[str]) -> str:
+    """Render a bullet body the way the stock template does."""
+    if not entry_text:
+        return ', '.join(issues)
+    if not issues:
+        return entry_text
+    return f'{entry_text} ({", ".join(issues)})'
+
+
+def _is_plain_paragraph(entry_markup: str) -> bool:
+    """Check if the entry is a single paragraph of inline markup."""
+    return (
+        '\n' not in entry_markup
+        and not entry_markup.endswith('::')
+        and PLAIN_PARAGRAPH_REGEX.match(entry_markup) is not None
+    )
+
+
+def _parse_draft_entry(
+        state: RSTState,
+        entry_markup: str,
+) -> nodes.list_item:
+    """Turn a single bullet body into a list item node.
+
+    Single-line entries only go through the inline markup parser. The
+    others get the block-level parsing, with the bullet continuation
+    indentation that towncrier adds undone.
+    """
+    list_item = nodes.list_item()
+    lineno = state.state_machine.abs_line_number()
+
+    if _is_plain_paragraph(entry_markup):
+        text_nodes, messages = state.inline_text(entry_markup, lineno)
+        paragraph = nodes.paragraph(entry_markup, '', *text_nodes)
+        paragraph.source = DRAFT_MARKUP_SOURCE
+        paragraph.line = lineno
+        list_item += paragraph
+        list_item.extend(messages)
+        return list_item
+
+    first_line, *continuation_lines = statemachine.string2lines(entry_markup)
+    state.nested_parse(
+        statemachine.StringList(
+            [first_line] + [
+                line[len(ENTRY_CONTINUATION_INDENT):]
+                if line.startswith(ENTRY_CONTINUATION_INDENT) else line
+                for line in continuation_lines
+            ],
+            source=DRAFT_MARKUP_SOURCE,
+        ),
+        0,
+        list_item,
+    )
+    return list_item
+
+
+def adopt_for_document(cached_node: nodes.Element, docname: str) -> None:
+    """Point cross-references in a cached node to the current doc."""
+    for pending_xref in cached_node.findall(addnodes.pending_xref):
+        pending_xref['refdoc'] = docname
+
+
+def _new_section(state: RSTState, title_text: str) -> nodes.section:
+    """Create a section node like the RST parser would."""
+    title_nodes, title_messages = state.inline_text(
+        title_text, state.state_machine.abs_line_number(),
+    )
+    title = nodes.title(title_text, '', *title_nodes)
+    section = nodes.section('', title, *title_messages)
+    section['names'].append(nodes.fully_normalize_name(title.astext()))
+    state.document.note_implicit_target(section, section)
+    return section
+
+
+def _digest_entry_markup(entry_markup: str) -> str:
+    return hashlib.sha256(entry_markup.encode('utf-8')).hexdigest()
+
+
+def _iter_category_nodes(
+        state: RSTState,
+        docname: str,
+        section_name: str,
+        section_entries: Mapping[str, List[Tuple[str, List[str]]]],
+        type_titles: Mapping[str, str],
+        unit_cache: Optional[DraftUnitCache],
+) -> Iterator[nodes.Node]:
+    if not section_entries:
+        yield nodes.paragraph(
+            NO_SIGNIFICANT_CHANGES_TEXT, NO_SIGNIFICANT_CHANGES_TEXT,
+        )
+        return
+
+    for category_name, category_entries in section_entries.items():
+        category_section = _new_section(state, type_titles[category_name])
+        bullet_list = nodes.bullet_list(bullet='-')
+        for entry_text, issues in category_entries:
+            entry_markup = render_draft_entry_markup(entry_text, issues)
+            unit_key = (
+                section_name,
+                category_name,
+                _digest_entry_markup(entry_markup),
+            )
+            list_item = (
+                None if unit_cache is None
+                else unit_cache.get(unit_key)
+            )
+            if list_item is None:
+                list_item = _parse_draft_entry(state, entry_markup)
+                if unit_cache is not None:
+                    unit_cache.put(unit_key, list_item)
+            else:
+                adopt_for_document(list_item, docname)
+            bullet_list += list_item
+
+        category_section += bullet_list
+        yield category_section
+
+
+# pylint: disable-next=too-many-arguments,too-many-positional-arguments
+def build_draft_nodes(  # noqa: WPS211
+        state: RSTState,
+        docname: str,
+        draft_title: Optional[str],
+        draft_entries: DraftEntries,
+        type_titles: Mapping[str, str],
+        unit_cache: Optional[DraftUnitCache] = None,
+) -> List[nodes.Node]:
+    """Assemble the draft node tree out of the individual entries."""
+    # The sections are created top-down for their implicit targets to
+    # be registered in the same order as with the RST parser
+    title_section = (
+        None if draft_title is None
+        else _new_section(state, draft_title)
+    )
+    draft_nodes: List[nodes.Node] = []
+    for section_name, section_entries in draft_entries.items():
+        category_nodes = _iter_category_nodes(
+            state,
+            docname,
+            section_name,
+            section_entries,
+            type_titles,
+            unit_cache,
+        )
+        if section_name:
+            section = _new_section(state, section_name)
+            section.extend(category_nodes)
+            draft_nodes.append(section)
+        else:
+            draft_nodes.extend(category_nodes)
+
+    if title_section is None:
+        return draft_nodes
+
+    title_section.extend(draft_nodes)
+    return [title_section]
@@ -0,0 +1,263 @@
+"""Generated sub-pages splitting a huge draft up.
+
+With the ``shard-by`` option, the draft directive becomes a table of
+contents of sub-pages, one per towncrier section or change type. The
+sub-pages are RST sources written next to the document before Sphinx
+looks for the sources. Each of them holds a draft directive showing a
+slice of the draft, so it's read, tracked and written on its own and
+a new change note only gets the sub-page of its slice rebuilt.
+
+With the ``max-entries`` option, the document only shows the newest
+change notes and links a single generated page with the whole draft.
+"""
+
+
+import glob
+import re
+from contextlib import suppress as suppress_exceptions
+from pathlib import Path
+from typing import (
+    Dict, FrozenSet, Iterable, List, Mapping, NamedTuple, Optional,
+)
+
+from sphinx.util import logging
+
+from towncrier._settings.load import Config  # noqa: WPS436
+
+from ._render_scheduler import DraftDirective  # noqa: WPS436
+
+
+logger = logging.getLogger(__name__)
+
+SHARD_OPTION_NAME = 'shard-by'
+SHARD_DIMENSIONS = ('sections', 'types')
+OVERFLOW_OPTION_NAME = 'max-entries'
+OVERFLOW_PAGE_SLUG = 'all'
+GENERATED_PAGE_MARKER = '.. This page is generated by sphinxcontrib-towncrier'
+GENERATED_PAGE_INFIX = '-draft-'
+
+_UNSAFE_PAGE_NAME_CHARS_REGEX = re.compile(r'[^\w-]+')
+
+
+class DraftShard(NamedTuple):
+    """A sub-page showing one section or change type of a draft."""
+
+    name: str
+    title: str
+    page_name: str  # relative to the dir of the document it's split from
+
+    def render_source(
+            self,
+            shard_by: str,
+            directive_argument: Optional[str],
+            directive_options: Mapping[str, str],
+    ) -> str:
+        """Make the RST source of the sub-page.
+
+        The options of the original directive are passed on except for
+        the ones choosing the shards and capping the entries.
+        """
+        return _render_page_source(
+            directive_argument,
+            {
+                **{
+                    option_name: option_value
+                    for option_name, option_value in directive_options.items()
+                    if option_name not in {
+                        SHARD_OPTION_NAME, OVERFLOW_OPTION_NAME, shard_by,
+                    }
+                },
+                shard_by: self.name,
+            },
+        )
+
+
+def _render_page_source(
+        directive_argument: Optional[str],
+        directive_options: Mapping[str, str],
+        orphan: bool = False,
+) -> str:
+    """Make the RST source of a generated page holding a directive."""
+    return '\n'.join((
+        f'{GENERATED_PAGE_MARKER!s}, do not edit.',
+        '',
+        *((':orphan:', '') if orphan else ()),
+        f'.. towncrier-draft-entries:: {directive_argument or ""!s}'
+        .rstrip(),
+        *(
+            f'   :{option_name!s}: {option_value!s}'.rstrip()
+            for option_name, option_value in sorted(directive_options.items())
+        ),
+        '',
+    ))
+
+
+def get_overflow_page_name(parent_name: str) -> str:
+    """Name the page with the whole draft that the document links to."""
+    return f'{parent_name!s}{GENERATED_PAGE_INFIX!s}{OVERFLOW_PAGE_SLUG!s}'
+
+
+def render_overflow_page_source(
+        directive_argument: Optional[str],
+        directive_options: Mapping[str, str],
+) -> str:
+    """Make the RST source of the page with the whole draft.
+
+    It's only linked from the document so it's marked as an orphan.
+    """
+    return _render_page_source(
+        directive_argument,
+        {
+            option_name: option_value
+            for option_name, option_value in directive_options.items()
+            if option_name != OVERFLOW_OPTION_NAME
+        },
+        orphan=True,
+    )
+
+
+def parse_shard_names(option_value: str) -> FrozenSet[str]:
+    """Turn a comma-separated option value into names."""
+    return frozenset(
+        filter(None, (name.strip() for name in option_value.split(','))),
+    )
+
+
+def find_paged_draft_directives(
+        draft_directives: Iterable[DraftDirective],
+) -> List[DraftDirective]:
+    """Collect the draft directives that need pages generated."""
+    return [
+        (directive_argument, directive_options)
+        for directive_argument, directive_options in draft_directives
+        if directive_options.get(SHARD_OPTION_NAME) in SHARD_DIMENSIONS
+        or OVERFLOW_OPTION_NAME in directive_options
+    ]
+
+
+def get_shard_titles(
+        towncrier_config: Config,
+        shard_by: str,
+        selected_names: Optional[FrozenSet[str]] = None,
+) -> Dict[str, str]:
+    """Map the names of the shards to their titles, in config order.
+
+    The unnamed section of the projects without sections can't be
+    selected on its own so it doesn't get a shard.
+    """
+    if shard_by == 'types':
+        shard_titles = {
+            category_name: category_definition['name']
+            for category_name, category_definition
+            in towncrier_config.types.items()
+        }
+    else:
+        shard_titles = {
+            section_name: section_name
+            for section_name in towncrier_config.sections
+            if section_name
+        }
+    return {
+        shard_name: shard_title
+        for shard_name, shard_title in shard_titles.items()
+        if selected_names is None or shard_name in selected_names
+    }
+
+
+def get_draft_shards(
+        parent_name: str,
+        shard_titles: Mapping[str, str],
+) -> List[DraftShard]:
+    """Name the sub-pages of a document after its shards."""
+    draft_shards = []
+    page_names = set()
+    for shard_name, shard_title in shard_titles.items():
+        page_slug = _UNSAFE_PAGE_NAME_CHARS_REGEX.sub(
+            '-', shard_name.lower(),
+        ).strip('-') or 'shard'
+        page_name = f'{parent_name!s}{GENERATED_PAGE_INFIX!s}{page_slug!s}'
+        page_number = 1
+        while page_name in page_names:
+            page_number += 1
+            page_name = (
+                f'{parent_name!s}{GENERATED_PAGE_INFIX!s}'
+                f'{page_slug!s}-{page_number:d}'
+            )
+        page_names.add(page_name)
+        draft_shards.append(DraftShard(shard_name, shard_title, page_name))
+    return draft_shards
+
+
+def render_shard_toctree(draft_shards: List[DraftShard]) -> str:
+    """Make the table of contents linking the sub-pages."""
+    return '\n'.join((
+        '.. toctree::',
+        '',
+        *(
+            f'   {draft_shard.title!s} <{draft_shard.page_name!s}>'
+            for draft_shard in draft_shards
+        ),
+        '',
+    ))
+
+
+def _is_generated_page(page_path: Path) -> bool:
+    try:
+        with page_path.open(encoding='utf-8') as page_file:
+            return page_file.readline().startswith(GENERATED_PAGE_MARKER)
+    except (OSError, UnicodeDecodeError):
+        return False
+
+
+def sync_generated_pages(
+        parent_path: Path,
+        page_sources: Mapping[str, str],
+        source_suffix: str,
+) -> int:
+    """Write the sub-pages of a document, dropping the stale ones.
+
+    Only the sources that changed get written so that Sphinx doesn't
+    re-read the other sub-pages. The previously generated pages of the
+    document that aren't in ``page_sources`` are removed. The pages
+    that cannot be written or removed, like in a read-only source
+    dir, are reported and skipped.
+
+    :returns: The number of the pages written or removed.
+    """
+    stale_paths = {
+        page_path
+        for page_path in parent_path.parent.glob(
+            f'{glob.escape(parent_path.stem)!s}{GENERATED_PAGE_INFIX!s}'
+            f'*{glob.escape(source_suffix)!s}',
+        )
+        if _is_generated_page(page_path)
+    }
+
+    changed_pages = 0
+    for page_name, page_source in page_sources.items():
+        page_path = parent_path.parent / f'{page_name!s}{source_suffix!s}'
+        stale_paths.discard(page_path)
+        with suppress_exceptions(OSError, UnicodeDecodeError):
+            if page_path.read_text(encoding='utf-8') == page_source:
+                continue
+        try:
+            page_path.write_text(page_source, encoding='utf-8')
+        except OSError as write_err:
+            logger.warning(
+                f'Unable to write the draft page {page_path!s}: '
+                f'{write_err!s}',
+            )
+            continue
+        changed_pages += 1
+
+    for stale_path in stale_paths:
+        try:
+            stale_path.unlink()
+        except OSError as unlink_err:
+            logger.warning(
+                f'Unable to remove the stale draft page {stale_path!s}: '
+                f'{unlink_err!s}',
+            )
+            continue
+        changed_pages += 1
+    return changed_pages
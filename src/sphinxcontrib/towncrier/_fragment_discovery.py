@@ -1,19 +1,137 @@
 """Changelog fragment discovery helpers."""
 
 
-from functools import lru_cache
+import os
+import threading
 from pathlib import Path
-from typing import Optional, Set
+from typing import (
+    Dict, Iterable, List, NamedTuple, Optional, Set, Tuple, Union,
+)
 
 from sphinx.util import logging
 
+from towncrier._settings.load import Config  # noqa: WPS436
+
+from ._fragment_io import read_fragment_files  # noqa: WPS436
+from ._fragment_manifest import (  # noqa: WPS436
+    build_fragment_manifest, list_fresh_manifest_dirs, load_fragment_manifest,
+    write_fragment_manifest,
+)
+from ._git_objects import GitObjectReader  # noqa: WPS436
+from ._single_flight import single_flight_cache  # noqa: WPS436
 from ._towncrier import (  # noqa: WPS436
-    find_towncrier_fragments, get_towncrier_config,
+    DraftEntries, FragmentCategories, FragmentContents, FragmentKey,
+    apply_project_metadata_fallbacks, arrange_draft_entries,
+    categorize_fragment_files, collect_fragment_contents, find_fragment_files,
+    get_fragment_section_dirs, get_template_path, get_towncrier_config,
+    parse_towncrier_config,
+)
+from ._work_counters import (  # noqa: WPS436
+    FRAGMENT_SCANS_COUNTER, count_work,
 )
 
 
 logger = logging.getLogger(__name__)
 
+_ConfigFileStats = Tuple[Optional[Tuple[int, int, int]], ...]
+
+
+class TowncrierFragmentContents(NamedTuple):
+    """Towncrier config and fragments of the working tree."""
+
+    towncrier_config: Config
+    fragment_contents: FragmentContents
+    fragment_digests: Dict[Path, str]
+    fragment_categories: FragmentCategories
+    draft_entries: DraftEntries
+    fragment_keys: Dict[Path, Tuple[str, FragmentKey]]
+
+    @property
+    def fragment_paths(self) -> Set[Path]:
+        """Return the paths of all the change note files."""
+        return set(self.fragment_digests)
+
+    def arrange_selected_entries(
+            self,
+            fragment_paths: Iterable[Path],
+    ) -> DraftEntries:
+        """Arrange a draft out of some of the change notes only.
+
+        The sections without any of the change notes are left out.
+        """
+        selected_contents: FragmentContents = {}
+        for fragment_path in fragment_paths:
+            section_name, fragment_key = self.fragment_keys[fragment_path]
+            selected_contents.setdefault(section_name, {})[fragment_key] = (
+                self.fragment_contents[section_name][fragment_key]
+            )
+        return arrange_draft_entries(self.towncrier_config, selected_contents)
+
+
+class GitRefDraftInputs(NamedTuple):
+    """Everything needed for rendering a draft as of a Git ref."""
+
+    commit_id: str
+    towncrier_config: Config
+    fragment_contents: FragmentContents
+    template_source: Optional[str]
+    draft_entries: DraftEntries
+
+
+class TowncrierWatchedInputs(NamedTuple):
+    """The working tree paths that a project's drafts are made of."""
+
+    project_dir: Path
+    config_file: Path
+    fragment_dirs: Tuple[Path, ...] = ()
+    template_file: Optional[Path] = None
+
+    def to_json(self) -> Dict[str, Union[str, None, Tuple[str, ...]]]:
+        """Represent the paths as JSON-serializable values."""
+        return {
+            'project_dir': str(self.project_dir),
+            'config_file': str(self.config_file),
+            'fragment_dirs': tuple(map(str, self.fragment_dirs)),
+            'template_file': (
+                None if self.template_file is None
+                else str(self.template_file)
+            ),
+        }
+
+
+class _ConfigLookupFailure(NamedTuple):
+    """A config load error along with the files it was caused by."""
+
+    config_file_stats: _ConfigFileStats
+    lookup_error: LookupError
+
+
+_config_lookup_failures: Dict[
+    Tuple[Path, Optional[str]], _ConfigLookupFailure,
+] = {}
+_reported_lookup_failures: Set[str] = set()
+_lookup_failures_lock = threading.Lock()
+
+
+def reset_reported_lookup_failures() -> None:
+    """Let the lookup failures be reported again in the next build."""
+    with _lookup_failures_lock:
+        _reported_lookup_failures.clear()
+
+
+def _report_lookup_failure(lookup_err: LookupError) -> None:
+    """Warn about a failed lookup unless it's been reported already."""
+    with _lookup_failures_lock:
+        if str(lookup_err) in _reported_lookup_failures:
+            return
+        _reported_lookup_failures.add(str(lookup_err))
+    logger.warning(str(lookup_err))
+
+
+def resolve_project_path(working_dir: Optional[str] = None) -> Path:
+    """Return the directory towncrier is to be invoked from."""
+    return Path.cwd() if working_dir is None else Path(working_dir)
+
 
 def _resolve_spec_config(
         base: Path, spec_name: Optional[str] = None,
@@ -31,37 +149,371 @@ def _find_config_file(base: Path) -> Path:
     return next(extant, candidates[-1])
 
 
-# pylint: disable=fixme
-# FIXME: refactor `lookup_towncrier_fragments` to drop noqas
-@lru_cache(maxsize=1, typed=True)  # noqa: WPS210
-def lookup_towncrier_fragments(  # noqa: WPS210
+def _stat_config_files(
+        project_path: Path,
+        config_path: Optional[str] = None,
+) -> _ConfigFileStats:
+    """Take a snapshot of the files the config may be loaded from."""
+    candidate_names = (
+        (config_path, ) if config_path is not None
+        else ('towncrier.toml', 'pyproject.toml')
+    )
+    config_file_stats: List[Optional[Tuple[int, int, int]]] = []
+    for candidate_name in candidate_names:
+        try:
+            candidate_stat = os.stat(project_path / candidate_name)
+        except OSError:
+            config_file_stats.append(None)
+            continue
+        config_file_stats.append((
+            candidate_stat.st_ino,
+            candidate_stat.st_mtime_ns,
+            candidate_stat.st_size,
+        ))
+    return tuple(config_file_stats)
+
+
+def _load_project_towncrier_config(
+        project_path: Path,
+        config_path: Optional[str] = None,
+) -> Config:
+    """Load the towncrier config of the project in the working tree.
+
+    The load failures are remembered until one of the config files
+    changes so that a broken config is only parsed once.
+    """
+    failure_key = project_path, config_path
+    config_file_stats = _stat_config_files(project_path, config_path)
+    with _lookup_failures_lock:
+        lookup_failure = _config_lookup_failures.get(failure_key)
+    if (
+            lookup_failure is not None
+            and lookup_failure.config_file_stats == config_file_stats
+    ):
+        raise lookup_failure.lookup_error.with_traceback(None)
+
+    try:
+        towncrier_config = _parse_project_towncrier_config(
+            project_path, config_path,
+        )
+    except LookupError as config_lookup_err:
+        with _lookup_failures_lock:
+            _config_lookup_failures[failure_key] = _ConfigLookupFailure(
+                config_file_stats, config_lookup_err,
+            )
+        raise
+
+    with _lookup_failures_lock:
+        _config_lookup_failures.pop(failure_key, None)
+    return towncrier_config
+
+
+def _parse_project_towncrier_config(
+        project_path: Path,
+        config_path: Optional[str] = None,
+) -> Config:
+    if config_path is not None:
+        return get_towncrier_config(
+            project_path,
+            _resolve_spec_config(project_path, config_path),
+        )
+
+    return apply_project_metadata_fallbacks(
+        get_towncrier_config(project_path, _find_config_file(project_path)),
+        project_path,
+    )
+
+
+def _find_project_fragment_files(
+        project_path: Path,
+        towncrier_config: Config,
+        manifest_path: Optional[str] = None,
+) -> Dict[str, Dict[FragmentKey, Path]]:
+    """Locate the change notes using the fragment manifest, if any.
+
+    The manifest is kept at ``manifest_path``, outside of the project
+    checkout. A missing or stale manifest gets regenerated so that the
+    next lookups can skip listing the fragment dirs.
+    """
+    count_work(FRAGMENT_SCANS_COUNTER)
+    if manifest_path is None:
+        return find_fragment_files(project_path, towncrier_config)
+
+    manifest_file_path = Path(manifest_path)
+    section_dirs = get_fragment_section_dirs(towncrier_config).values()
+    fragment_manifest = load_fragment_manifest(manifest_file_path)
+    dir_file_names = None if fragment_manifest is None else (
+        list_fresh_manifest_dirs(
+            fragment_manifest, project_path, section_dirs,
+        )
+    )
+    if dir_file_names is None:
+        fragment_manifest = build_fragment_manifest(project_path, section_dirs)
+        try:
+            write_fragment_manifest(manifest_file_path, fragment_manifest)
+        except OSError as manifest_write_err:
+            _report_lookup_failure(
+                LookupError(
+                    'Unable to store the change note manifest in '
+                    f'`{manifest_file_path !s}`: {manifest_write_err !s}',
+                ),
+            )
+        dir_file_names = {
+            dir_path: manifest_dir.files
+            for dir_path, manifest_dir in fragment_manifest.items()
+        }
+
+    return find_fragment_files(
+        project_path, towncrier_config, dir_file_names,
+    )
+
+
+def lookup_towncrier_config(
         working_dir: Optional[str] = None,
         config_path: Optional[str] = None,
+) -> Optional[Config]:
+    """Load the towncrier config of the project in the working tree."""
+    try:
+        return _load_project_towncrier_config(
+            resolve_project_path(working_dir), config_path,
+        )
+    except LookupError as config_lookup_err:
+        _report_lookup_failure(config_lookup_err)
+        return None
+
+
+@single_flight_cache(maxsize=1, typed=True)
+def lookup_towncrier_fragments(
+        working_dir: Optional[str] = None,
+        config_path: Optional[str] = None,
+        manifest_path: Optional[str] = None,
 ) -> Set[Path]:
     """Emit RST-formatted Towncrier changelog fragment paths."""
-    project_path = Path.cwd() if working_dir is None else Path(working_dir)
-
-    final_config_path = (
-        _resolve_spec_config(project_path, config_path)
-        or _find_config_file(project_path)
-    )
+    project_path = resolve_project_path(working_dir)
 
     try:
-        towncrier_config = get_towncrier_config(
+        section_fragment_files = _find_project_fragment_files(
             project_path,
-            final_config_path,
+            _load_project_towncrier_config(project_path, config_path),
+            manifest_path,
         )
-    except LookupError as config_lookup_err:
-        logger.warning(str(config_lookup_err))
+    except LookupError as lookup_err:
+        _report_lookup_failure(lookup_err)
         return set()
 
+    return {
+        fragment_path
+        for fragment_paths in section_fragment_files.values()
+        for fragment_path in fragment_paths.values()
+    }
+
+
+@single_flight_cache(maxsize=1, typed=True)
+def lookup_towncrier_fragment_categories(
+        working_dir: Optional[str] = None,
+        config_path: Optional[str] = None,
+        manifest_path: Optional[str] = None,
+) -> FragmentCategories:
+    """Find the change note files along with their sections and types."""
+    project_path = resolve_project_path(working_dir)
+
     try:
-        fragment_filenames = find_towncrier_fragments(
-            str(project_path),
-            towncrier_config,
+        section_fragment_files = _find_project_fragment_files(
+            project_path,
+            _load_project_towncrier_config(project_path, config_path),
+            manifest_path,
         )
-    except LookupError as change_notes_lookup_err:
-        logger.warning(str(change_notes_lookup_err))
-        return set()
+    except LookupError as lookup_err:
+        _report_lookup_failure(lookup_err)
+        return {}
+
+    return categorize_fragment_files(section_fragment_files)
+
+
+@single_flight_cache(maxsize=1, typed=True)
+def lookup_towncrier_fragment_contents(
+        working_dir: Optional[str] = None,
+        config_path: Optional[str] = None,
+        max_workers: int = 1,
+        manifest_path: Optional[str] = None,
+) -> Optional[TowncrierFragmentContents]:
+    """Read the Towncrier config and fragments from the working tree.
+
+    The fragment files are read by a pool of ``max_workers`` threads.
+    The draft entries are arranged once here so that all the directive
+    invocations can share them.
+    """
+    project_path = resolve_project_path(working_dir)
+
+    try:
+        towncrier_config = _load_project_towncrier_config(
+            project_path, config_path,
+        )
+        section_fragment_files = _find_project_fragment_files(
+            project_path, towncrier_config, manifest_path,
+        )
+    except LookupError as lookup_err:
+        _report_lookup_failure(lookup_err)
+        return None
+    fragment_files = read_fragment_files(
+        [
+            fragment_path
+            for fragment_paths in section_fragment_files.values()
+            for fragment_path in fragment_paths.values()
+        ],
+        max_workers=max_workers,
+    )
+
+    fragment_contents = {
+        section_name: {
+            fragment_key: fragment_files[fragment_path].text
+            for fragment_key, fragment_path in fragment_paths.items()
+        }
+        for section_name, fragment_paths in section_fragment_files.items()
+    }
+    return TowncrierFragmentContents(
+        towncrier_config=towncrier_config,
+        fragment_contents=fragment_contents,
+        fragment_digests={
+            fragment_path: fragment_file.digest
+            for fragment_path, fragment_file in fragment_files.items()
+        },
+        fragment_categories=categorize_fragment_files(section_fragment_files),
+        draft_entries=arrange_draft_entries(
+            towncrier_config, fragment_contents,
+        ),
+        fragment_keys={
+            fragment_path: (section_name, fragment_key)
+            for section_name, fragment_paths in section_fragment_files.items()
+            for fragment_key, fragment_path in fragment_paths.items()
+        },
+    )
 
-    return set(map(Path, fragment_filenames))
+
+def lookup_towncrier_watched_inputs(
+        working_dir: Optional[str] = None,
+        config_path: Optional[str] = None,
+) -> TowncrierWatchedInputs:
+    """Resolve the config, template and fragment dirs of a project.
+
+    When the config cannot be loaded, only the config file itself is
+    reported so that watching it is enough to notice it being fixed.
+    """
+    project_path = Path(os.path.abspath(resolve_project_path(working_dir)))
+    config_file = (
+        project_path / config_path if config_path is not None
+        else _find_config_file(project_path)
+    )
+    try:
+        towncrier_config = _load_project_towncrier_config(
+            project_path, config_path,
+        )
+    except LookupError:
+        return TowncrierWatchedInputs(project_path, config_file)
+
+    return TowncrierWatchedInputs(
+        project_dir=project_path,
+        config_file=config_file,
+        fragment_dirs=tuple(
+            sorted({
+                Path(os.path.abspath(project_path / section_dir))
+                for section_dir in get_fragment_section_dirs(
+                    towncrier_config,
+                ).values()
+            }),
+        ),
+        template_file=get_template_path(towncrier_config),
+    )
+
+
+def _read_git_config_file(
+        git_reader: GitObjectReader,
+        commit_id: str,
+        config_path: Optional[str] = None,
+) -> str:
+    """Read the best towncrier config file as of a Git commit."""
+    candidate_names = (
+        (config_path, ) if config_path is not None
+        else ('towncrier.toml', 'pyproject.toml')
+    )
+    config_blobs = git_reader.read_objects(
+        f'{commit_id}:./{candidate_name}' for candidate_name in candidate_names
+    )
+    config_blob = next(filter(None, config_blobs), None)
+    if config_blob is None:
+        raise LookupError(
+            'Towncrier was unable to load the configuration from file '
+            f'`{candidate_names[-1] !s}` at commit `{commit_id !s}`',
+        )
+    return config_blob.data.decode('utf-8')
+
+
+def lookup_towncrier_fragments_in_git(  # noqa: WPS210
+        git_ref: str,
+        working_dir: Optional[str] = None,
+        config_path: Optional[str] = None,
+) -> GitRefDraftInputs:
+    """Read towncrier config and fragments from a Git ref.
+
+    Nothing is read from the working tree, all the data comes out of
+    a single ``git cat-file --batch`` stream.
+    """
+    project_path = resolve_project_path(working_dir)
+
+    with GitObjectReader(project_path) as git_reader:
+        commit = git_reader.read_object(f'{git_ref}^{{commit}}')
+        if commit is None:
+            raise LookupError(f'Unable to resolve Git ref `{git_ref !s}`')
+        commit_id = commit.object_id
+
+        towncrier_config, template_path = parse_towncrier_config(
+            project_path,
+            _read_git_config_file(git_reader, commit_id, config_path),
+        )
+        if config_path is None:
+            pyproject_blob = git_reader.read_object(
+                f'{commit_id}:./pyproject.toml',
+            )
+            towncrier_config = apply_project_metadata_fallbacks(
+                towncrier_config,
+                project_path,
+                '' if pyproject_blob is None
+                else pyproject_blob.data.decode('utf-8'),
+            )
+
+        template_source = None
+        if template_path is not None:
+            template_blob = git_reader.read_object(
+                f'{commit_id}:./{template_path}',
+            )
+            if template_blob is None:
+                raise LookupError(
+                    f'The template file `{template_path !s}` does not '
+                    f'exist at commit `{commit_id !s}`',
+                )
+            template_source = template_blob.data.decode('utf-8')
+
+        section_files = {
+            section_name: {
+                file_name: file_content.decode('utf-8', errors='replace')
+                for file_name, file_content in git_reader.read_tree_blobs(
+                    f'{commit_id}:./{section_dir}',
+                ).items()
+            }
+            for section_name, section_dir in get_fragment_section_dirs(
+                towncrier_config,
+            ).items()
+        }
+
+    fragment_contents = collect_fragment_contents(
+        towncrier_config, section_files,
+    )
+    return GitRefDraftInputs(
+        commit_id=commit_id,
+        towncrier_config=towncrier_config,
+        fragment_contents=fragment_contents,
+        template_source=template_source,
+        draft_entries=arrange_draft_entries(
+            towncrier_config, fragment_contents,
+        ),
+    )
@@ -0,0 +1,69 @@
+"""Changelog fragment file reading helpers."""
+
+
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional, Sequence
+
+
+FRAGMENT_READ_BUFFER_SIZE = 1024 * 1024  # one syscall for most fragments
+MAX_FRAGMENT_READ_WORKERS = 32
+
+
+class FragmentFile(NamedTuple):
+    """The decoded contents of a change note file and their digest."""
+
+    text: str
+    digest: str
+
+
+def get_fragment_read_workers(configured_workers: Optional[int]) -> int:
+    """Compute the thread pool size for reading the fragment files."""
+    if configured_workers is not None:
+        return max(1, configured_workers)
+
+    # Same as the ThreadPoolExecutor default, file reads are I/O-bound
+    return min(MAX_FRAGMENT_READ_WORKERS, (os.cpu_count() or 1) + 4)
+
+
+def read_fragment_file(fragment_path: Path) -> FragmentFile:
+    """Read and hash a change note file in as few syscalls as possible."""
+    with fragment_path.open(
+            'rb', buffering=FRAGMENT_READ_BUFFER_SIZE,
+    ) as fragment_file:
+        fragment_bytes = fragment_file.read()
+
+    return FragmentFile(
+        text=fragment_bytes.decode('utf-8', errors='replace'),
+        digest=hashlib.sha256(fragment_bytes).hexdigest(),
+    )
+
+
+def read_fragment_files(
+        fragment_paths: Sequence[Path],
+        max_workers: int = 1,
+) -> Dict[Path, FragmentFile]:
+    """Read and hash many change note files concurrently.
+
+    On network file systems and cold caches, the latency of each read
+    dominates so overlapping them in a bounded thread pool helps even
+    though the GIL is held while hashing.
+    """
+    if max_workers <= 1 or len(fragment_paths) <= 1:
+        return {
+            fragment_path: read_fragment_file(fragment_path)
+            for fragment_path in fragment_paths
+        }
+
+    with ThreadPoolExecutor(
+            max_workers=min(max_workers, len(fragment_paths)),
+            thread_name_prefix='towncrier-fragment-reader',
+    ) as fragment_reader_pool:
+        return dict(
+            zip(
+                fragment_paths,
+                fragment_reader_pool.map(read_fragment_file, fragment_paths),
+            ),
+        )
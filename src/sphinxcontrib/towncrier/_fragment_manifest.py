@@ -0,0 +1,139 @@
+"""A pre-generated listing of the change note files.
+
+Listing the fragment directories again and again is slow on network
+mounts. The manifest records the names of the files in each fragment
+directory along with the directory modification time. While the
+modification times still match, one manifest read replaces listing all
+the directories.
+"""
+
+
+import json
+import os
+from contextlib import suppress as suppress_exceptions
+from pathlib import Path
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+
+from ._atomic_write import write_file_atomically  # noqa: WPS436
+
+
+FRAGMENT_MANIFEST_FILE_NAME = 'towncrier-fragment-manifest.json'
+FRAGMENT_MANIFEST_VERSION = 2
+
+
+class FragmentManifestDir(NamedTuple):
+    """The file names in a fragment dir as of its modification time."""
+
+    mtime_ns: Optional[int]
+    files: Tuple[str, ...]
+
+
+FragmentManifest = Dict[str, FragmentManifestDir]
+"""Fragment dir listings keyed by the project-relative dir path."""
+
+
+def get_dir_mtime(dir_path: Path) -> Optional[int]:
+    """Return the modification time of a dir, if it exists."""
+    try:
+        return os.stat(dir_path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def load_fragment_manifest(manifest_path: Path) -> Optional[FragmentManifest]:
+    """Read a manifest, unless it's missing or unusable."""
+    try:
+        manifest_data = json.loads(manifest_path.read_bytes())
+    except (OSError, ValueError):
+        return None
+
+    if (
+            not isinstance(manifest_data, dict)
+            or manifest_data.get('version') != FRAGMENT_MANIFEST_VERSION
+    ):
+        return None
+
+    try:
+        return {
+            dir_path: FragmentManifestDir(
+                mtime_ns=dir_data['mtime_ns'],
+                files=tuple(map(str, dir_data['files'])),
+            )
+            for dir_path, dir_data in manifest_data['directories'].items()
+        }
+    except (AttributeError, KeyError, TypeError):
+        return None
+
+
+def list_fresh_manifest_dirs(
+        fragment_manifest: FragmentManifest,
+        project_path: Path,
+        dir_paths: Iterable[str],
+) -> Optional[Dict[str, Tuple[str, ...]]]:
+    """Take the dir listings from the manifest if they're all current.
+
+    Adding, removing and renaming files changes the modification time
+    of their dir so a single ``stat`` per dir tells if the listing in
+    the manifest is stale. :data:`None` means that some of them are.
+    """
+    dir_file_names = {}
+    for dir_path in dir_paths:
+        manifest_dir = fragment_manifest.get(dir_path)
+        if manifest_dir is None or manifest_dir.mtime_ns != get_dir_mtime(
+                project_path / dir_path,
+        ):
+            return None
+        dir_file_names[dir_path] = manifest_dir.files
+    return dir_file_names
+
+
+def build_fragment_manifest(
+        project_path: Path,
+        dir_paths: Iterable[str],
+) -> FragmentManifest:
+    """List the files in the fragment dirs.
+
+    The files aren't read since the freshness of the listings only
+    depends on the dir modification times.
+    """
+    fragment_manifest = {}
+    for dir_path in dir_paths:
+        # Taken before listing so that concurrent changes make it stale
+        dir_mtime = get_dir_mtime(project_path / dir_path)
+        file_names = []
+        with suppress_exceptions(OSError), os.scandir(
+                project_path / dir_path,
+        ) as dir_entries:
+            for dir_entry in dir_entries:
+                with suppress_exceptions(OSError):
+                    if dir_entry.is_file():
+                        file_names.append(dir_entry.name)
+
+        fragment_manifest[dir_path] = FragmentManifestDir(
+            mtime_ns=dir_mtime,
+            files=tuple(sorted(file_names)),
+        )
+    return fragment_manifest
+
+
+def write_fragment_manifest(
+        manifest_path: Path,
+        fragment_manifest: FragmentManifest,
+) -> None:
+    """Store a manifest replacing the old one atomically."""
+    manifest_json = json.dumps(
+        {
+            'version': FRAGMENT_MANIFEST_VERSION,
+            'directories': {
+                dir_path: {
+                    'mtime_ns': manifest_dir.mtime_ns,
+                    'files': list(manifest_dir.files),
+                }
+                for dir_path, manifest_dir in fragment_manifest.items()
+            },
+        },
+        indent=2,
+        sort_keys=True,
+    )
+
+    write_file_atomically(manifest_path, manifest_json.encode('utf-8'))
@@ -0,0 +1,181 @@
+"""Compact change note paths and stamps for storing in the Sphinx env."""
+
+
+import hashlib
+import os
+import sys
+from itertools import groupby
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, Tuple
+
+
+_PackedPaths = Tuple[Tuple[str, Tuple[str, ...]], ...]
+
+
+def _pack_relative_paths(relative_paths: Iterable[str]) -> _PackedPaths:
+    """Group the sorted file names by their interned directories."""
+    split_paths = (
+        relative_path.rpartition('/') for relative_path in relative_paths
+    )
+    return tuple(
+        (
+            sys.intern(dir_path),
+            tuple(file_name for _dir, _sep, file_name in dir_entries),
+        )
+        for dir_path, dir_entries in groupby(
+            split_paths,
+            key=lambda split_path: split_path[0],
+        )
+    )
+
+
+def _unpack_relative_paths(packed_paths: _PackedPaths) -> Iterator[str]:
+    """Join the file names grouped by directories back into paths."""
+    return (
+        f'{dir_path}/{file_name}' if dir_path else file_name
+        for dir_path, file_names in packed_paths
+        for file_name in file_names
+    )
+
+
+class FragmentStamps(Dict[str, Tuple[int, int]]):
+    """Modification times and sizes keyed by the relative change note path.
+
+    This is what the Sphinx environment keeps for all the change notes.
+    When pickled, the paths are grouped by their directory the same way
+    as in :py:class:`FragmentPathSet`.
+    """
+
+    def __reduce__(self) -> Any:
+        """Pack the paths grouped by their interned directories."""
+        relative_paths = sorted(self)
+        return _unpack_fragment_stamps, (
+            _pack_relative_paths(relative_paths),
+            tuple(self[relative_path] for relative_path in relative_paths),
+        )
+
+
+def _unpack_fragment_stamps(
+        packed_paths: _PackedPaths,
+        path_stamps: Tuple[Tuple[int, int], ...],
+) -> FragmentStamps:
+    """Restore the stamps pickled by :py:meth:`FragmentStamps.__reduce__`."""
+    return FragmentStamps(
+        zip(_unpack_relative_paths(packed_paths), path_stamps),
+    )
+
+
+class FragmentPathSet:
+    """An immutable set of change note paths relative to a project.
+
+    This is what ends up pickled into the Sphinx environment and sent
+    between the parallel workers. The paths are kept as a sorted tuple
+    of project-relative strings along with a digest of the whole set so
+    that comparing two sets is a single digest comparison in the common
+    case. When pickled, the file names are grouped by their directory
+    so that each directory prefix is only stored once.
+    """
+
+    __slots__ = ('base_dir', 'relative_paths', 'digest')
+
+    def __init__(
+            self,
+            base_dir: str,
+            relative_paths: Iterable[str] = (),
+    ) -> None:
+        """Initialize the set out of ``/``-separated relative paths."""
+        self.base_dir = base_dir
+        self.relative_paths: Tuple[str, ...] = tuple(
+            sorted(set(relative_paths)),
+        )
+        self.digest = hashlib.sha256(
+            '\0'.join(self.relative_paths).encode(
+                'utf-8', errors='surrogateescape',
+            ),
+        ).hexdigest()
+
+    @classmethod
+    def from_paths(
+            cls,
+            base_dir: Path,
+            fragment_paths: Iterable[Path],
+    ) -> 'FragmentPathSet':
+        """Make a set out of absolute change note paths."""
+        base_dir_str = str(base_dir)
+        return cls(
+            base_dir_str,
+            (
+                Path(os.path.relpath(fragment_path, base_dir_str)).as_posix()
+                for fragment_path in fragment_paths
+            ),
+        )
+
+    def __repr__(self) -> str:
+        """Render the set representation."""
+        return (
+            f'{type(self).__name__}({self.base_dir!r}, '
+            f'<{len(self)} paths, digest={self.digest:.12}>)'
+        )
+
+    def __len__(self) -> int:
+        """Return the number of paths in the set."""
+        return len(self.relative_paths)
+
+    def __iter__(self) -> Iterator[Path]:
+        """Iterate over the absolute paths."""
+        base_dir = Path(self.base_dir)
+        return (
+            base_dir / relative_path for relative_path in self.relative_paths
+        )
+
+    def stat(self) -> FragmentStamps:
+        """Take the modification times and sizes of the change notes.
+
+        The files that are gone are left out.
+        """
+        fragment_stamps = FragmentStamps()
+        for relative_path, fragment_path in zip(self.relative_paths, self):
+            try:
+                fragment_stat = os.stat(fragment_path)
+            except OSError:
+                continue
+            fragment_stamps[relative_path] = (
+                fragment_stat.st_mtime_ns, fragment_stat.st_size,
+            )
+        return fragment_stamps
+
+    def __eq__(self, other: object) -> bool:
+        """Compare the sets by their digests."""
+        if not isinstance(other, FragmentPathSet):
+            return NotImplemented
+        return self.base_dir == other.base_dir and self.digest == other.digest
+
+    def __hash__(self) -> int:
+        """Hash the set by its digest."""
+        return hash((self.base_dir, self.digest))
+
+    def __xor__(self, other: 'FragmentPathSet') -> 'FragmentPathSet':
+        """Compute the paths present in only one of the two sets."""
+        if self == other:
+            return type(self)(self.base_dir)
+        return type(self)(
+            self.base_dir,
+            set(self.relative_paths) ^ set(other.relative_paths),
+        )
+
+    def __getstate__(self) -> Tuple[str, _PackedPaths]:
+        """Pack the file names grouped by their interned directories."""
+        return self.base_dir, _pack_relative_paths(self.relative_paths)
+
+    def __setstate__(self, state: Tuple[str, _PackedPaths]) -> None:
+        """Unpack the file names grouped by their directories."""
+        base_dir, packed_paths = state
+        unpacked_set = type(self)(
+            base_dir, _unpack_relative_paths(packed_paths),
+        )
+        for slot_name in self.__slots__:
+            setattr(self, slot_name, getattr(unpacked_set, slot_name))
+
+    def __reduce__(self) -> Any:
+        """Make sure the packed state is used for pickling."""
+        return type(self), (self.base_dir,), self.__getstate__()
@@ -0,0 +1,172 @@
+"""Git object database access helpers."""
+
+
+import subprocess  # noqa: S404
+import threading
+from pathlib import Path
+from types import TracebackType
+from typing import (
+    Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Type,
+)
+
+
+GIT_CAT_FILE_BATCH_CMD = 'git', 'cat-file', '--batch'
+GIT_REV_PARSE_CMD = 'git', 'rev-parse', '--verify', '--quiet'
+GIT_TREE_MODE = b'40000'
+
+
+class GitObject(NamedTuple):
+    """An object read from the Git object database."""
+
+    object_id: str
+    object_type: str
+    data: bytes
+
+
+class GitObjectReader:
+    """A persistent ``git cat-file --batch`` stream.
+
+    All the object lookups share a single Git process. Multiple object
+    names requested at once are pipelined so that the reads don't wait
+    on per-object round trips.
+    """
+
+    def __init__(self, repo_dir: Path) -> None:
+        """Spawn a ``git cat-file --batch`` process in ``repo_dir``.
+
+        Object names with ``./`` path components are resolved relative
+        to this directory.
+        """
+        self._proc = subprocess.Popen(  # noqa: S603
+            GIT_CAT_FILE_BATCH_CMD,
+            cwd=str(repo_dir),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+
+    def __enter__(self) -> 'GitObjectReader':
+        """Return the reader itself."""
+        return self
+
+    def __exit__(
+            self,
+            exc_type: Optional[Type[BaseException]],
+            exc_val: Optional[BaseException],
+            exc_tb: Optional[TracebackType],
+    ) -> None:
+        """Terminate the underlying Git process."""
+        self.close()
+
+    def close(self) -> None:
+        """Terminate the underlying Git process."""
+        if self._proc.stdin is not None:
+            self._proc.stdin.close()
+        self._proc.wait()
+        if self._proc.stdout is not None:
+            self._proc.stdout.close()
+
+    def _write_requests(self, object_names: List[str]) -> None:
+        assert self._proc.stdin is not None
+        self._proc.stdin.write(
+            ''.join(f'{name}\n' for name in object_names).encode(),
+        )
+        self._proc.stdin.flush()
+
+    def read_objects(
+            self,
+            object_names: Iterable[str],
+    ) -> List[Optional[GitObject]]:
+        """Retrieve objects, ``None`` standing for the missing ones."""
+        requested_names = list(object_names)
+        if not requested_names:
+            return []
+
+        # The requests are written from a separate thread so that a big
+        # batch doesn't dead-lock on the filled up stdout pipe buffer
+        writer = threading.Thread(
+            target=self._write_requests,
+            args=(requested_names,),
+            daemon=True,
+        )
+        writer.start()
+
+        assert self._proc.stdout is not None
+        git_objects: List[Optional[GitObject]] = []
+        for _name in requested_names:
+            header = self._proc.stdout.readline()
+            if not header:
+                raise LookupError('The `git cat-file` process quit early')
+            header_fields = header.split()
+            if len(header_fields) != 3:  # noqa: WPS432
+                # `<name> missing` or `<name> ambiguous`
+                git_objects.append(None)
+                continue
+
+            object_id, object_type, object_size = header_fields
+            data = self._proc.stdout.read(int(object_size))
+            self._proc.stdout.read(1)  # the trailing LF
+            git_objects.append(
+                GitObject(object_id.decode(), object_type.decode(), data),
+            )
+
+        writer.join()
+        return git_objects
+
+    def read_object(self, object_name: str) -> Optional[GitObject]:
+        """Retrieve a single object if it exists."""
+        return self.read_objects((object_name,))[0]
+
+    def read_tree_blobs(self, tree_name: str) -> Dict[str, bytes]:
+        """Retrieve the contents of all files directly inside a tree."""
+        tree = self.read_object(tree_name)
+        if tree is None or tree.object_type != 'tree':
+            return {}
+
+        blob_entries = [
+            (entry_name, entry_id)
+            for entry_mode, entry_name, entry_id in iter_tree_entries(
+                tree.data,
+                object_id_size=len(tree.object_id) // 2,
+            )
+            if entry_mode != GIT_TREE_MODE
+        ]
+        blobs = self.read_objects(entry_id for _name, entry_id in blob_entries)
+        return {
+            entry_name: blob.data
+            for (entry_name, _entry_id), blob in zip(blob_entries, blobs)
+            if blob is not None and blob.object_type == 'blob'
+        }
+
+
+def iter_tree_entries(
+        tree_data: bytes,
+        object_id_size: int,
+) -> Iterator[Tuple[bytes, str, str]]:
+    """Parse a raw Git tree object into mode, name and id triples."""
+    position = 0
+    while position < len(tree_data):
+        mode_end = tree_data.index(b' ', position)
+        name_end = tree_data.index(b'\0', mode_end)
+        id_end = name_end + 1 + object_id_size
+        yield (
+            tree_data[position:mode_end],
+            tree_data[mode_end + 1:name_end].decode(
+                'utf-8', errors='surrogateescape',
+            ),
+            tree_data[name_end + 1:id_end].hex(),
+        )
+        position = id_end
+
+
+def resolve_git_commit(repo_dir: Path, git_ref: str) -> Optional[str]:
+    """Return the commit id a Git ref points to, if any."""
+    try:
+        return subprocess.check_output(  # noqa: S603
+            (*GIT_REV_PARSE_CMD, f'{git_ref}^{{commit}}'),
+            cwd=str(repo_dir),
+            stderr=subprocess.DEVNULL,
+            text=True,
+        ).strip() or None
+    except (OSError, subprocess.CalledProcessError):
+        return None
@@ -0,0 +1,249 @@
+"""Git ref reading helpers that mostly don't spawn any processes.
+
+The refs are read straight from the loose ref files and the
+``packed-refs`` file in the Git directory. This is enough to resolve
+``HEAD`` and to notice the refs changing. Telling which of the tags
+``HEAD`` descends from and what commits they point to takes a Git
+process since that means walking the commit graph and peeling the
+annotated tags, which may be stored in packs.
+"""
+
+
+import os
+import re
+import subprocess  # noqa: S404
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional, Tuple, Union
+
+from packaging.version import InvalidVersion, Version
+
+
+GIT_DIR_NAME = '.git'
+GIT_DIR_FILE_PREFIX = 'gitdir:'
+GIT_SYMREF_PREFIX = 'ref:'
+GIT_TAGS_REF_PREFIX = 'refs/tags/'
+GIT_MERGED_TAGS_CMD = (
+    'git', 'for-each-ref', '--merged=HEAD',
+    # The last field is the tagged commit, for the annotated tags only
+    '--format=%(refname) %(objectname) %(*objectname)',
+    GIT_TAGS_REF_PREFIX,
+)
+GIT_OBJECT_ID_REGEX = re.compile(r'[0-9a-f]{40}(?:[0-9a-f]{24})?$')
+VERSION_TAG_PREFIX = 'v'
+
+
+class GitDirs(NamedTuple):
+    """The per-worktree and the shared Git directories."""
+
+    git_dir: Path
+    common_dir: Path
+
+
+class GitRef(NamedTuple):
+    """A ref target along with the commit it peels to, if known."""
+
+    object_id: str
+    peeled_object_id: Optional[str] = None
+
+
+def find_git_dirs(start_dir: Path) -> Optional[GitDirs]:
+    """Locate the Git directory of the repository enclosing a dir."""
+    for candidate_dir in (start_dir, *start_dir.parents):
+        dot_git_path = candidate_dir / GIT_DIR_NAME
+        if dot_git_path.is_dir():
+            git_dir = dot_git_path
+            break
+        if dot_git_path.is_file():
+            # Worktrees and submodules point to their Git dir elsewhere
+            dot_git_text = dot_git_path.read_text(encoding='utf-8').strip()
+            if not dot_git_text.startswith(GIT_DIR_FILE_PREFIX):
+                return None
+            git_dir = candidate_dir / dot_git_text[
+                len(GIT_DIR_FILE_PREFIX):
+            ].strip()
+            break
+    else:
+        return None
+
+    try:
+        common_dir_text = (git_dir / 'commondir').read_text(
+            encoding='utf-8',
+        ).strip()
+    except OSError:
+        return GitDirs(git_dir=git_dir, common_dir=git_dir)
+    return GitDirs(git_dir=git_dir, common_dir=git_dir / common_dir_text)
+
+
+def read_packed_refs(common_dir: Path) -> Dict[str, GitRef]:
+    """Parse the ``packed-refs`` file including the peeled tags."""
+    try:
+        packed_refs_text = (common_dir / 'packed-refs').read_text(
+            encoding='utf-8',
+        )
+    except OSError:
+        return {}
+
+    packed_refs: Dict[str, GitRef] = {}
+    last_ref_name = None
+    for packed_refs_line in packed_refs_text.splitlines():
+        if packed_refs_line.startswith('#') or not packed_refs_line:
+            continue
+        if packed_refs_line.startswith('^') and last_ref_name is not None:
+            packed_refs[last_ref_name] = packed_refs[last_ref_name]._replace(
+                peeled_object_id=packed_refs_line[1:].strip(),
+            )
+            continue
+        object_id, _sep, last_ref_name = packed_refs_line.partition(' ')
+        packed_refs[last_ref_name] = GitRef(object_id=object_id)
+    return packed_refs
+
+
+def resolve_head_commit(git_dirs: GitDirs) -> Optional[str]:
+    """Find the commit ``HEAD`` points to, following one symref."""
+    try:
+        head_text = (git_dirs.git_dir / 'HEAD').read_text(
+            encoding='utf-8',
+        ).strip()
+    except OSError:
+        return None
+
+    if not head_text.startswith(GIT_SYMREF_PREFIX):
+        return head_text if GIT_OBJECT_ID_REGEX.match(head_text) else None
+
+    ref_name = head_text[len(GIT_SYMREF_PREFIX):].strip()
+    try:
+        object_id = (git_dirs.common_dir / ref_name).read_text(
+            encoding='utf-8',
+        ).strip()
+    except OSError:
+        packed_ref = read_packed_refs(git_dirs.common_dir).get(ref_name)
+        return None if packed_ref is None else packed_ref.object_id
+    return object_id if GIT_OBJECT_ID_REGEX.match(object_id) else None
+
+
+def parse_version_tag(tag_name: str) -> Optional[Version]:
+    """Turn a tag name like ``v1.2.3`` into a version, if it is one."""
+    if tag_name.startswith(VERSION_TAG_PREFIX):
+        tag_name = tag_name[len(VERSION_TAG_PREFIX):]
+    try:
+        return Version(tag_name)
+    except InvalidVersion:
+        return None
+
+
+def guess_next_version(last_version: Version) -> str:
+    """Compute the release following the last tagged one.
+
+    Pre-releases and dev releases lead to their final release while
+    the final and post-releases get their last release component
+    bumped.
+    """
+    if last_version.is_prerelease:
+        return last_version.base_version
+
+    *leading_components, last_component = last_version.release
+    return '.'.join(map(str, (*leading_components, last_component + 1)))
+
+
+_RefStamp = Optional[Tuple[int, int, int]]
+
+
+def _stat_ref_file(ref_path: Path) -> _RefStamp:
+    try:
+        ref_stat = os.stat(ref_path)
+    except OSError:
+        return None
+    return ref_stat.st_ino, ref_stat.st_mtime_ns, ref_stat.st_size
+
+
+def stat_version_refs(
+        repo_dir: Path,
+) -> Tuple[Union[_RefStamp, Tuple[str, ...]], ...]:
+    """Take a snapshot of the refs the version is derived from.
+
+    Committing, checking out and tagging all replace some of ``HEAD``,
+    the branch ref it points to, ``packed-refs`` or an entry in the
+    tag ref dirs. The version only needs to be derived again when the
+    snapshot changes.
+    """
+    git_dirs = find_git_dirs(repo_dir.resolve())
+    if git_dirs is None:
+        return ()
+
+    head_path = git_dirs.git_dir / 'HEAD'
+    ref_paths = [head_path, git_dirs.common_dir / 'packed-refs']
+    try:
+        head_text = head_path.read_text(encoding='utf-8').strip()
+    except OSError:
+        head_text = ''
+    if head_text.startswith(GIT_SYMREF_PREFIX):
+        ref_paths.append(
+            git_dirs.common_dir / head_text[len(GIT_SYMREF_PREFIX):].strip(),
+        )
+    tag_file_names = []
+    for dir_path, _dir_names, file_names in os.walk(
+            git_dirs.common_dir / GIT_TAGS_REF_PREFIX,
+    ):
+        ref_paths.append(Path(dir_path))
+        tag_file_names.append(tuple(sorted(file_names)))
+    return (*map(_stat_ref_file, ref_paths), *tag_file_names)
+
+
+def list_merged_tags(repo_dir: Path) -> Optional[Dict[str, str]]:
+    """Find the tag refs pointing to ``HEAD`` or its ancestors.
+
+    :returns: The commits tagged by the full tag ref names or
+        :data:`None` if Git is unable to tell.
+    """
+    try:
+        merged_tags_output = subprocess.check_output(  # noqa: S603
+            GIT_MERGED_TAGS_CMD,
+            cwd=str(repo_dir),
+            stderr=subprocess.DEVNULL,
+            text=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    merged_tags = {}
+    for merged_tag_line in merged_tags_output.splitlines():
+        ref_name, *object_ids = merged_tag_line.split()
+        if object_ids:
+            merged_tags[ref_name] = object_ids[-1]
+    return merged_tags
+
+
+def get_scm_version(repo_dir: Path) -> Optional[str]:
+    """Derive the version of the working tree from the Git tags.
+
+    The ``HEAD`` commit being tagged results in that tag's version,
+    otherwise the version following the greatest tag that ``HEAD``
+    descends from is returned, like ``git describe`` would find. The
+    tags of the other branches, like a newer major release when on a
+    maintenance branch, are left out. Without any such version tags
+    there's nothing to go off so :data:`None` is returned.
+    """
+    git_dirs = find_git_dirs(repo_dir.resolve())
+    if git_dirs is None:
+        return None
+
+    merged_tags = list_merged_tags(repo_dir)
+    if merged_tags is None:
+        return None
+
+    version_tags: Dict[Version, str] = {}
+    for ref_name, tagged_commit in merged_tags.items():
+        tag_version = parse_version_tag(ref_name[len(GIT_TAGS_REF_PREFIX):])
+        if tag_version is not None:
+            version_tags[tag_version] = tagged_commit
+    if not version_tags:
+        return None
+
+    head_commit = resolve_head_commit(git_dirs)
+    head_versions = [
+        tag_version
+        for tag_version, tagged_commit in version_tags.items()
+        if tagged_commit == head_commit
+    ]
+    if head_versions:
+        return str(max(head_versions))
+    return guess_next_version(max(version_tags))
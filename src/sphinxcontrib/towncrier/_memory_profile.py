@@ -0,0 +1,148 @@
+"""Opt-in accounting of the memory the extension allocates.
+
+While enabled, :mod:`tracemalloc` traces the allocations and the
+extension records how much memory each of its phases needed at most
+and how much of it was still held once the phase was over. Parallel
+readers are separate processes so each one accounts for its own
+phases and they are reported per process.
+"""
+
+
+import os
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, NamedTuple
+
+
+MEMORY_PROFILE_ENV_VAR = 'SPHINXCONTRIB_TOWNCRIER_MEMORY_PROFILE'
+MEMORY_PROFILE_PHASES = ('discovery', 'render', 'nodes', 'merge')
+
+
+class PhaseAllocations(NamedTuple):
+    """The memory allocated in the calls of a phase."""
+
+    calls: int = 0
+    peak: int = 0  # the most that one call needed on top of what was there
+    retained: int = 0  # what the calls left allocated in total
+
+    def add_call(self, peak: int, retained: int) -> 'PhaseAllocations':
+        """Account for another call of the phase."""
+        return PhaseAllocations(
+            calls=self.calls + 1,
+            peak=max(self.peak, peak),
+            retained=self.retained + retained,
+        )
+
+    def combine(self, other: 'PhaseAllocations') -> 'PhaseAllocations':
+        """Account for the calls made in another process."""
+        return PhaseAllocations(
+            calls=self.calls + other.calls,
+            peak=max(self.peak, other.peak),
+            retained=self.retained + other.retained,
+        )
+
+
+PhaseProfile = Dict[str, PhaseAllocations]
+"""The allocations made in one process keyed by the phase name."""
+
+_phase_allocations: PhaseProfile = {}
+_phase_allocations_lock = threading.Lock()
+_active_phase = threading.local()
+_tracing_started = False
+
+
+def _forget_parent_allocations() -> None:
+    """Make a forked reader only report its own phases."""
+    _phase_allocations.clear()
+
+
+if hasattr(os, 'register_at_fork'):  # noqa: WPS421
+    os.register_at_fork(after_in_child=_forget_parent_allocations)
+
+
+def is_memory_profile_requested(config_flag: bool = False) -> bool:
+    """Check if the config or the environment asks for the profile."""
+    return config_flag or os.environ.get(
+        MEMORY_PROFILE_ENV_VAR, '',
+    ).strip().lower() not in {'', '0', 'false', 'no'}
+
+
+def start_memory_profile() -> None:
+    """Start tracing the allocations, unless something else already is."""
+    global _tracing_started  # noqa: WPS420  # pylint: disable=global-statement
+
+    with _phase_allocations_lock:
+        _phase_allocations.clear()
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _tracing_started = True
+
+
+def stop_memory_profile() -> None:
+    """Stop tracing the allocations if it was started for the profile."""
+    global _tracing_started  # noqa: WPS420  # pylint: disable=global-statement
+
+    if _tracing_started:
+        tracemalloc.stop()
+        _tracing_started = False
+
+
+@contextmanager
+def track_phase_allocations(phase: str) -> Iterator[None]:
+    """Account for the memory allocated within the block to a phase.
+
+    Nothing is measured unless the allocations are being traced. The
+    phases entered while another one is being tracked are accounted to
+    the outer one since measuring them separately would reset its peak.
+    """
+    if not tracemalloc.is_tracing() or getattr(
+            _active_phase, 'name', None,
+    ) is not None:
+        yield
+        return
+
+    _active_phase.name = phase
+    memory_before, _peak_before = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    try:
+        yield
+    finally:
+        _active_phase.name = None
+        memory_after, peak_after = tracemalloc.get_traced_memory()
+        with _phase_allocations_lock:
+            _phase_allocations[phase] = _phase_allocations.get(
+                phase, PhaseAllocations(),
+            ).add_call(
+                peak=max(0, peak_after - memory_before),
+                retained=memory_after - memory_before,
+            )
+
+
+def get_phase_allocations() -> PhaseProfile:
+    """Return what the phases have allocated in this process so far."""
+    with _phase_allocations_lock:
+        return dict(_phase_allocations)
+
+
+def combine_phase_profiles(
+        phase_profiles: Iterable[PhaseProfile],
+) -> PhaseProfile:
+    """Sum up the allocations of the phases over the processes."""
+    combined_profile: PhaseProfile = {}
+    for phase_profile in phase_profiles:
+        for phase, phase_allocations in phase_profile.items():
+            combined_profile[phase] = combined_profile.get(
+                phase, PhaseAllocations(),
+            ).combine(phase_allocations)
+    return combined_profile
+
+
+def format_byte_size(byte_size: int) -> str:
+    """Render a byte count in the units that fit it."""
+    size = float(byte_size)
+    for unit in ('B', 'KiB', 'MiB'):
+        if abs(size) < 1024:
+            return f'{size:.1f} {unit!s}'
+        size /= 1024
+    return f'{size:.1f} GiB'
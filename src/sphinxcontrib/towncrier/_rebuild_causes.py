@@ -0,0 +1,115 @@
+"""Explanations of why the documents showing drafts get re-read.
+
+When enabled, the extension notes what made it mark each document for
+re-reading, like the change notes that appeared or a Git ref that
+moved. With the time it took to read the document again, that's logged
+and dumped into a JSON file at the end of the build.
+"""
+
+
+import json
+from pathlib import Path
+from typing import (
+    Dict, Iterable, List, Mapping, NamedTuple, Optional, Tuple, Union,
+)
+
+from ._atomic_write import write_file_atomically  # noqa: WPS436
+
+
+REBUILD_CAUSES_FILE_NAME = 'towncrier-rebuild-causes.json'
+MAX_DESCRIBED_INPUTS = 5
+FRAGMENT_CHANGE_KINDS = (
+    'fragment-added',
+    'fragment-removed',
+    'fragment-modified',
+    'fragment-touched',
+    'slice-changed',
+)
+
+
+class RebuildCause(NamedTuple):
+    """Something that made a document be re-read."""
+
+    kind: str
+    inputs: Tuple[str, ...] = ()
+
+    def describe(self) -> str:
+        """Summarize the cause for a log line."""
+        if not self.inputs:
+            return self.kind
+
+        described_inputs = ', '.join(self.inputs[:MAX_DESCRIBED_INPUTS])
+        if len(self.inputs) > MAX_DESCRIBED_INPUTS:
+            described_inputs += (
+                f' and {len(self.inputs) - MAX_DESCRIBED_INPUTS:d} more'
+            )
+        return f'{self.kind!s} ({described_inputs!s})'
+
+    def to_json(self) -> Dict[str, Union[str, List[str]]]:
+        """Represent the cause as JSON-serializable data."""
+        return {'kind': self.kind, 'inputs': list(self.inputs)}
+
+
+RebuildCauses = Dict[str, List[RebuildCause]]
+"""The reasons for re-reading keyed by the document name."""
+
+
+def classify_fragment_changes(
+        recorded_stamps: Mapping[str, Tuple[int, int]],
+        current_stamps: Mapping[str, Tuple[int, int]],
+        relative_paths: Optional[Iterable[str]] = None,
+) -> List[RebuildCause]:
+    """Tell the kinds of the change note changes apart.
+
+    A change note with a new modification time and the same size is
+    reported as touched since that's what a checkout or a tool
+    rewriting the file without changing it look like. The paths whose
+    stamps didn't change at all got in or out of a draft slice.
+    """
+    if relative_paths is None:
+        relative_paths = current_stamps.keys() | recorded_stamps.keys()
+
+    changed_paths: Dict[str, List[str]] = {}
+    for relative_path in sorted(relative_paths):
+        recorded_stamp = recorded_stamps.get(relative_path)
+        current_stamp = current_stamps.get(relative_path)
+        if recorded_stamp == current_stamp:
+            change_kind = 'slice-changed'
+        elif recorded_stamp is None:
+            change_kind = 'fragment-added'
+        elif current_stamp is None:
+            change_kind = 'fragment-removed'
+        elif recorded_stamp[1] != current_stamp[1]:
+            change_kind = 'fragment-modified'
+        else:
+            change_kind = 'fragment-touched'
+        changed_paths.setdefault(change_kind, []).append(relative_path)
+
+    return [
+        RebuildCause(change_kind, tuple(changed_paths[change_kind]))
+        for change_kind in FRAGMENT_CHANGE_KINDS
+        if change_kind in changed_paths
+    ]
+
+
+def write_rebuild_causes(
+        causes_path: Path,
+        rebuild_causes: RebuildCauses,
+        read_times: Mapping[str, float],
+) -> None:
+    """Store the rebuild causes replacing the old file atomically."""
+    causes_json = json.dumps(
+        {
+            'documents': {
+                docname: {
+                    'causes': [cause.to_json() for cause in doc_causes],
+                    'read_time': read_times.get(docname),
+                }
+                for docname, doc_causes in rebuild_causes.items()
+            },
+        },
+        indent=2,
+        sort_keys=True,
+    )
+
+    write_file_atomically(causes_path, causes_json.encode('utf-8'))
@@ -0,0 +1,193 @@
+"""Splitting the released changelog into per-release blocks.
+
+The changelog that towncrier keeps appending to only ever gets new
+release sections on top. The older ones never change so each of them
+can be parsed once and the nodes reused from then on. The sections are
+recognized by the adornment style towncrier uses for the release
+titles: the one of the first title mentioning a version or, failing
+that, the one following the document title. The releases are then
+nested into the sections that the titles before them have opened, like
+the whole file being parsed at once would do.
+"""
+
+
+import re
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+
+
+_ADORNMENT_REGEX = re.compile(r'^([!-/:-@\[-`{-~])\1*$')
+_VERSION_REGEX = re.compile(r'\bv?\d+(?:\.\d+)+')
+
+_TitleStyle = Tuple[str, bool]
+
+
+class ReleaseBlock(NamedTuple):
+    """A piece of the changelog with where it starts in the file."""
+
+    markup_source: str
+    line_offset: int = 0
+    section_depth: int = 0  # how many preamble sections it's nested in
+
+
+def _get_adornment_char(line: str) -> Optional[str]:
+    """Return the punctuation char a line consists of, if it does."""
+    stripped_line = line.rstrip()
+    if _ADORNMENT_REGEX.match(stripped_line) is None:
+        return None
+    return stripped_line[0]
+
+
+def _match_section_title(
+        lines: List[str],
+        line_number: int,
+) -> Optional[_TitleStyle]:
+    """Check if a section title starts at the line.
+
+    :returns: The adornment char of the title and if it is overlined
+        or :data:`None`.
+    """
+    overline_char = _get_adornment_char(lines[line_number])
+    if overline_char is not None and line_number + 2 < len(lines):
+        title_line = lines[line_number + 1]
+        if (
+                title_line.strip()
+                and _get_adornment_char(lines[line_number + 2])
+                == overline_char
+        ):
+            return overline_char, True
+
+    if (
+            line_number + 1 >= len(lines)
+            or not lines[line_number].strip()
+            or lines[line_number][:1].isspace()
+            or overline_char is not None
+    ):
+        return None
+
+    underline = lines[line_number + 1].rstrip()
+    underline_char = _get_adornment_char(underline)
+    if underline_char is None or len(underline) < len(
+            lines[line_number].rstrip(),
+    ):
+        return None
+    return underline_char, False
+
+
+class _SectionTitle(NamedTuple):
+    line_number: int
+    style: _TitleStyle
+    text: str
+
+
+def _iter_section_titles(
+        lines: List[str],
+        first_line: int,
+) -> Iterator[_SectionTitle]:
+    """Find the section titles following the line number given."""
+    previous_line_blank = True
+    line_number = first_line
+    while line_number < len(lines):
+        title_style = (
+            _match_section_title(lines, line_number)
+            if previous_line_blank else None
+        )
+        if title_style is not None:
+            overlined = title_style[1]
+            title_line = lines[line_number + 1 if overlined else line_number]
+            yield _SectionTitle(line_number, title_style, title_line.strip())
+            line_number += 3 if overlined else 2
+            previous_line_blank = False
+            continue
+        previous_line_blank = not lines[line_number].strip()
+        line_number += 1
+
+
+def _detect_release_title_style(
+        section_titles: List[_SectionTitle],
+) -> Optional[_TitleStyle]:
+    """Pick the adornment style of the release titles.
+
+    The first title naming a version tells it. Otherwise, a style that
+    is only used once at the top is that of the document title and the
+    releases are the next level.
+    """
+    for section_title in section_titles:
+        if _VERSION_REGEX.search(section_title.text) is not None:
+            return section_title.style
+
+    title_styles = [section_title.style for section_title in section_titles]
+    if not title_styles:
+        return None
+    if title_styles.count(title_styles[0]) == 1 and len(title_styles) > 1:
+        return title_styles[1]
+    return title_styles[0]
+
+
+def split_release_blocks(
+        changelog_text: str,
+        start_after: Optional[str] = None,
+) -> List[ReleaseBlock]:
+    """Cut the changelog into the preamble and the release sections.
+
+    With ``start_after``, only the text following the first line
+    containing it is split, similar to the ``include`` directive
+    option.
+    """
+    lines = changelog_text.splitlines()
+    first_line = 0
+    if start_after is not None:
+        first_line = next(
+            (
+                line_number + 1
+                for line_number, line in enumerate(lines)
+                if start_after in line
+            ),
+            len(lines),
+        )
+
+    section_titles = list(_iter_section_titles(lines, first_line))
+    release_title_style = _detect_release_title_style(section_titles)
+    release_starts = [
+        section_title.line_number
+        for section_title in section_titles
+        if section_title.style == release_title_style
+    ]
+    release_depth = _get_release_depth(
+        section_titles, release_title_style, release_starts,
+    )
+
+    block_starts = [first_line, *release_starts]
+    block_ends = [*block_starts[1:], len(lines)]
+    return [
+        ReleaseBlock(
+            markup_source='\n'.join(lines[block_start:block_end]),
+            line_offset=block_start,
+            section_depth=0 if block_start == first_line else release_depth,
+        )
+        for block_start, block_end in zip(block_starts, block_ends)
+        if any(line.strip() for line in lines[block_start:block_end])
+    ]
+
+
+def _get_release_depth(
+        section_titles: List[_SectionTitle],
+        release_title_style: Optional[_TitleStyle],
+        release_starts: List[int],
+) -> int:
+    """Count the levels of the preamble sections enclosing the releases.
+
+    The title styles get their levels in the order they first appear.
+    A release style already used in the preamble is on that level,
+    otherwise it is one level below the deepest preamble title.
+    """
+    first_release_line = release_starts[0] if release_starts else 0
+    preamble_styles: List[_TitleStyle] = []
+    for section_title in section_titles:
+        if section_title.line_number >= first_release_line:
+            break
+        if section_title.style not in preamble_styles:
+            preamble_styles.append(section_title.style)
+
+    if release_title_style in preamble_styles:
+        return preamble_styles.index(release_title_style)
+    return len(preamble_styles)
@@ -0,0 +1,410 @@
+"""Concurrent towncrier draft rendering.
+
+The drafts that the documents are going to need are found by scanning
+their sources before Sphinx reads them. Then towncrier gets invoked for
+all of them at once under a concurrency limit instead of one blocking
+subprocess per directive. Each towncrier run can be given a time
+budget, after which its whole process tree gets killed.
+"""
+
+
+import asyncio
+import io
+import locale
+import os
+import re
+import signal
+import subprocess  # noqa: S404
+import sys
+import tempfile
+import time
+from contextlib import suppress as suppress_exceptions
+from pathlib import Path
+from typing import (
+    IO, Dict, FrozenSet, Iterable, Iterator, List, NamedTuple, Optional, Set,
+    Tuple, Union,
+)
+
+from ._data_transformers import (  # noqa: WPS436
+    escape_project_version_rst_substitution,
+)
+from ._work_counters import (  # noqa: WPS436
+    TOWNCRIER_RENDERS_COUNTER, count_work,
+)
+
+
+DRAFT_DIRECTIVE_MARKER = 'towncrier-draft-entries::'
+DRAFT_DIRECTIVE_REGEX = re.compile(
+    r'^(?P<indent>[ \t]*)\.\.[ \t]+towncrier-draft-entries::'
+    r'(?P<argument>.*)$',
+    re.MULTILINE,
+)
+DRAFT_DIRECTIVE_OPTION_REGEX = re.compile(
+    r'(?P<indent>[ \t]+):(?P<name>[\w-]+):(?:[ \t]+(?P<value>.*))?',
+)
+IN_PROCESS_DRAFT_OPTIONS = frozenset((
+    'git-ref', 'max-entries', 'sections', 'shard-by', 'types',
+))
+"""Options that make the directive render the draft without towncrier."""
+FRAGMENT_READING_DRAFT_OPTIONS = frozenset((
+    'max-entries', 'sections', 'types',
+))
+"""Options making the directive read the change notes in the tree."""
+TOWNCRIER_OUTPUT_CHUNK_SIZE = 64 * 1024  # characters
+
+
+class DraftRenderJob(NamedTuple):
+    """The inputs of a single ``towncrier build --draft`` run."""
+
+    target_version: str
+    working_dir: Optional[str] = None
+    config_path: Optional[str] = None
+
+
+class DraftDirectiveUsage(NamedTuple):
+    """The draft directive invocations found in the document sources."""
+
+    directive_found: bool = False
+    towncrier_arguments: FrozenSet[Optional[str]] = frozenset()
+    reads_fragments: bool = False  # some directive reads the change notes
+
+
+DraftDirective = Tuple[Optional[str], Dict[str, str]]
+"""A draft directive argument, if any, along with its option values."""
+
+
+class DraftRenderResult(NamedTuple):
+    """The outcome of a towncrier run and how long it took."""
+
+    towncrier_output: Optional[str]
+    elapsed_time: float
+    timed_out: bool = False
+
+
+class TowncrierRenderTimeoutError(RuntimeError):
+    """Towncrier didn't render the draft within its time budget."""
+
+    def __init__(self, elapsed_time: float) -> None:
+        """Initialize the error with the time spent waiting."""
+        super().__init__(
+            'Towncrier did not render the draft in time, the process was '
+            f'killed after {elapsed_time:.2f}s',
+        )
+        self.elapsed_time = elapsed_time
+
+
+def kill_process_tree(process_id: int) -> None:
+    """Kill a process started in its own session with its children."""
+    if sys.platform == 'win32':
+        subprocess.run(  # noqa: S603, S607
+            ('taskkill', '/F', '/T', '/PID', str(process_id)),
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            check=False,
+        )
+        return
+
+    with suppress_exceptions(ProcessLookupError):
+        os.killpg(process_id, signal.SIGKILL)
+
+
+def read_stripped_text(
+        text_stream: IO[str],
+        chunk_size: int = TOWNCRIER_OUTPUT_CHUNK_SIZE,
+) -> str:
+    """Read a text stream dropping the surrounding whitespace.
+
+    The leading whitespace is skipped while reading and the trailing
+    one is held back until some text follows it, so that the result is
+    the only full copy of the text rather than a second one made by
+    stripping it.
+    """
+    text_chunks: List[str] = []
+    pending_whitespace = ''
+    while True:
+        text_chunk = text_stream.read(chunk_size)
+        if not text_chunk:
+            break
+        if not text_chunks:
+            text_chunk = text_chunk.lstrip()
+        stripped_chunk = text_chunk.rstrip()
+        if not stripped_chunk:
+            pending_whitespace += text_chunk
+            continue
+        if pending_whitespace:
+            text_chunks.append(pending_whitespace)
+        text_chunks.append(stripped_chunk)
+        pending_whitespace = text_chunk[len(stripped_chunk):]
+
+    return ''.join(text_chunks)
+
+
+def run_towncrier_process(
+        towncrier_cmd: Tuple[str, ...],
+        working_dir: Optional[str] = None,
+        timeout: Optional[float] = None,
+) -> 'subprocess.CompletedProcess[str]':
+    """Run towncrier killing its process tree on timeout.
+
+    The standard output goes to a temporary file rather than a pipe so
+    that a huge draft isn't accumulated in chunks and joined in memory.
+    It's only decoded once the process is done. The whitespace around
+    the draft is dropped while decoding it, the output of a failed run
+    is kept as is for reporting.
+
+    :raises TowncrierRenderTimeoutError: If ``timeout`` seconds pass
+        before the process exits.
+    """
+    count_work(TOWNCRIER_RENDERS_COUNTER)
+    started_at = time.monotonic()
+    with tempfile.TemporaryFile() as stdout_file:
+        with subprocess.Popen(  # noqa: S603
+                towncrier_cmd,
+                cwd=str(working_dir) if working_dir else None,
+                stdout=stdout_file,
+                stderr=subprocess.PIPE,
+                text=True,
+                start_new_session=True,  # for the process tree to be killable
+        ) as towncrier_proc:
+            try:
+                _stdout, stderr = towncrier_proc.communicate(timeout=timeout)
+            except subprocess.TimeoutExpired as timeout_exc:
+                kill_process_tree(towncrier_proc.pid)
+                towncrier_proc.communicate()
+                raise TowncrierRenderTimeoutError(
+                    time.monotonic() - started_at,
+                ) from timeout_exc
+
+            stdout_file.seek(0)
+            # Universal newlines, as in the text mode of ``subprocess``
+            with io.TextIOWrapper(
+                    stdout_file, encoding=locale.getpreferredencoding(False),
+            ) as stdout_text:
+                stdout = (
+                    stdout_text.read() if towncrier_proc.returncode
+                    else read_stripped_text(stdout_text)
+                )
+
+    return subprocess.CompletedProcess(
+        towncrier_cmd, towncrier_proc.returncode, stdout, stderr,
+    )
+
+
+def get_towncrier_draft_cli_args(
+        target_version: str,
+        config_path: Optional[str] = None,
+) -> Tuple[str, ...]:
+    """Assemble the towncrier CLI arguments for rendering a draft."""
+    extra_cli_args: Tuple[str, ...] = (
+        '--version',
+        # A version to be used in the RST title:
+        escape_project_version_rst_substitution(target_version),
+    )
+    if config_path is not None:
+        extra_cli_args += '--config', str(config_path)
+    return extra_cli_args
+
+
+def iter_draft_directives(
+        source_text: str,
+) -> Iterator[DraftDirective]:
+    """Find the draft directives along with their option values.
+
+    The directives without an argument are represented by
+    :data:`None`. The option values are left as they're written.
+    """
+    source_lines = source_text.splitlines()
+    for directive_match in DRAFT_DIRECTIVE_REGEX.finditer(source_text):
+        directive_indent = len(directive_match.group('indent'))
+        directive_options = {}
+        line_number = source_text.count('\n', 0, directive_match.start()) + 1
+        for option_line in source_lines[line_number:]:
+            option_match = DRAFT_DIRECTIVE_OPTION_REGEX.match(option_line)
+            if option_match is None or len(
+                    option_match.group('indent'),
+            ) <= directive_indent:
+                break
+            directive_options[option_match.group('name')] = (
+                option_match.group('value') or ''
+            ).strip()
+
+        yield (
+            directive_match.group('argument').strip() or None,
+            directive_options,
+        )
+
+
+def find_draft_directive_arguments(source_text: str) -> Set[Optional[str]]:
+    """Collect the arguments of the directives rendered via towncrier.
+
+    The directives without an argument are represented by
+    :data:`None`. The ones with options making them render in-process
+    are left out.
+    """
+    return {
+        directive_argument
+        for directive_argument, directive_options
+        in iter_draft_directives(source_text)
+        if not directive_options.keys() & IN_PROCESS_DRAFT_OPTIONS
+    }
+
+
+def read_draft_directives(
+        source_path: Union[str, Path],
+) -> Optional[Tuple[DraftDirective, ...]]:
+    """Find the draft directives in a document source.
+
+    :data:`None` is returned for the sources that cannot be read or
+    don't mention the directive name. The latter are skipped without
+    running any regular expressions over them.
+    """
+    try:
+        with open(source_path, encoding='utf-8') as source_file:
+            source_text = source_file.read()
+    except (OSError, UnicodeDecodeError):
+        return None
+    if DRAFT_DIRECTIVE_MARKER not in source_text:
+        return None
+    return tuple(iter_draft_directives(source_text))
+
+
+def summarize_draft_directive_usage(
+        source_directives: Iterable[Optional[Tuple[DraftDirective, ...]]],
+) -> DraftDirectiveUsage:
+    """Find out if and how many documents use the draft directive.
+
+    The directives of each source are as returned by
+    :func:`read_draft_directives`.
+    """
+    directive_found = False
+    directive_arguments: Set[Optional[str]] = set()
+    reads_fragments = False
+    for draft_directives in source_directives:
+        if draft_directives is None:
+            continue
+        directive_found = True
+        for directive_argument, directive_options in draft_directives:
+            if directive_options.keys() & FRAGMENT_READING_DRAFT_OPTIONS:
+                reads_fragments = True
+            if not directive_options.keys() & IN_PROCESS_DRAFT_OPTIONS:
+                directive_arguments.add(directive_argument)
+    return DraftDirectiveUsage(
+        directive_found=directive_found,
+        towncrier_arguments=frozenset(directive_arguments),
+        reads_fragments=reads_fragments,
+    )
+
+
+def scan_draft_directive_usage(
+        source_paths: Iterable[Union[str, Path]],
+) -> DraftDirectiveUsage:
+    """Find out if and how many documents use the draft directive."""
+    return summarize_draft_directive_usage(
+        map(read_draft_directives, source_paths),
+    )
+
+
+def get_render_concurrency(configured_concurrency: Optional[int]) -> int:
+    """Compute how many towncrier processes may run at the same time."""
+    if configured_concurrency is not None:
+        return max(1, configured_concurrency)
+    return os.cpu_count() or 1
+
+
+def _decode_towncrier_output(towncrier_stdout: bytes) -> str:
+    """Decode the output the way ``subprocess`` does in text mode."""
+    return towncrier_stdout.decode(
+        locale.getpreferredencoding(False),
+    ).replace('\r\n', '\n').replace('\r', '\n').strip()
+
+
+async def _render_draft(
+        render_job: DraftRenderJob,
+        towncrier_draft_cmd: Tuple[str, ...],
+        render_slots: asyncio.Semaphore,
+        timeout: Optional[float] = None,
+) -> Tuple[DraftRenderJob, DraftRenderResult]:
+    async with render_slots:
+        count_work(TOWNCRIER_RENDERS_COUNTER)
+        started_at = time.monotonic()
+        towncrier_proc = await asyncio.create_subprocess_exec(
+            *towncrier_draft_cmd,
+            *get_towncrier_draft_cli_args(
+                render_job.target_version,
+                render_job.config_path,
+            ),
+            cwd=render_job.working_dir or None,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+            start_new_session=True,  # for the process tree to be killable
+        )
+        try:
+            towncrier_stdout, _towncrier_stderr = await asyncio.wait_for(
+                towncrier_proc.communicate(), timeout,
+            )
+        except asyncio.TimeoutError:
+            kill_process_tree(towncrier_proc.pid)
+            await towncrier_proc.wait()
+            return render_job, DraftRenderResult(
+                towncrier_output=None,
+                elapsed_time=time.monotonic() - started_at,
+                timed_out=True,
+            )
+        elapsed_time = time.monotonic() - started_at
+
+    if towncrier_proc.returncode:
+        # Leave reporting the failure to the regular synchronous run
+        return render_job, DraftRenderResult(None, elapsed_time)
+    return render_job, DraftRenderResult(
+        _decode_towncrier_output(towncrier_stdout), elapsed_time,
+    )
+
+
+async def _render_drafts(
+        render_jobs: Iterable[DraftRenderJob],
+        towncrier_draft_cmd: Tuple[str, ...],
+        max_concurrency: int,
+        timeout: Optional[float] = None,
+) -> List[Tuple[DraftRenderJob, DraftRenderResult]]:
+    render_slots = asyncio.Semaphore(max_concurrency)
+    return await asyncio.gather(
+        *(
+            _render_draft(
+                render_job, towncrier_draft_cmd, render_slots, timeout,
+            )
+            for render_job in render_jobs
+        ),
+    )
+
+
+def render_towncrier_drafts(
+        render_jobs: Iterable[DraftRenderJob],
+        towncrier_draft_cmd: Tuple[str, ...],
+        max_concurrency: int = 1,
+        timeout: Optional[float] = None,
+) -> Dict[DraftRenderJob, DraftRenderResult]:
+    """Run towncrier for all the jobs concurrently.
+
+    The failed renders have no output in the result. They are expected
+    to be retried, and reported, by the directive itself. Each render
+    gets ``timeout`` seconds, counted from when it gets to start.
+    """
+    render_job_list = list(render_jobs)
+    if not render_job_list:
+        return {}
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        pass  # there's no loop to interfere with
+    else:
+        # Embedding Sphinx into an already running event loop
+        return {}
+
+    return dict(
+        asyncio.run(
+            _render_drafts(
+                render_job_list, towncrier_draft_cmd, max_concurrency, timeout,
+            ),
+        ),
+    )
@@ -0,0 +1,225 @@
+"""A thread-safe memoizing decorator with single-flight semantics.
+
+Unlike :func:`functools.lru_cache`, concurrent calls missing the same
+key don't all compute the result. The first caller does, and the
+others wait for it to finish and share its result, or its exception.
+"""
+
+
+import sys
+import threading
+import weakref
+from collections import OrderedDict
+from functools import update_wrapper
+from typing import (
+    Any, Callable, Dict, Generic, Hashable, Iterator, NamedTuple, Optional,
+    Tuple, TypeVar,
+)
+
+
+_ResultT = TypeVar('_ResultT')
+_CacheKey = Tuple[Hashable, ...]
+
+_KWARGS_MARK = object()  # separates positional and keyword args in keys
+
+
+class SingleFlightCacheInfo(NamedTuple):
+    """The counters of a single-flight cache."""
+
+    hits: int
+    misses: int
+    waits: int
+    maxsize: Optional[int]
+    currsize: int
+    maxbytes: Optional[int] = None
+    currbytes: int = 0
+
+
+class _Flight:
+    """A computation that other callers may be waiting for."""
+
+    __slots__ = ('done', 'error', 'result')
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.error: Optional[BaseException] = None
+        self.result: Any = None
+
+
+_registered_caches: 'weakref.WeakSet[SingleFlightCache[Any]]' = (
+    weakref.WeakSet()
+)
+
+
+class SingleFlightCache(Generic[_ResultT]):
+    """A bounded LRU cache where each key is only computed once at a time.
+
+    The ``hits`` counter is for the calls served from the cache, the
+    ``misses`` are the computations and the ``waits`` are the calls
+    that found the same key being computed by another thread. With
+    ``maxbytes`` set, the least recently used results are also evicted
+    once their total :func:`sys.getsizeof` exceeds it, and the results
+    bigger than that on their own aren't cached at all.
+    """
+
+    # Copied over from the cached function by update_wrapper()
+    __qualname__: str
+    __wrapped__: Callable[..., _ResultT]
+
+    def __init__(
+            self,
+            cached_function: Callable[..., _ResultT],
+            maxsize: Optional[int] = 128,
+            typed: bool = False,
+            maxbytes: Optional[int] = None,
+    ) -> None:
+        """Wrap a function for caching its results."""
+        update_wrapper(self, cached_function)
+        self._cached_function = cached_function
+        self._maxsize = maxsize
+        self._maxbytes = maxbytes
+        self._typed = typed
+        self._lock = threading.Lock()
+        self._results: 'OrderedDict[_CacheKey, _ResultT]' = OrderedDict()
+        self._result_sizes: Dict[_CacheKey, int] = {}
+        self._currbytes = 0
+        self._flights: Dict[_CacheKey, _Flight] = {}
+        self._hits = 0
+        self._misses = 0
+        self._waits = 0
+
+    def _make_key(
+            self,
+            args: Tuple[Any, ...],
+            kwargs: Dict[str, Any],
+    ) -> _CacheKey:
+        cache_key: _CacheKey = args
+        if kwargs:
+            cache_key += (_KWARGS_MARK, *kwargs.items())
+        if self._typed:
+            arg_types: _CacheKey = (
+                *map(type, args), *map(type, kwargs.values()),
+            )
+            cache_key += arg_types
+        return cache_key
+
+    def __call__(self, *args: Any, **kwargs: Any) -> _ResultT:
+        """Return the cached result or compute it once for all callers."""
+        cache_key = self._make_key(args, kwargs)
+        with self._lock:
+            try:
+                cached_result = self._results[cache_key]
+            except KeyError:
+                pass  # not computed yet
+            else:
+                self._hits += 1
+                self._results.move_to_end(cache_key)
+                return cached_result
+
+            flight = self._flights.get(cache_key)
+            is_computing = flight is None
+            if flight is None:
+                flight = self._flights[cache_key] = _Flight()
+                self._misses += 1
+            else:
+                self._waits += 1
+
+        if not is_computing:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = self._cached_function(*args, **kwargs)
+        except BaseException as computation_err:
+            flight.error = computation_err
+            raise
+        else:
+            self._store(cache_key, flight.result)
+        finally:
+            with self._lock:
+                del self._flights[cache_key]  # noqa: WPS420
+            flight.done.set()
+
+        return flight.result
+
+    def _store(self, cache_key: _CacheKey, cache_result: _ResultT) -> None:
+        if self._maxsize == 0:
+            return
+
+        result_size = 0
+        if self._maxbytes is not None:
+            result_size = sys.getsizeof(cache_result)
+            if result_size > self._maxbytes:
+                return
+
+        with self._lock:
+            self._currbytes += result_size - self._result_sizes.get(
+                cache_key, 0,
+            )
+            self._results[cache_key] = cache_result
+            self._result_sizes[cache_key] = result_size
+            self._results.move_to_end(cache_key)
+            while (
+                    self._maxsize is not None
+                    and len(self._results) > self._maxsize
+            ) or (
+                    self._maxbytes is not None
+                    and self._currbytes > self._maxbytes
+            ):
+                evicted_key, _evicted_result = self._results.popitem(
+                    last=False,
+                )
+                self._currbytes -= self._result_sizes.pop(evicted_key)
+
+    def cache_info(self) -> SingleFlightCacheInfo:
+        """Report the cache statistics."""
+        with self._lock:
+            return SingleFlightCacheInfo(
+                hits=self._hits,
+                misses=self._misses,
+                waits=self._waits,
+                maxsize=self._maxsize,
+                currsize=len(self._results),
+                maxbytes=self._maxbytes,
+                currbytes=self._currbytes,
+            )
+
+    def cache_clear(self) -> None:
+        """Drop the cached results and reset the statistics."""
+        with self._lock:
+            self._results.clear()
+            self._result_sizes.clear()
+            self._currbytes = 0
+            self._hits = 0
+            self._misses = 0
+            self._waits = 0
+
+
+def single_flight_cache(
+        maxsize: Optional[int] = 128,
+        typed: bool = False,
+        maxbytes: Optional[int] = None,
+) -> Callable[[Callable[..., _ResultT]], SingleFlightCache[_ResultT]]:
+    """Memoize a function like :func:`functools.lru_cache` does.
+
+    The wrapper is thread-safe and runs the function once per key even
+    when many threads call it concurrently. The cached results can be
+    capped by their total size in bytes too.
+    """
+    def _decorate(
+            cached_function: Callable[..., _ResultT],
+    ) -> SingleFlightCache[_ResultT]:
+        single_flight_wrapper = SingleFlightCache(
+            cached_function, maxsize=maxsize, typed=typed, maxbytes=maxbytes,
+        )
+        _registered_caches.add(single_flight_wrapper)
+        return single_flight_wrapper
+
+    return _decorate
+
+
+def iter_single_flight_caches() -> Iterator[SingleFlightCache[Any]]:
+    """Iterate over all the caches created with the decorator."""
+    return iter(list(_registered_caches))
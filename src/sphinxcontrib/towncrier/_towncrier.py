@@ -1,49 +1,74 @@
 """Towncrier related shims."""
 
-from contextlib import suppress as suppress_exceptions
+import dataclasses
+import os
+import re
+import sys
+import time
+from collections import defaultdict
+from datetime import date
+from fnmatch import fnmatch
+from importlib import resources
+from importlib.metadata import version as _get_installed_project_version
 from pathlib import Path
-from typing import Set, Union
+from typing import (
+    Callable, Dict, FrozenSet, Iterable, List, Mapping, NamedTuple, Optional,
+    Tuple, Union,
+)
 
+from towncrier import _builder as towncrier_builder  # noqa: WPS436
+from towncrier._builder import (  # noqa: WPS436
+    bullet_key, entry_key, issue_key, parse_newfragment_basename,
+    render_fragments, render_issue, split_fragments,
+)
 from towncrier._settings.load import Config  # noqa: WPS436
 from towncrier._settings.load import load_config_from_file  # noqa: WPS436
+from towncrier._settings.load import parse_toml  # noqa: WPS436
 from towncrier._settings.load import (  # noqa: WPS436
     ConfigError as TowncrierConfigError,
 )
-from towncrier.build import find_fragments
 
 
-def find_towncrier_fragments(
-        base_directory: str,
-        towncrier_config: Config,
-) -> Set[str]:
-    """Look up the change note file paths."""
-    with suppress_exceptions(TypeError):
-        # Towncrier >= 24.7.0rc1
-        _fragments, fragment_filenames = find_fragments(
-            base_directory=base_directory,
-            config=towncrier_config,
-            strict=False,
-        )
+if sys.version_info >= (3, 11):
+    import tomllib  # noqa: WPS433
+else:
+    import tomli as tomllib  # noqa: WPS433, WPS440
 
-        return {fname[0] for fname in fragment_filenames}
 
-    # Towncrier < 24.7.0rc1
-    try:
-        # pylint: disable-next=no-value-for-parameter,unexpected-keyword-arg
-        _fragments, fragment_filenames = find_fragments(  # noqa: WPS121
-            base_directory=base_directory,
-            sections=towncrier_config.sections,
-            fragment_directory=towncrier_config.directory,
-            frag_type_names=towncrier_config.types,
-            orphan_prefix='+',
-        )
-    except TowncrierConfigError as lookup_err:
-        raise LookupError(
-            'Towncrier was unable to perform change note lookup: '
-            f'{lookup_err !s}',
-        ) from lookup_err
+TOWNCRIER_VERSION = _get_installed_project_version('towncrier')
+
+FragmentKey = Tuple[str, str, int]
+"""A change note issue, type and counter."""
 
-    return set(fragment_filenames)
+FragmentContents = Dict[str, Dict[FragmentKey, str]]
+"""Fragment texts keyed by section and (issue, type, counter)."""
+
+DraftEntries = Dict[str, Dict[str, List[Tuple[str, List[str]]]]]
+"""Entry texts with rendered issues keyed by section and type."""
+
+FragmentCategories = Dict[Path, Tuple[str, str]]
+"""Section and type names keyed by the change note path."""
+
+IGNORED_FRAGMENT_FILE_NAMES = frozenset((
+    '.gitignore',
+    '.gitkeep',
+    '.keep',
+    'readme',
+    'readme.md',
+    'readme.rst',
+))
+RESOURCE_TEMPLATE_REGEX = re.compile(r'[-\w.]+:[-\w.]+$')
+STOCK_RST_TEMPLATES = frozenset((
+    ('towncrier', 'default.rst'),
+    ('towncrier.templates', 'default.rst'),
+))
+
+# Towncrier < 23.10 doesn't have this helper
+_append_newlines_if_trailing_code_block: Callable[[str], str] = getattr(
+    towncrier_builder,
+    'append_newlines_if_trailing_code_block',
+    lambda entry_text: entry_text,
+)
 
 
 def get_towncrier_config(
@@ -53,8 +78,483 @@ def get_towncrier_config(
     """Return the towncrier config in native format."""
     try:
         return load_config_from_file(str(project_path), str(final_config_path))
-    except (FileNotFoundError, TowncrierConfigError) as config_load_err:
+    except (
+            FileNotFoundError, TowncrierConfigError, tomllib.TOMLDecodeError,
+    ) as config_load_err:
         raise LookupError(
             'Towncrier was unable to load the configuration from file '
             f'`{final_config_path !s}`: {config_load_err !s}',
         ) from config_load_err
+
+
+def apply_project_metadata_fallbacks(
+        towncrier_config: Config,
+        project_path: Path,
+        pyproject_source: Optional[str] = None,
+) -> Config:
+    """Fill in the project name from the ``pyproject.toml`` metadata.
+
+    This is what towncrier does when it discovers the config file on
+    its own rather than getting it passed explicitly. The file is read
+    from the project dir unless its ``pyproject_source`` is passed in.
+    """
+    if towncrier_config.package and towncrier_config.name:
+        return towncrier_config
+
+    try:
+        if pyproject_source is None:
+            pyproject_source = (project_path / 'pyproject.toml').read_text(
+                encoding='utf-8',
+            )
+        project_name = tomllib.loads(pyproject_source).get(
+            'project', {},
+        ).get('name', '')
+    except (OSError, tomllib.TOMLDecodeError):
+        return towncrier_config
+
+    if not project_name:
+        return towncrier_config
+
+    package_name = towncrier_config.package or project_name
+    return dataclasses.replace(
+        towncrier_config,
+        package=package_name,
+        name=towncrier_config.name or package_name,
+    )
+
+
+def parse_towncrier_config(
+        project_path: Path,
+        config_source: str,
+) -> Tuple[Config, Optional[str]]:
+    """Parse the towncrier config from a TOML string.
+
+    Unlike :py:func:`get_towncrier_config`, this doesn't require the
+    config nor the template to exist on disk. A file-based template is
+    returned separately as a project-relative path.
+    """
+    try:
+        config_data = tomllib.loads(config_source)
+    except tomllib.TOMLDecodeError as toml_err:
+        raise LookupError(
+            f'Towncrier was unable to parse the configuration: {toml_err !s}',
+        ) from toml_err
+
+    towncrier_section = config_data.get('tool', {}).get('towncrier', {})
+    template_path = towncrier_section.get('template')
+    if template_path is None or RESOURCE_TEMPLATE_REGEX.match(template_path):
+        template_path = None
+    else:
+        # Drop the template path so that towncrier wouldn't look for
+        # it on disk, it's reinstated in the resulting config below
+        towncrier_section = dict(towncrier_section)
+        del towncrier_section['template']  # noqa: WPS420
+        config_data = {**config_data, 'tool': {'towncrier': towncrier_section}}
+
+    try:
+        towncrier_config = parse_toml(str(project_path), config_data)
+    except TowncrierConfigError as config_parse_err:
+        raise LookupError(
+            'Towncrier was unable to load the configuration: '
+            f'{config_parse_err !s}',
+        ) from config_parse_err
+
+    if template_path is not None:
+        towncrier_config = dataclasses.replace(
+            towncrier_config,
+            template=str(project_path / template_path),
+        )
+
+    return towncrier_config, template_path
+
+
+def get_fragment_section_dirs(
+        towncrier_config: Config,
+) -> Dict[str, str]:
+    """Map the towncrier sections to project-relative fragment dirs."""
+    if towncrier_config.directory is not None:
+        base_dir = towncrier_config.directory
+        append_dir = ''
+    else:
+        base_dir = os.path.join(
+            towncrier_config.package_dir, towncrier_config.package,
+        )
+        append_dir = 'newsfragments'
+
+    return {
+        section_name: os.path.normpath(
+            os.path.join(base_dir, section_dir, append_dir),
+        )
+        for section_name, section_dir in towncrier_config.sections.items()
+    }
+
+
+def parse_fragment_file_names(
+        towncrier_config: Config,
+        file_names: Iterable[str],
+) -> Dict[FragmentKey, str]:
+    """Identify change notes by their file names like towncrier does.
+
+    The files that towncrier would ignore or fail to parse are left
+    out of the result mapping. The names that would make ``towncrier
+    build`` fail are reported with the same errors.
+
+    :raises LookupError: If a file name is invalid while the ``ignore``
+        setting is present, if an issue doesn't match the configured
+        ``issue_pattern`` or if two files are of the same change note.
+    """
+    ignored_file_names = getattr(towncrier_config, 'ignore', None)
+    ignored_file_patterns = set(IGNORED_FRAGMENT_FILE_NAMES)
+    if isinstance(towncrier_config.template, str):
+        ignored_file_patterns.add(os.path.basename(towncrier_config.template))
+    ignored_file_patterns.update(
+        file_name.lower() for file_name in ignored_file_names or ()
+    )
+    orphan_prefix = getattr(towncrier_config, 'orphan_prefix', '+')
+    issue_pattern = getattr(towncrier_config, 'issue_pattern', '')
+
+    orphan_counters: Dict[str, int] = defaultdict(int)
+    fragment_file_names: Dict[FragmentKey, str] = {}
+    for file_name in sorted(file_names):
+        if any(
+                fnmatch(file_name.lower(), ignored_pattern)
+                for ignored_pattern in ignored_file_patterns
+        ):
+            continue
+
+        issue, category, counter = parse_newfragment_basename(
+            file_name, towncrier_config.types,
+        )
+        if issue is None or category is None or counter is None:
+            if ignored_file_names is not None:
+                raise LookupError(
+                    f'Invalid news fragment name: {file_name !s}\n'
+                    'If this filename is deliberate, add it to '
+                    "'ignore' in your configuration.",
+                )
+            continue
+
+        if orphan_prefix and issue.startswith(orphan_prefix):
+            issue = ''
+            counter = orphan_counters[category]
+            orphan_counters[category] += 1
+
+        if issue and issue_pattern and not re.fullmatch(issue_pattern, issue):
+            raise LookupError(
+                f"Issue name '{issue !s}' does not match the configured "
+                f"pattern, '{issue_pattern !s}'",
+            )
+
+        fragment_key = issue, category, counter
+        if fragment_key in fragment_file_names:
+            raise LookupError(
+                f'Multiple files for {issue !s}.{category !s}: '
+                f'`{fragment_file_names[fragment_key] !s}` and '
+                f'`{file_name !s}`',
+            )
+        fragment_file_names[fragment_key] = file_name
+
+    return fragment_file_names
+
+
+def find_fragment_files(
+        project_path: Path,
+        towncrier_config: Config,
+        dir_file_names: Optional[Mapping[str, Iterable[str]]] = None,
+) -> Dict[str, Dict[FragmentKey, Path]]:
+    """Locate the change note files without reading them.
+
+    The fragment dirs are listed unless their listings keyed by the
+    project-relative dir paths are passed in ``dir_file_names``.
+    """
+    section_fragment_files = {}
+    for section_name, section_dir in get_fragment_section_dirs(
+            towncrier_config,
+    ).items():
+        section_path = Path(os.path.abspath(project_path / section_dir))
+        if dir_file_names is not None and section_dir in dir_file_names:
+            file_names = list(dir_file_names[section_dir])
+        else:
+            try:
+                file_names = os.listdir(section_path)
+            except (FileNotFoundError, NotADirectoryError):
+                file_names = []
+
+        section_fragment_files[section_name] = {
+            fragment_key: section_path / file_name
+            for fragment_key, file_name in parse_fragment_file_names(
+                towncrier_config, file_names,
+            ).items()
+        }
+
+    return section_fragment_files
+
+
+def categorize_fragment_files(
+        section_fragment_files: Mapping[str, Mapping[FragmentKey, Path]],
+) -> FragmentCategories:
+    """Map each change note path to its section and type."""
+    return {
+        fragment_path: (section_name, fragment_key[1])
+        for section_name, fragment_paths in section_fragment_files.items()
+        for fragment_key, fragment_path in fragment_paths.items()
+    }
+
+
+def collect_fragment_contents(
+        towncrier_config: Config,
+        section_files: Mapping[str, Mapping[str, str]],
+) -> FragmentContents:
+    """Arrange fragment file texts the way ``find_fragments`` does.
+
+    The ``section_files`` argument maps each section name to a mapping
+    of fragment file base names to their contents.
+    """
+    return {
+        section_name: {
+            fragment_key: section_files[section_name][file_name]
+            for fragment_key, file_name in parse_fragment_file_names(
+                towncrier_config, section_files.get(section_name, {}),
+            ).items()
+        }
+        for section_name in towncrier_config.sections
+    }
+
+
+def load_towncrier_template(
+        towncrier_config: Config,
+        template_source: Optional[str] = None,
+) -> Tuple[str, bool]:
+    """Retrieve the template text and whether it's Markdown."""
+    template = towncrier_config.template
+    if isinstance(template, tuple):
+        package_name, resource_name = template
+        template_file_name = resource_name
+        if template_source is None:
+            template_source = resources.files(  # noqa: WPS437
+                package_name,
+            ).joinpath(resource_name).read_text(encoding='utf-8')
+    else:
+        template_file_name = template
+        if template_source is None:
+            template_source = Path(template).read_text(encoding='utf-8')
+
+    is_markdown = Path(template_file_name).suffix.lower() == '.md'
+    return template_source, is_markdown
+
+
+def get_template_path(towncrier_config: Config) -> Optional[Path]:
+    """Locate the template file, unless it's not a regular file."""
+    template = towncrier_config.template
+    if not isinstance(template, tuple):
+        return Path(template)
+
+    package_name, resource_name = template
+    template_resource = resources.files(package_name).joinpath(resource_name)
+    return template_resource if isinstance(template_resource, Path) else None
+
+
+def _get_project_name(towncrier_config: Config) -> str:
+    """Compute the project name without importing the project package.
+
+    Towncrier imports the package to look for an Incremental version
+    object carrying the name but falls back to a title-cased package
+    name otherwise, which is what this returns.
+    """
+    return towncrier_config.name or towncrier_config.package.title()
+
+
+def get_build_date() -> str:
+    """Compute the build date honoring ``SOURCE_DATE_EPOCH``."""
+    build_timestamp = int(os.environ.get('SOURCE_DATE_EPOCH', time.time()))
+    return date.fromtimestamp(build_timestamp).isoformat()
+
+
+# pylint: disable-next=too-many-locals
+def render_towncrier_draft(  # noqa: WPS210
+        towncrier_config: Config,
+        fragment_contents: FragmentContents,
+        project_version: str,
+        template_source: Optional[str] = None,
+) -> str:
+    """Render the changelog draft in-process like ``towncrier build``."""
+    template_text, is_markdown = load_towncrier_template(
+        towncrier_config, template_source,
+    )
+    project_name = _get_project_name(towncrier_config)
+    project_date = get_build_date()
+    title_format = towncrier_config.title_format
+    render_title = title_format == ''
+
+    split_fragment_contents = split_fragments(
+        fragment_contents,
+        towncrier_config.types,
+        all_bullets=towncrier_config.all_bullets,
+    )
+    render_kwargs = {
+        'top_underline': towncrier_config.underlines[0],
+        'all_bullets': towncrier_config.all_bullets,
+        'render_title': render_title,
+    }
+    if is_markdown:
+        title_level_match = re.search(
+            r'^#+(?=\s)', title_format or '', re.MULTILINE,
+        )
+        render_kwargs['md_header_level'] = (
+            len(title_level_match[0]) if title_level_match
+            else int(render_title)
+        )
+
+    render_args = (
+        template_text,
+        towncrier_config.issue_format,
+        split_fragment_contents,
+        towncrier_config.types,
+        towncrier_config.underlines[1:],
+        towncrier_config.wrap,
+        {
+            'name': project_name,
+            'version': project_version,
+            'date': project_date,
+        },
+    )
+    try:
+        rendered_draft = render_fragments(*render_args, **render_kwargs)
+    except TypeError:
+        # Towncrier < 23.10 doesn't support Markdown header levels
+        render_kwargs.pop('md_header_level', None)
+        rendered_draft = render_fragments(*render_args, **render_kwargs)
+
+    if not title_format:
+        return rendered_draft
+
+    top_line = title_format.format(
+        name=project_name,
+        version=project_version,
+        project_date=project_date,
+    )
+    title_lines = (
+        [top_line] if is_markdown
+        else [top_line, towncrier_config.underlines[0] * len(top_line)]
+    )
+    return '\n'.join((*title_lines, rendered_draft))
+
+
+def is_stock_towncrier_template(towncrier_config: Config) -> bool:
+    """Check if the draft would be rendered by the stock RST template."""
+    return (
+        isinstance(towncrier_config.template, tuple)
+        and tuple(towncrier_config.template) in STOCK_RST_TEMPLATES
+        and towncrier_config.all_bullets
+    )
+
+
+def arrange_draft_entries(
+        towncrier_config: Config,
+        fragment_contents: FragmentContents,
+) -> DraftEntries:
+    """Sort and group the fragments like ``render_fragments`` does.
+
+    This produces the same data that towncrier feeds into the template
+    but without rendering it.
+    """
+    split_fragment_contents = split_fragments(
+        fragment_contents,
+        towncrier_config.types,
+        all_bullets=towncrier_config.all_bullets,
+    )
+
+    draft_entries: DraftEntries = {}
+    for section_name, section_fragments in split_fragment_contents.items():
+        section_entries = draft_entries.setdefault(section_name, {})
+        for category_name in towncrier_config.types:
+            if category_name not in section_fragments:
+                continue
+
+            entries = [
+                (entry_text, sorted(issues, key=issue_key))
+                for entry_text, issues in section_fragments[
+                    category_name
+                ].items()
+            ]
+            entries.sort(key=entry_key)
+            if not towncrier_config.all_bullets:
+                entries.sort(key=bullet_key)
+
+            section_entries[category_name] = [
+                (
+                    _append_newlines_if_trailing_code_block(entry_text),
+                    [
+                        render_issue(towncrier_config.issue_format, issue)
+                        for issue in issues
+                    ],
+                )
+                for entry_text, issues in entries
+            ]
+
+    return draft_entries
+
+
+class DraftSlice(NamedTuple):
+    """A subset of the draft sections and change types.
+
+    Either of the name sets being :data:`None` means that nothing is
+    left out on that level.
+    """
+
+    sections: Optional[FrozenSet[str]] = None
+    types: Optional[FrozenSet[str]] = None
+
+    def includes(self, section_name: str, category_name: str) -> bool:
+        """Check if the slice covers the given section and type."""
+        return (
+            (self.sections is None or section_name in self.sections)
+            and (self.types is None or category_name in self.types)
+        )
+
+    def select_paths(
+            self,
+            fragment_categories: FragmentCategories,
+    ) -> List[Path]:
+        """Pick the change note paths that fall into the slice."""
+        return [
+            fragment_path
+            for fragment_path, (section_name, category_name)
+            in fragment_categories.items()
+            if self.includes(section_name, category_name)
+        ]
+
+    def apply(self, draft_entries: DraftEntries) -> DraftEntries:
+        """Cut the slice out of the arranged draft entries."""
+        return {
+            section_name: {
+                category_name: category_entries
+                for category_name, category_entries in section_entries.items()
+                if self.types is None or category_name in self.types
+            }
+            for section_name, section_entries in draft_entries.items()
+            if self.sections is None or section_name in self.sections
+        }
+
+
+def get_draft_title(
+        towncrier_config: Config,
+        project_version: str,
+) -> Optional[str]:
+    """Compute the draft title the stock template would produce."""
+    title_format = towncrier_config.title_format
+    if title_format is False:
+        return None
+
+    project_name = _get_project_name(towncrier_config)
+    project_date = get_build_date()
+    if title_format:
+        return title_format.format(
+            name=project_name,
+            version=project_version,
+            project_date=project_date,
+        )
+
+    if project_name:
+        return f'{project_name} {project_version} ({project_date})'
+    return f'{project_version} ({project_date})'
@@ -0,0 +1,72 @@
+"""Counters of the costly work done while building the docs.
+
+Running towncrier and listing the change note directories are what the
+caches and the rendering ahead of reading are there to avoid repeating.
+Each process counts how many times it's done either of them. A forked
+reader starts from zero and passes its counts on to the main process
+through the env, so the totals show if the parallel readers have
+redone any of that work.
+"""
+
+
+import os
+import threading
+from collections import Counter
+from secrets import token_hex
+from typing import Dict, Iterable
+
+
+TOWNCRIER_RENDERS_COUNTER = 'towncrier-renders'
+FRAGMENT_SCANS_COUNTER = 'fragment-scans'
+WORK_COUNTER_NAMES = (TOWNCRIER_RENDERS_COUNTER, FRAGMENT_SCANS_COUNTER)
+
+WorkCounts = Dict[str, int]
+"""The number of times each kind of work has been done."""
+
+_work_counts: 'Counter[str]' = Counter()
+_work_counts_lock = threading.Lock()
+_process_key = f'{os.getpid():d}-{token_hex(4)!s}'
+
+
+def _forget_parent_counts() -> None:
+    """Make a forked reader only count its own work."""
+    global _process_key  # noqa: WPS420  # pylint: disable=global-statement
+
+    _work_counts.clear()
+    # The process IDs of the exited readers get reused
+    _process_key = f'{os.getpid():d}-{token_hex(4)!s}'
+
+
+if hasattr(os, 'register_at_fork'):  # noqa: WPS421
+    os.register_at_fork(after_in_child=_forget_parent_counts)
+
+
+def count_work(counter_name: str) -> None:
+    """Account for another piece of work of a kind."""
+    with _work_counts_lock:
+        _work_counts[counter_name] += 1
+
+
+def get_work_counts() -> WorkCounts:
+    """Return what this process has done so far."""
+    with _work_counts_lock:
+        return dict(_work_counts)
+
+
+def get_process_key() -> str:
+    """Identify this process among the ones taking part in the build."""
+    return _process_key
+
+
+def reset_work_counts() -> None:
+    """Start counting from zero, like at the start of a build."""
+    with _work_counts_lock:
+        _work_counts.clear()
+
+
+def combine_work_counts(process_counts: Iterable[WorkCounts]) -> WorkCounts:
+    """Sum up the work done by all the processes."""
+    combined_counts: 'Counter[str]' = Counter()
+    for work_counts in process_counts:
+        combined_counts.update(work_counts)
+    return dict(combined_counts)
@@ -1,21 +1,29 @@
 """Sphinx extension for injecting an unreleased changelog into docs."""
 
 
+import heapq
+import json
+import os
 import shlex
-import subprocess  # noqa: S404
 import sys
+import time
 from collections.abc import Set
 from contextlib import suppress as suppress_exceptions
-from functools import lru_cache
-from pathlib import Path
-from typing import Dict, List, Literal, Optional, Tuple, Union
+from pathlib import Path, PurePosixPath
+from secrets import token_hex
+from typing import (
+    Dict, FrozenSet, Iterable, List, Literal, Mapping, Optional, Tuple,
+    Union,
+)
 
+from sphinx import __display_version__ as sphinx_version
 from sphinx.application import Sphinx
+from sphinx.config import ENUM
 from sphinx.config import Config as SphinxConfig
 from sphinx.environment import BuildEnvironment
 from sphinx.environment.collectors import EnvironmentCollector
 from sphinx.util import logging
-from sphinx.util.docutils import SphinxDirective
+from sphinx.util.docutils import SphinxDirective, directives
 from sphinx.util.nodes import nested_parse_with_titles, nodes
 
 
@@ -23,17 +31,98 @@ from sphinx.util.nodes import nested_parse_with_titles, nodes
 
 
 # Ref: https://github.com/PyCQA/pylint/issues/3817
+from docutils import __version__ as docutils_version
 from docutils import statemachine  # pylint: disable=wrong-import-order
 from docutils.parsers.rst.states import RSTState
+from towncrier._settings.load import Config  # noqa: WPS436
 
+from ._atomic_write import write_file_atomically  # noqa: WPS436
+from ._call_profile import (  # noqa: WPS436
+    merge_call_profiles, profile_calls, profiled, start_call_profiles,
+)
 from ._data_transformers import (  # noqa: WPS436
-    escape_project_version_rst_substitution,
+    escape_project_version_rst_substitution, iter_markup_lines,
+)
+from ._draft_cache import (  # noqa: WPS436
+    DEFAULT_DRAFT_CACHE_MAX_AGE, DEFAULT_DRAFT_CACHE_MAX_SIZE,
+    SharedDraftCache, compute_draft_cache_key, get_default_draft_cache_dir,
+)
+from ._doctree_cache import (  # noqa: WPS436
+    DOCTREE_CACHE_DIR_NAME, DOCTREE_CACHE_FORMAT_VERSION,
+    RELEASE_DOCTREE_CACHE_DIR_NAME,
+    RELEASE_DOCTREE_CACHE_MAX_SIZE, dump_draft_nodes, load_draft_nodes,
+)
+from ._draft_nodes import DraftUnitCache, build_draft_nodes  # noqa: WPS436
+from ._draft_shards import (  # noqa: WPS436
+    OVERFLOW_OPTION_NAME, SHARD_DIMENSIONS, SHARD_OPTION_NAME,
+    find_paged_draft_directives, get_draft_shards, get_overflow_page_name,
+    get_shard_titles, parse_shard_names, render_overflow_page_source,
+    render_shard_toctree, sync_generated_pages,
+)
+from ._fragment_discovery import (  # noqa: WPS436
+    GitRefDraftInputs, TowncrierFragmentContents, TowncrierWatchedInputs,
+    lookup_towncrier_config, lookup_towncrier_fragment_categories,
+    lookup_towncrier_fragment_contents, lookup_towncrier_fragments,
+    lookup_towncrier_fragments_in_git, lookup_towncrier_watched_inputs,
+    reset_reported_lookup_failures, resolve_project_path,
+)
+from ._fragment_io import get_fragment_read_workers  # noqa: WPS436
+from ._fragment_manifest import FRAGMENT_MANIFEST_FILE_NAME  # noqa: WPS436
+from ._fragment_paths import FragmentPathSet, FragmentStamps  # noqa: WPS436
+from ._git_objects import resolve_git_commit  # noqa: WPS436
+from ._git_refs import get_scm_version, stat_version_refs  # noqa: WPS436
+from ._memory_profile import (  # noqa: WPS436
+    MEMORY_PROFILE_PHASES, combine_phase_profiles, format_byte_size,
+    get_phase_allocations, is_memory_profile_requested, start_memory_profile,
+    stop_memory_profile, track_phase_allocations,
+)
+from ._rebuild_causes import (  # noqa: WPS436
+    REBUILD_CAUSES_FILE_NAME, RebuildCause, RebuildCauses,
+    classify_fragment_changes, write_rebuild_causes,
+)
+from ._release_history import split_release_blocks  # noqa: WPS436
+from ._render_scheduler import (  # noqa: WPS436
+    DraftDirective, DraftDirectiveUsage, DraftRenderJob, DraftRenderResult,
+    TowncrierRenderTimeoutError, get_render_concurrency,
+    get_towncrier_draft_cli_args, render_towncrier_drafts,
+    read_draft_directives, run_towncrier_process,
+    summarize_draft_directive_usage,
+)
+from ._single_flight import (  # noqa: WPS436
+    iter_single_flight_caches, single_flight_cache,
+)
+from ._towncrier import (  # noqa: WPS436
+    TOWNCRIER_VERSION, DraftEntries, DraftSlice, FragmentCategories,
+    get_build_date, get_draft_title, is_stock_towncrier_template,
+    load_towncrier_template, render_towncrier_draft,
 )
-from ._fragment_discovery import lookup_towncrier_fragments  # noqa: WPS436
 from ._version import __version__  # noqa: WPS436
+from ._work_counters import (  # noqa: WPS436
+    TOWNCRIER_RENDERS_COUNTER, WORK_COUNTER_NAMES, WorkCounts,
+    combine_work_counts, count_work, get_process_key, get_work_counts,
+    reset_work_counts,
+)
 
 
 PROJECT_ROOT_DIR = Path(__file__).parents[3].resolve()
+DRAFT_VERSION_PLACEHOLDER = '[UNRELEASED DRAFT]'
+SCM_AUTOVERSION_STRATEGIES = frozenset(('scm', 'scm-draft'))
+WATCHED_INPUTS_FILE_NAME = 'towncrier-watched-inputs.json'
+DRAFT_TEXT_CACHE_MAX_BYTES = 32 * 1024 * 1024  # per rendering path
+RENDER_TIMEOUT_PLACEHOLDER_TEXT = (
+    'The unreleased changelog entries could not be rendered in time.'
+)
+DOCTREE_PARSER_SETTINGS = (  # docutils settings affecting the parsed nodes
+    'character_level_inline_markup',
+    'file_insertion_enabled',
+    'language_code',
+    'pep_references',
+    'raw_enabled',
+    'rfc_references',
+    'syntax_highlight',
+    'tab_width',
+    'trim_footnote_reference_space',
+)
 TOWNCRIER_DRAFT_CMD = (
     sys.executable, '-m',  # invoke via runpy under the same interpreter
     'towncrier',
@@ -44,42 +133,132 @@ TOWNCRIER_DRAFT_CMD = (
 
 logger = logging.getLogger(__name__)
 
+_towncrier_draft_renders: Dict[DraftRenderJob, DraftRenderResult] = {}
+_rebuild_causes: RebuildCauses = {}
+_read_started_at: Dict[str, float] = {}
+
+
+def _report_render_time(target_version: str, elapsed_time: float) -> None:
+    logger.verbose(
+        f'Towncrier rendered the draft for {target_version!r} '
+        f'in {elapsed_time:.2f}s',
+    )
 
-@lru_cache(typed=True)
-def _get_changelog_draft_entries(
+
+def _run_towncrier_draft(
         target_version: str,
-        allow_empty: bool = False,
         working_dir: Optional[str] = None,
         config_path: Optional[str] = None,
+        timeout: Optional[float] = None,
 ) -> str:
-    """Retrieve the unreleased changelog entries from Towncrier."""
-    extra_cli_args: Tuple[str, ...] = (
-        '--version',
-        # A version to be used in the RST title:
-        escape_project_version_rst_substitution(target_version),
-    )
-    if config_path is not None:
-        extra_cli_args += '--config', str(config_path)
+    """Render the unreleased changelog entries with Towncrier.
+
+    The drafts that have been rendered concurrently ahead of reading
+    the documents are taken from there instead. Once a render times
+    out, the other directives needing it fail right away rather than
+    waiting for it again.
+    """
+    render_job = DraftRenderJob(target_version, working_dir, config_path)
+    render_result = _towncrier_draft_renders.get(render_job)
+    if render_result is not None:
+        if render_result.towncrier_output is not None:
+            return render_result.towncrier_output
+        if render_result.timed_out:
+            raise TowncrierRenderTimeoutError(render_result.elapsed_time)
 
+    towncrier_cmd = TOWNCRIER_DRAFT_CMD + get_towncrier_draft_cli_args(
+        target_version, config_path,
+    )
+    started_at = time.monotonic()
     try:
-        towncrier_output = subprocess.check_output(  # noqa: S603
-            TOWNCRIER_DRAFT_CMD + extra_cli_args,
-            cwd=str(working_dir) if working_dir else None,
-            stderr=subprocess.PIPE,
-            text=True,
-        ).strip()
-
-    except subprocess.CalledProcessError as proc_exc:
-        cmd = shlex.join(proc_exc.cmd)
-        stdout = proc_exc.stdout or '[No output]'
-        stderr = proc_exc.stderr or '[No output]'
+        towncrier_proc = run_towncrier_process(
+            towncrier_cmd, working_dir=working_dir, timeout=timeout,
+        )
+    except TowncrierRenderTimeoutError as timeout_err:
+        _towncrier_draft_renders[render_job] = DraftRenderResult(
+            towncrier_output=None,
+            elapsed_time=timeout_err.elapsed_time,
+            timed_out=True,
+        )
+        raise
+    _report_render_time(target_version, time.monotonic() - started_at)
+
+    if towncrier_proc.returncode:
+        cmd = shlex.join(towncrier_cmd)
+        stdout = towncrier_proc.stdout or '[No output]'
+        stderr = towncrier_proc.stderr or '[No output]'
         raise RuntimeError(
             'Command exited unexpectedly.\n\n'
             f'Command: {cmd}\n'
-            f'Return code: {proc_exc.returncode}\n\n'
+            f'Return code: {towncrier_proc.returncode}\n\n'
             f'Standard output:\n{stdout}\n\n'
             f'Standard error:\n{stderr}',
-        ) from proc_exc
+        )
+
+    return towncrier_proc.stdout
+
+
+def _compute_draft_cache_key(
+        target_version: str,
+        fragment_contents: TowncrierFragmentContents,
+        working_dir: Optional[str] = None,
+) -> str:
+    """Digest everything that the towncrier draft output depends on."""
+    project_path = resolve_project_path(working_dir)
+    template_text, _is_markdown = load_towncrier_template(
+        fragment_contents.towncrier_config,
+    )
+    return compute_draft_cache_key((
+        'towncrier-draft',
+        TOWNCRIER_VERSION,
+        target_version,
+        get_build_date(),  # what towncrier puts into the title
+        repr(fragment_contents.towncrier_config),
+        template_text,
+        *(
+            f'{os.path.relpath(fragment_path, project_path)!s}:{digest!s}'
+            for fragment_path, digest in sorted(
+                fragment_contents.fragment_digests.items(),
+            )
+        ),
+    ))
+
+
+# pylint: disable-next=too-many-arguments,too-many-positional-arguments
+@single_flight_cache(typed=True, maxbytes=DRAFT_TEXT_CACHE_MAX_BYTES)
+def _get_changelog_draft_entries(  # noqa: WPS211
+        target_version: str,
+        allow_empty: bool = False,
+        working_dir: Optional[str] = None,
+        config_path: Optional[str] = None,
+        shared_cache: Optional[SharedDraftCache] = None,
+        shared_cache_key: Optional[str] = None,
+        timeout: Optional[float] = None,
+) -> str:
+    """Retrieve the unreleased changelog entries from Towncrier.
+
+    With a shared cache, the output of the towncrier runs is reused
+    between all the builds on the host that have identical inputs.
+    """
+    towncrier_output = None
+    if shared_cache is not None and shared_cache_key is not None:
+        towncrier_output = shared_cache.get(shared_cache_key)
+
+    if towncrier_output is None:
+        towncrier_output = _run_towncrier_draft(
+            target_version,
+            working_dir=working_dir,
+            config_path=config_path,
+            timeout=timeout,
+        )
+        if shared_cache is not None and shared_cache_key is not None:
+            try:
+                shared_cache.put(shared_cache_key, towncrier_output)
+            except OSError as cache_err:
+                logger.warning(
+                    'Unable to store the towncrier draft in the shared '
+                    f'cache: {cache_err!s}',
+                )
 
     if not allow_empty and 'No significant changes' in towncrier_output:
         raise LookupError('There are no unreleased changelog entries so far')
@@ -87,57 +266,1237 @@ def _get_changelog_draft_entries(
     return towncrier_output
 
 
-@lru_cache(maxsize=1, typed=True)
+@single_flight_cache(typed=True)
+def _lookup_git_ref_draft_inputs(
+        git_ref: str,
+        working_dir: Optional[str] = None,
+        config_path: Optional[str] = None,
+) -> GitRefDraftInputs:
+    """Read the towncrier config and fragments as of a Git ref."""
+    try:
+        return lookup_towncrier_fragments_in_git(
+            git_ref,
+            working_dir=working_dir,
+            config_path=config_path,
+        )
+    except LookupError as git_lookup_err:
+        raise RuntimeError(str(git_lookup_err)) from git_lookup_err
+
+
+@single_flight_cache(typed=True, maxbytes=DRAFT_TEXT_CACHE_MAX_BYTES)
+def _get_changelog_draft_entries_from_git_ref(
+        target_version: str,
+        git_ref: str,
+        allow_empty: bool = False,
+        working_dir: Optional[str] = None,
+        config_path: Optional[str] = None,
+) -> str:
+    """Render the unreleased changelog entries as of a Git ref.
+
+    The fragments, the config and the template are read from the Git
+    object database and rendered in-process so there's no checkout and
+    no towncrier subprocess involved.
+    """
+    draft_inputs = _lookup_git_ref_draft_inputs(
+        git_ref,
+        working_dir=working_dir,
+        config_path=config_path,
+    )
+    count_work(TOWNCRIER_RENDERS_COUNTER)
+    towncrier_output = render_towncrier_draft(
+        draft_inputs.towncrier_config,
+        draft_inputs.fragment_contents,
+        # A version to be used in the RST title:
+        escape_project_version_rst_substitution(target_version),
+        template_source=draft_inputs.template_source,
+    ).strip()
+
+    if not allow_empty and 'No significant changes' in towncrier_output:
+        raise LookupError('There are no unreleased changelog entries so far')
+
+    return towncrier_output
+
+
+@single_flight_cache(maxsize=1, typed=True)
+def _lookup_scm_version(
+        working_dir: Optional[str] = None,
+        ref_stamps: Tuple[object, ...] = (),
+) -> Optional[str]:
+    """Derive the project version from the Git tags.
+
+    The ``ref_stamps`` snapshot of the Git refs only keys the cache so
+    that a long-running process notices new commits and tags.
+    """
+    return get_scm_version(resolve_project_path(working_dir))
+
+
+def _get_scm_version(working_dir: Optional[str] = None) -> Optional[str]:
+    """Derive the project version unless the Git refs stayed the same."""
+    return _lookup_scm_version(
+        working_dir,
+        stat_version_refs(resolve_project_path(working_dir)),
+    )
+
+
+@single_flight_cache(maxsize=1)
+def _stat_fragment_paths(fragment_path_set: FragmentPathSet) -> FragmentStamps:
+    """Stat the change notes once for all the directives in a build."""
+    return fragment_path_set.stat()
+
+
+def _select_newest_fragments(
+        working_dir: Optional[str],
+        fragment_paths: Set[Path],
+        candidate_paths: Iterable[Path],
+        max_count: int,
+) -> List[Path]:
+    """Pick the change notes modified last out of the candidates.
+
+    The modification times come from the stamps taken for tracking
+    the dependencies so the change notes aren't stat'ed again.
+    """
+    project_path = str(resolve_project_path(working_dir))
+    fragment_stamps = _stat_fragment_paths(
+        FragmentPathSet.from_paths(Path(project_path), fragment_paths),
+    )
+    relative_paths = {
+        candidate_path: Path(
+            os.path.relpath(candidate_path, project_path),
+        ).as_posix()
+        for candidate_path in candidate_paths
+    }
+    return heapq.nlargest(
+        max_count,
+        relative_paths,
+        key=lambda candidate_path: (
+            fragment_stamps.get(relative_paths[candidate_path], (0, 0))[0],
+            relative_paths[candidate_path],
+        ),
+    )
+
+
+@single_flight_cache(maxsize=1, typed=True)
 def _get_draft_version_fallback(
         strategy: str,
         sphinx_config: SphinxConfig,
 ) -> str:
     """Generate a fallback version string for towncrier draft."""
-    known_strategies = {'draft', 'sphinx-version', 'sphinx-release'}
+    known_strategies = {
+        'draft', 'sphinx-version', 'sphinx-release',
+        *SCM_AUTOVERSION_STRATEGIES,
+    }
     if strategy not in known_strategies:
         raise ValueError(
             'Expected "strategy" to be '
             f'one of {known_strategies!r} but got {strategy!r}',
         )
 
-    if 'sphinx' in strategy:
-        return (
-            sphinx_config.release
-            if 'release' in strategy
-            else sphinx_config.version
-        )
+    if 'sphinx' in strategy:
+        return (
+            sphinx_config.release
+            if 'release' in strategy
+            else sphinx_config.version
+        )
+
+    if strategy in SCM_AUTOVERSION_STRATEGIES:
+        scm_version = _get_scm_version(
+            sphinx_config.towncrier_draft_working_directory,
+        )
+        if scm_version is None:
+            logger.warning(
+                'Unable to derive the draft version from the Git tags, '
+                'falling back to the "draft" strategy',
+            )
+        elif strategy == 'scm':
+            return scm_version
+        else:
+            return f'{scm_version!s} {DRAFT_VERSION_PLACEHOLDER!s}'
+
+    return DRAFT_VERSION_PLACEHOLDER
+
+
+def _precompute_draft_version(sphinx_config: SphinxConfig) -> None:
+    """Read the Git tags ahead of reading the docs.
+
+    This fills the cache in the main process so the parallel readers
+    inherit it and none of them reads the Git refs again.
+    """
+    if (
+            sphinx_config.towncrier_draft_autoversion_mode
+            in SCM_AUTOVERSION_STRATEGIES
+    ):
+        _get_scm_version(sphinx_config.towncrier_draft_working_directory)
+
+
+def _parse_name_list(argument: Optional[str]) -> FrozenSet[str]:
+    """Turn a comma-separated directive option value into names."""
+    names = frozenset(
+        filter(
+            None,
+            (
+                name.strip()
+                for name in directives.unchanged_required(argument).split(',')
+            ),
+        ),
+    )
+    if not names:
+        raise ValueError('at least one name is required')
+    return names
+
+
+def _parse_shard_dimension(argument: Optional[str]) -> str:
+    """Check what the draft is to be split into sub-pages by."""
+    return directives.choice(argument, SHARD_DIMENSIONS)
+
+
+def _get_shared_draft_cache(
+        sphinx_config: SphinxConfig,
+) -> Optional[SharedDraftCache]:
+    """Return the host-wide draft cache, if enabled."""
+    if not sphinx_config.towncrier_draft_shared_cache:
+        return None
+
+    return SharedDraftCache(
+        cache_dir=str(
+            sphinx_config.towncrier_draft_shared_cache_dir
+            or get_default_draft_cache_dir(),
+        ),
+        max_size=sphinx_config.towncrier_draft_shared_cache_max_size,
+        max_age=sphinx_config.towncrier_draft_shared_cache_max_age,
+    )
+
+
+def _get_fragment_manifest_path(env: BuildEnvironment) -> Optional[str]:
+    """Locate the change note manifest in the doctrees dir, if enabled."""
+    if not env.config.towncrier_draft_fragment_manifest:
+        return None
+    return str(Path(env.doctreedir) / FRAGMENT_MANIFEST_FILE_NAME)
+
+
+def _lookup_fragment_contents(
+        env: BuildEnvironment,
+) -> Optional[TowncrierFragmentContents]:
+    """Look up the fragments the same way the directive would."""
+    return lookup_towncrier_fragment_contents(
+        working_dir=env.config.towncrier_draft_working_directory,
+        config_path=env.config.towncrier_draft_config_path,
+        max_workers=get_fragment_read_workers(
+            env.config.towncrier_draft_fragment_read_workers,
+        ),
+        manifest_path=_get_fragment_manifest_path(env),
+    )
+
+
+def _prerender_changelog_drafts(  # noqa: WPS210
+        env: BuildEnvironment,
+        directive_arguments: FrozenSet[Optional[str]],
+) -> None:
+    """Run towncrier for all the drafts the docs need at once.
+
+    The distinct directive invocations that would run towncrier are
+    rendered concurrently. This happens in the main process so the
+    parallel readers inherit the results instead of each running the
+    same towncrier commands.
+    """
+    config = env.config
+    if config.towncrier_draft_git_ref:
+        return  # Git refs are rendered in-process
+
+    if not directive_arguments:
+        return
+
+    shared_cache = _get_shared_draft_cache(config)
+    fragment_contents = None
+    if config.towncrier_draft_output_mode != 'rst' or shared_cache is not None:
+        fragment_contents = _lookup_fragment_contents(env)
+    if (
+            fragment_contents is not None
+            and config.towncrier_draft_output_mode != 'rst'
+            and is_stock_towncrier_template(
+                fragment_contents.towncrier_config,
+            )
+    ):
+        return  # the draft nodes are built without towncrier
+
+    render_jobs = []
+    for directive_argument in directive_arguments:
+        target_version = directive_argument or _get_draft_version_fallback(
+            config.towncrier_draft_autoversion_mode, config,
+        )
+        if (
+                shared_cache is not None and fragment_contents is not None
+                and shared_cache.get(
+                    _compute_draft_cache_key(
+                        target_version,
+                        fragment_contents,
+                        config.towncrier_draft_working_directory,
+                    ),
+                ) is not None
+        ):
+            continue
+        render_jobs.append(
+            DraftRenderJob(
+                target_version,
+                config.towncrier_draft_working_directory,
+                config.towncrier_draft_config_path,
+            ),
+        )
+
+    _towncrier_draft_renders.update(
+        render_towncrier_drafts(
+            render_jobs,
+            TOWNCRIER_DRAFT_CMD,
+            max_concurrency=get_render_concurrency(
+                config.towncrier_draft_render_concurrency,
+            ),
+            timeout=config.towncrier_draft_render_timeout,
+        ),
+    )
+    for render_job, render_result in _towncrier_draft_renders.items():
+        if render_result.towncrier_output is not None:
+            _report_render_time(
+                render_job.target_version, render_result.elapsed_time,
+            )
+
+
+def _reset_lookup_failure_reports(app: Sphinx) -> None:
+    """Report each towncrier config problem once per build.
+
+    This is a handler for :event:`builder-inited`.
+    """
+    reset_reported_lookup_failures()
+
+
+def _prepare_draft_rendering(
+        app: Sphinx,
+        env: BuildEnvironment,
+        docnames: List[str],
+) -> None:
+    """Warm up the caches the directives are going to need.
+
+    This is a handler for :event:`env-before-read-docs`. The sources of
+    the documents about to be read are scanned for the directive first,
+    reusing what :func:`_generate_draft_pages` found in them. When none
+    of them uses it, neither the Git tags nor the towncrier config and
+    fragments are looked at.
+    """
+    _towncrier_draft_renders.clear()
+    _stat_fragment_paths.cache_clear()
+    _get_draft_version_fallback.cache_clear()
+    # Tells the stamps recorded by this build's readers from the older
+    # ones the other readers inherited when forked
+    env.towncrier_build_id = token_hex(8)  # type: ignore[attr-defined]
+
+    directive_usage = summarize_draft_directive_usage(
+        _scan_draft_directives(env, docname) for docname in docnames
+    )
+    if not directive_usage.directive_found:
+        return
+
+    _precompute_draft_version(env.config)
+    with profile_calls('render'):
+        _prerender_changelog_drafts(
+            env, directive_usage.towncrier_arguments,
+        )
+    _prefetch_fragment_lookups(env, directive_usage)
+
+
+def _prefetch_fragment_lookups(
+        env: BuildEnvironment,
+        directive_usage: DraftDirectiveUsage,
+) -> None:
+    """Look the change notes up before the parallel readers fork.
+
+    They inherit the memoized lookups instead of each listing the
+    fragment dirs again. Only the lookups that the directives found in
+    the documents are going to make are done.
+    """
+    config = env.config
+    if config.towncrier_draft_git_ref:
+        return
+
+    reads_fragment_paths = (
+        config.towncrier_draft_output_mode == 'rst'
+        and not config.towncrier_draft_shared_cache
+    )
+    if directive_usage.towncrier_arguments and reads_fragment_paths:
+        lookup_towncrier_fragments(
+            working_dir=config.towncrier_draft_working_directory,
+            config_path=config.towncrier_draft_config_path,
+            manifest_path=_get_fragment_manifest_path(env),
+        )
+    if directive_usage.reads_fragments or (
+            directive_usage.towncrier_arguments and not reads_fragment_paths
+    ):
+        _lookup_fragment_contents(env)
+
+
+def _get_rst_source_suffix(sphinx_config: SphinxConfig) -> Optional[str]:
+    """Pick the source file suffix that's parsed as RST."""
+    return next(
+        (
+            source_suffix
+            for source_suffix, file_type
+            in dict(sphinx_config.source_suffix).items()
+            if file_type == 'restructuredtext'
+        ),
+        None,
+    )
+
+
+def _scan_draft_directives(
+        env: BuildEnvironment,
+        docname: str,
+) -> Optional[Tuple[DraftDirective, ...]]:
+    """Find the draft directives in a document source once.
+
+    The findings are kept in the environment along with the source
+    modification time and size, so a source is only read again after
+    it changes, be it later in this build or in the next ones.
+    """
+    source_path = env.doc2path(docname)
+    try:
+        source_stat = os.stat(source_path)
+    except OSError:
+        return None
+
+    source_stamp = source_stat.st_mtime_ns, source_stat.st_size
+    source_scans = getattr(env, 'towncrier_source_scans', None)
+    if source_scans is None:
+        source_scans = {}
+        env.towncrier_source_scans = source_scans  # type: ignore[attr-defined]
+    known_stamp, draft_directives = source_scans.get(docname, (None, None))
+    if known_stamp != source_stamp:
+        draft_directives = read_draft_directives(source_path)
+        source_scans[docname] = source_stamp, draft_directives
+    return draft_directives
+
+
+def _generate_draft_pages(app: Sphinx) -> None:  # noqa: WPS210
+    """Write the pages of the drafts split up or capped in size.
+
+    This is a handler for :event:`builder-inited`, which comes before
+    Sphinx looks for the sources, so the pages are found and read like
+    any other document. The pages generated for the documents that
+    don't need them anymore are removed. Only the sources changed
+    since the previous build are read to find the directives.
+    """
+    env = app.env
+    docnames = app.project.discover(
+        app.config.exclude_patterns + app.config.templates_path
+        + app.builder.get_asset_paths(),
+        app.config.include_patterns,
+    )
+    source_scans = getattr(env, 'towncrier_source_scans', {})
+    for removed_docname in source_scans.keys() - docnames:
+        del source_scans[removed_docname]  # noqa: WPS420
+
+    paged_docs: Dict[str, Dict[str, str]] = {}
+    for docname in sorted(docnames):
+        for directive_argument, directive_options in (
+                find_paged_draft_directives(
+                    _scan_draft_directives(env, docname) or (),
+                )
+        ):
+            paged_docs.setdefault(docname, {}).update(
+                _render_draft_page_sources(
+                    env.config,
+                    PurePosixPath(docname).name,
+                    directive_argument,
+                    directive_options,
+                ),
+            )
+
+    source_suffix = _get_rst_source_suffix(app.config)
+    if paged_docs and source_suffix is None:
+        logger.warning(
+            'Unable to generate the draft pages without an RST source '
+            'suffix configured',
+        )
+        return
+
+    for docname in paged_docs.keys() | set(
+            getattr(env, 'towncrier_paged_docs', ()),
+    ):
+        sync_generated_pages(
+            Path(env.doc2path(docname)),
+            paged_docs.get(docname, {}),
+            source_suffix or '.rst',
+        )
+    env.towncrier_paged_docs = set(  # type: ignore[attr-defined]
+        paged_docs,
+    )
+
+
+def _render_draft_page_sources(
+        sphinx_config: SphinxConfig,
+        parent_name: str,
+        directive_argument: Optional[str],
+        directive_options: Dict[str, str],
+) -> Dict[str, str]:
+    """Make the sources of the pages a directive links to.
+
+    These are either the sub-pages of a sharded draft or the page with
+    the whole draft that a capped one links to.
+    """
+    if directive_options.get(SHARD_OPTION_NAME) not in SHARD_DIMENSIONS:
+        return {
+            get_overflow_page_name(parent_name): render_overflow_page_source(
+                directive_argument, directive_options,
+            ),
+        }
+
+    towncrier_config = lookup_towncrier_config(
+        working_dir=sphinx_config.towncrier_draft_working_directory,
+        config_path=sphinx_config.towncrier_draft_config_path,
+    )
+    if towncrier_config is None:
+        return {}
+
+    shard_by = directive_options[SHARD_OPTION_NAME]
+    return {
+        draft_shard.page_name: draft_shard.render_source(
+            shard_by, directive_argument, directive_options,
+        )
+        for draft_shard in get_draft_shards(
+            parent_name,
+            get_shard_titles(
+                towncrier_config,
+                shard_by,
+                parse_shard_names(directive_options[shard_by])
+                if directive_options.get(shard_by) else None,
+            ),
+        )
+    }
+
+
+def _start_memory_profile(app: Sphinx) -> None:
+    """Start tracing the allocations if the memory profile is enabled.
+
+    This is a handler for :event:`builder-inited`.
+    """
+    with suppress_exceptions(AttributeError):
+        # Left over in the env pickled by a profiled build
+        del app.env.towncrier_memory_profile  # type: ignore[attr-defined]
+
+    if not is_memory_profile_requested(
+            app.config.towncrier_draft_memory_profile,
+    ):
+        return
+
+    start_memory_profile()
+    # The parallel readers add their own profiles in here
+    app.env.towncrier_memory_profile = {}  # type: ignore[attr-defined]
+
+
+def _report_memory_profile(
+        app: Sphinx,
+        exception: Optional[Exception],
+) -> None:
+    """Log the memory allocated by each phase of the draft rendering.
+
+    This is a handler for :event:`build-finished`.
+    """
+    try:
+        phase_profiles = dict(
+            app.env.towncrier_memory_profile,  # type: ignore[attr-defined]
+        )
+    except AttributeError:
+        return  # not enabled for this build
+    del app.env.towncrier_memory_profile  # type: ignore[attr-defined]
+
+    phase_profiles[os.getpid()] = get_phase_allocations()
+    stop_memory_profile()
+
+    combined_profile = combine_phase_profiles(phase_profiles.values())
+    for phase in MEMORY_PROFILE_PHASES:
+        phase_allocations = combined_profile.get(phase)
+        if phase_allocations is None:
+            continue
+        logger.info(
+            f'towncrier {phase!s} memory: '
+            f'{phase_allocations.calls:d} calls, '
+            f'{format_byte_size(phase_allocations.peak)!s} peak, '
+            f'{format_byte_size(phase_allocations.retained)!s} retained',
+        )
+    for process_id, phase_profile in sorted(phase_profiles.items()):
+        if not phase_profile:
+            continue
+        logger.info(
+            f'towncrier memory in process {process_id:d}: '
+            + ', '.join(
+                f'{phase!s} {format_byte_size(phase_allocations.peak)!s} '
+                'peak'
+                for phase, phase_allocations in phase_profile.items()
+            ),
+        )
+
+
+def _start_call_profiles(app: Sphinx) -> None:
+    """Start profiling the directives if a profile dir is configured.
+
+    This is a handler for :event:`builder-inited`.
+    """
+    profile_dir = app.config.towncrier_draft_profile_dir
+    start_call_profiles(
+        Path(app.confdir) / profile_dir if profile_dir else None,
+    )
+
+
+def _merge_call_profiles(app: Sphinx, exception: Optional[Exception]) -> None:
+    """Combine the profiles of all the processes into one.
+
+    This is a handler for :event:`build-finished`.
+    """
+    merged_profile_path = merge_call_profiles()
+    if merged_profile_path is not None:
+        logger.info(
+            'The towncrier draft profiles are merged into '
+            f'{merged_profile_path!s}',
+        )
+
+
+def _reset_rebuild_causes(app: Sphinx) -> None:
+    """Start collecting the read times if the diagnostics are enabled.
+
+    This is a handler for :event:`builder-inited`.
+    """
+    _rebuild_causes.clear()
+    _read_started_at.clear()
+    with suppress_exceptions(AttributeError):
+        # Left over in the env pickled by a diagnosed build
+        del app.env.towncrier_read_times  # type: ignore[attr-defined]
+
+    if app.config.towncrier_draft_rebuild_diagnostics:
+        # The parallel readers add their own read times in here
+        app.env.towncrier_read_times = {}  # type: ignore[attr-defined]
+
+
+def _note_read_start(app: Sphinx, docname: str, source: List[str]) -> None:
+    """Remember when Sphinx started reading a document.
+
+    This is a handler for :event:`source-read`.
+    """
+    if app.config.towncrier_draft_rebuild_diagnostics:
+        _read_started_at[docname] = time.monotonic()
+
+
+def _report_rebuild_causes(
+        app: Sphinx,
+        exception: Optional[Exception],
+) -> None:
+    """Log why the documents showing drafts were re-read.
+
+    This is a handler for :event:`build-finished`. The same data goes
+    into a JSON file in the doctrees dir.
+    """
+    if not app.config.towncrier_draft_rebuild_diagnostics:
+        return
+
+    read_times: Dict[str, float] = getattr(
+        app.env, 'towncrier_read_times', {},
+    )
+    for docname, doc_causes in sorted(_rebuild_causes.items()):
+        read_time = read_times.get(docname)
+        logger.info(
+            f'towncrier draft in {docname!r} re-read'
+            + ('' if read_time is None else f' in {read_time:.2f}s')
+            + ' because of: '
+            + '; '.join(doc_cause.describe() for doc_cause in doc_causes),
+        )
+
+    write_rebuild_causes(
+        Path(app.doctreedir) / REBUILD_CAUSES_FILE_NAME,
+        _rebuild_causes,
+        read_times,
+    )
+
+
+def _reset_work_counts(app: Sphinx) -> None:
+    """Start counting the towncrier runs and the fragment dir scans.
+
+    This is a handler for :event:`builder-inited`.
+    """
+    reset_work_counts()
+    # The parallel readers add their own counts in here
+    app.env.towncrier_work_counts = {}  # type: ignore[attr-defined]
+
+
+def get_towncrier_work_counts(env: BuildEnvironment) -> WorkCounts:
+    """Sum up the costly work done by all the processes of a build.
+
+    The counts of the current process are taken as of now, those of
+    the parallel readers as of the last document each of them read.
+    """
+    process_counts: Dict[str, WorkCounts] = dict(
+        getattr(env, 'towncrier_work_counts', {}),
+    )
+    process_counts[get_process_key()] = get_work_counts()
+    return combine_work_counts(process_counts.values())
+
+
+def _report_work_counts(app: Sphinx, exception: Optional[Exception]) -> None:
+    """Log how many times towncrier ran and the fragments were listed.
+
+    This is a handler for :event:`build-finished`.
+    """
+    work_counts = get_towncrier_work_counts(app.env)
+    logger.verbose(
+        'towncrier work done: '
+        + ', '.join(
+            f'{work_counts.get(counter_name, 0):d} {counter_name!s}'
+            for counter_name in WORK_COUNTER_NAMES
+        ),
+    )
+
+
+def _report_cache_stats(app: Sphinx, exception: Optional[Exception]) -> None:
+    """Log how well the memoized lookups worked during the build.
+
+    This is a handler for :event:`build-finished`.
+    """
+    for single_flight_wrapper in iter_single_flight_caches():
+        cache_info = single_flight_wrapper.cache_info()
+        if not cache_info.hits + cache_info.misses + cache_info.waits:
+            continue
+        logger.verbose(
+            f'{single_flight_wrapper.__qualname__!s} cache: '
+            f'{cache_info.hits:d} hits, {cache_info.misses:d} misses, '
+            f'{cache_info.waits:d} waits',
+        )
+
+
+def get_towncrier_watched_inputs(
+        env: BuildEnvironment,
+) -> List[TowncrierWatchedInputs]:
+    """List the working tree paths the drafts in the docs come from.
+
+    These are the towncrier config file, the template and the change
+    note directories of every project whose draft is shown in the docs
+    rendered from the working tree. File watchers, like
+    ``sphinx-autobuild``, can be limited to them instead of the whole
+    repository.
+    """
+    if not (
+            getattr(env, 'towncrier_fragment_docs', None)
+            or getattr(env, 'towncrier_fragment_slices', None)
+    ):
+        return []
+
+    return [
+        lookup_towncrier_watched_inputs(
+            working_dir=env.config.towncrier_draft_working_directory,
+            config_path=env.config.towncrier_draft_config_path,
+        ),
+    ]
+
+
+def _write_watched_inputs(app: Sphinx, exception: Optional[Exception]) -> None:
+    """Dump the watched inputs of the build into a JSON file.
+
+    This is a handler for :event:`build-finished`. The file is replaced
+    atomically so that the watchers never read it half-written.
+    """
+    if exception is not None:
+        return
+
+    watched_inputs_path = Path(app.doctreedir) / WATCHED_INPUTS_FILE_NAME
+    if app.config.towncrier_draft_watched_inputs_file is not None:
+        watched_inputs_path = Path(app.confdir) / (
+            app.config.towncrier_draft_watched_inputs_file
+        )
+    watched_inputs_json = json.dumps(
+        {
+            'projects': [
+                watched_inputs.to_json()
+                for watched_inputs in get_towncrier_watched_inputs(app.env)
+            ],
+        },
+        indent=2,
+        sort_keys=True,
+    )
+
+    write_file_atomically(watched_inputs_path, watched_inputs_json.encode('utf-8'))
+
+
+def _get_draft_doctree_cache(
+        env: BuildEnvironment,
+) -> Optional[SharedDraftCache]:
+    """Return the parsed draft cache in the doctrees dir, if enabled."""
+    if not env.config.towncrier_draft_doctree_cache:
+        return None
+
+    return SharedDraftCache(
+        cache_dir=str(Path(env.doctreedir) / DOCTREE_CACHE_DIR_NAME),
+    )
+
+
+def _compute_doctree_cache_key(
+        state: RSTState,
+        markup_source: str,
+        source_name: str,
+) -> str:
+    """Digest the draft along with everything its parsing depends on."""
+    document_settings = state.document.settings
+    env = document_settings.env
+    return compute_draft_cache_key((
+        'towncrier-draft-doctree',
+        str(DOCTREE_CACHE_FORMAT_VERSION),
+        __version__,
+        docutils_version,
+        sphinx_version,
+        sys.version,
+        *(
+            repr(getattr(document_settings, setting_name, None))
+            for setting_name in DOCTREE_PARSER_SETTINGS
+        ),
+        repr(sorted(env.config.extensions)),
+        repr(env.config.default_role),
+        repr(env.config.primary_domain),
+        repr(sorted(env.ref_context.items())),
+        source_name,  # recorded in the nodes
+        markup_source,
+    ))
+
+
+def _nodes_from_document_markup_source(
+        state: RSTState,
+        markup_source: str,
+) -> List[nodes.Node]:
+    """Turn an RST or Markdown string into a list of nodes.
+
+    These nodes can be used in the document. With the doctree cache
+    enabled, the nodes parsed out of the same source in a previous
+    build are reused.
+    """
+    with track_phase_allocations('nodes'):
+        return _parse_document_markup_source(
+            state,
+            markup_source,
+            _get_draft_doctree_cache(state.document.settings.env),
+        )
+
+
+def _parse_document_markup_source(
+        state: RSTState,
+        markup_source: str,
+        doctree_cache: Optional[SharedDraftCache] = None,
+        source_name: str = '[towncrier-fragments]',
+        line_offset: int = 0,
+        evict_cache: bool = True,
+) -> List[nodes.Node]:
+    """Parse the markup unless the doctree cache has the nodes already."""
+    env = state.document.settings.env
+    doctree_cache_key = None
+    if doctree_cache is not None:
+        doctree_cache_key = _compute_doctree_cache_key(
+            state, markup_source, source_name,
+        )
+        pickled_nodes = doctree_cache.get_bytes(doctree_cache_key)
+        cached_nodes = None if pickled_nodes is None else load_draft_nodes(
+            pickled_nodes, state.document, env.docname, line_offset,
+        )
+        if cached_nodes is not None:
+            return cached_nodes
+
+    markup_lines = list(
+        iter_markup_lines(
+            markup_source, tab_width=state.document.settings.tab_width,
+        ),
+    )
+    node = nodes.Element()
+    node.document = state.document
+    nested_parse_with_titles(
+        state=state,
+        content=statemachine.StringList(
+            markup_lines,
+            items=[
+                (source_name, line_offset + line_number)
+                for line_number in range(len(markup_lines))
+            ],
+        ),
+        node=node,
+    )
+
+    if doctree_cache is not None and doctree_cache_key is not None:
+        _store_parsed_draft(
+            doctree_cache, doctree_cache_key, node.children,
+            line_offset, evict_cache,
+        )
+    return node.children
+
+
+def _store_parsed_draft(
+        doctree_cache: SharedDraftCache,
+        doctree_cache_key: str,
+        draft_nodes: List[nodes.Node],
+        line_offset: int = 0,
+        evict_cache: bool = True,
+) -> None:
+    """Pickle the parsed draft for the next builds, if it's reusable."""
+    pickled_nodes = dump_draft_nodes(draft_nodes, line_offset)
+    if pickled_nodes is None:
+        return
+
+    try:
+        doctree_cache.put_bytes(
+            doctree_cache_key, pickled_nodes, evict=evict_cache,
+        )
+    except OSError as cache_err:
+        logger.warning(f'Unable to store the parsed draft: {cache_err!s}')
+
+
+class TowncrierDraftEntriesDirective(SphinxDirective):
+    """Definition of the ``towncrier-draft-entries`` directive."""
+
+    has_content = True  # default: False
+    option_spec = {
+        'git-ref': directives.unchanged_required,
+        'max-entries': directives.positive_int,
+        'sections': _parse_name_list,
+        'shard-by': _parse_shard_dimension,
+        'types': _parse_name_list,
+    }
+
+    def _run_for_git_ref(
+            self,
+            target_version: str,
+            git_ref: str,
+            draft_slice: Optional[DraftSlice] = None,
+    ) -> List[nodes.Node]:
+        """Generate a node tree out of the fragments in a Git ref."""
+        config = self.env.config
+        try:
+            with track_phase_allocations('discovery'):
+                draft_inputs = _lookup_git_ref_draft_inputs(
+                    git_ref,
+                    working_dir=config.towncrier_draft_working_directory,
+                    config_path=config.towncrier_draft_config_path,
+                )
+        except RuntimeError as runtime_err:
+            raise self.error(str(runtime_err)) from runtime_err
+
+        # Git objects are immutable so the ref moving to another commit
+        # is the only reason to re-render this document
+        try:
+            self.env.towncrier_git_ref_docs[  # type: ignore[attr-defined]
+                self.env.docname
+            ] = git_ref, draft_inputs.commit_id
+        except AttributeError:
+            # If the attribute hasn't existed, initialize it instead of
+            # updating
+            self.env.towncrier_git_ref_docs = {  # type: ignore[attr-defined]
+                self.env.docname: (git_ref, draft_inputs.commit_id),
+            }
+
+        if draft_slice is not None:
+            self._check_draft_slice(draft_inputs.towncrier_config, draft_slice)
+
+        if draft_inputs.template_source is None and (
+                draft_slice is not None
+                or self._uses_structured_output(draft_inputs.towncrier_config)
+        ):
+            return self._build_structured_draft(
+                target_version,
+                draft_inputs.towncrier_config,
+                draft_inputs.draft_entries,
+                draft_slice,
+            )
+
+        try:
+            with track_phase_allocations('render'):
+                draft_changes = _get_changelog_draft_entries_from_git_ref(
+                    target_version,
+                    git_ref,
+                    allow_empty=config.towncrier_draft_include_empty,
+                    working_dir=config.towncrier_draft_working_directory,
+                    config_path=config.towncrier_draft_config_path,
+                )
+        except RuntimeError as runtime_err:
+            raise self.error(str(runtime_err)) from runtime_err
+        except LookupError:
+            return []
+
+        return _nodes_from_document_markup_source(
+            state=self.state,
+            markup_source=draft_changes,
+        )
+
+    def _uses_structured_output(self, towncrier_config: Config) -> bool:
+        """Check if the draft nodes should be built from the fragments."""
+        output_mode = self.env.config.towncrier_draft_output_mode
+        if output_mode == 'rst':
+            return False
+
+        if is_stock_towncrier_template(towncrier_config):
+            return True
+
+        if output_mode == 'structured':
+            logger.warning(
+                'The structured draft output only supports the stock '
+                'towncrier template, rendering the draft with towncrier '
+                'instead',
+                location=self.get_location(),
+            )
+        return False
+
+    def _get_draft_slice(self) -> Optional[DraftSlice]:
+        """Return the part of the draft requested via the options."""
+        if 'sections' not in self.options and 'types' not in self.options:
+            return None
+
+        return DraftSlice(
+            sections=self.options.get('sections'),
+            types=self.options.get('types'),
+        )
+
+    def _check_draft_slice(
+            self,
+            towncrier_config: Config,
+            draft_slice: DraftSlice,
+    ) -> None:
+        """Make sure that the requested part of the draft can be shown."""
+        if not is_stock_towncrier_template(towncrier_config):
+            raise self.error(
+                'The "sections" and "types" options are only supported '
+                'with the stock towncrier template',
+            )
+
+        for option_name, selected_names, known_names in (
+                ('sections', draft_slice.sections, towncrier_config.sections),
+                ('types', draft_slice.types, towncrier_config.types),
+        ):
+            unknown_names = (selected_names or frozenset()) - set(known_names)
+            if unknown_names:
+                raise self.error(
+                    f'Unknown towncrier {option_name!s} in the '
+                    f'"{option_name!s}" option: '
+                    f'{", ".join(sorted(unknown_names))!s}',
+                )
+
+    def _build_shard_toctree(self) -> List[nodes.Node]:
+        """Link the sub-pages the draft is split into.
+
+        The sub-pages are generated before the build, this document
+        doesn't depend on the change notes at all.
+        """
+        config = self.env.config
+        towncrier_config = lookup_towncrier_config(
+            working_dir=config.towncrier_draft_working_directory,
+            config_path=config.towncrier_draft_config_path,
+        )
+        if towncrier_config is None:
+            return []
+
+        if not is_stock_towncrier_template(towncrier_config):
+            raise self.error(
+                'The "shard-by" option is only supported with the stock '
+                'towncrier template',
+            )
+
+        shard_by = self.options[SHARD_OPTION_NAME]
+        draft_shards = get_draft_shards(
+            PurePosixPath(self.env.docname).name,
+            get_shard_titles(
+                towncrier_config, shard_by, self.options.get(shard_by),
+            ),
+        )
+        if not draft_shards:
+            raise self.error(
+                f'There are no towncrier {shard_by!s} to split the draft by',
+            )
+
+        return _parse_document_markup_source(
+            self.state, render_shard_toctree(draft_shards),
+        )
+
+    def _track_fragment_dependencies(
+            self,
+            fragment_paths: Set[Path],
+            draft_slice: Optional[DraftSlice] = None,
+            fragment_categories: Optional[FragmentCategories] = None,
+    ) -> None:
+        """Record the change notes that the current document depends on.
+
+        Instead of noting each change note as a dependency of every
+        document, their modification times and sizes are recorded once
+        for the whole env and compared in
+        :py:meth:`~TowncrierDraftEntriesEnvironmentCollector.\
+        get_outdated_docs`. A document only showing a slice of the draft
+        is only rebuilt when the change notes within that slice change.
+        """
+        project_path = resolve_project_path(
+            self.env.config.towncrier_draft_working_directory,
+        )
+        fragment_path_set = FragmentPathSet.from_paths(
+            project_path, fragment_paths,
+        )
+        # pylint: disable-next=line-too-long
+        self.env.towncrier_fragment_stamps = FragmentStamps(  # type: ignore[attr-defined]
+            _stat_fragment_paths(fragment_path_set),
+        )
+        # pylint: disable-next=line-too-long
+        self.env.towncrier_fragment_stamps_build_id = getattr(  # type: ignore[attr-defined]
+            self.env, 'towncrier_build_id', None,
+        )
+
+        if draft_slice is not None and fragment_categories is not None:
+            if not hasattr(  # noqa: WPS421
+                    self.env, 'towncrier_fragment_slices',
+            ):
+                # pylint: disable-next=line-too-long
+                self.env.towncrier_fragment_slices = {}  # type: ignore[attr-defined]
+            # pylint: disable-next=line-too-long
+            self.env.towncrier_fragment_slices.setdefault(  # type: ignore[attr-defined]
+                self.env.docname, {},
+            )[draft_slice] = FragmentPathSet.from_paths(
+                project_path, draft_slice.select_paths(fragment_categories),
+            )
+            return
+
+        try:
+            self.env.towncrier_fragment_docs |= {  # type: ignore[attr-defined]
+                self.env.docname,
+            }
+        except AttributeError:
+            # If the attribute hasn't existed, initialize it instead of
+            # updating
+            self.env.towncrier_fragment_docs = {  # type: ignore[attr-defined]
+                self.env.docname,
+            }
+
+    def _get_draft_unit_cache(self) -> DraftUnitCache:
+        """Return the parsed entries cache persisted in the env."""
+        try:
+            # pylint: disable-next=line-too-long
+            return self.env.towncrier_draft_unit_cache  # type: ignore[attr-defined]  # noqa: B950
+        except AttributeError:
+            draft_unit_cache = DraftUnitCache()
+            # pylint: disable-next=line-too-long
+            self.env.towncrier_draft_unit_cache = (  # type: ignore[attr-defined]
+                draft_unit_cache
+            )
+            return draft_unit_cache
+
+    def _build_structured_draft(
+            self,
+            target_version: str,
+            towncrier_config: Config,
+            draft_entries: DraftEntries,
+            draft_slice: Optional[DraftSlice] = None,
+    ) -> List[nodes.Node]:
+        """Generate a node tree straight from the parsed fragments.
 
-    return '[UNRELEASED DRAFT]'
+        In the incremental mode, only the entries that haven't been
+        seen in the previous builds get parsed, the rest is copied over
+        from the cache. When only a slice of the draft is requested,
+        it's cut out of the entries arranged once for the whole draft.
+        """
+        if draft_slice is not None:
+            draft_entries = draft_slice.apply(draft_entries)
+        if (
+                not self.env.config.towncrier_draft_include_empty
+                and not all(draft_entries.values())
+        ):
+            # This is where towncrier says "No significant changes"
+            return []
 
+        with track_phase_allocations('nodes'):
+            return self._build_draft_nodes(
+                target_version, towncrier_config, draft_entries,
+            )
 
-def _nodes_from_document_markup_source(
-        state: RSTState,
-        markup_source: str,
-) -> List[nodes.Node]:
-    """Turn an RST or Markdown string into a list of nodes.
+    def _build_capped_draft(
+            self,
+            target_version: str,
+            fragment_contents: TowncrierFragmentContents,
+            max_entries: int,
+            draft_slice: Optional[DraftSlice] = None,
+    ) -> List[nodes.Node]:
+        """Show the newest change notes and link the whole draft.
 
-    These nodes can be used in the document.
-    """
-    node = nodes.Element()
-    node.document = state.document
-    nested_parse_with_titles(
-        state=state,
-        content=statemachine.StringList(
-            statemachine.string2lines(markup_source),
-            source='[towncrier-fragments]',
-        ),
-        node=node,
-    )
-    return node.children
+        The entries are arranged out of the same fragment lookup as the
+        whole draft on the generated page. In the incremental mode, the
+        parsed entries are shared between the two pages too.
+        """
+        if not is_stock_towncrier_template(
+                fragment_contents.towncrier_config,
+        ):
+            raise self.error(
+                'The "max-entries" option is only supported with the stock '
+                'towncrier template',
+            )
+
+        fragment_paths = (
+            fragment_contents.fragment_paths if draft_slice is None
+            else draft_slice.select_paths(
+                fragment_contents.fragment_categories,
+            )
+        )
+        newest_paths = _select_newest_fragments(
+            self.env.config.towncrier_draft_working_directory,
+            fragment_contents.fragment_paths,
+            fragment_paths,
+            max_entries,
+        )
+        draft_nodes = self._build_structured_draft(
+            target_version,
+            fragment_contents.towncrier_config,
+            fragment_contents.arrange_selected_entries(newest_paths)
+            if newest_paths else fragment_contents.draft_entries,
+            draft_slice,
+        )
+        if len(fragment_paths) <= max_entries:
+            return draft_nodes
 
+        overflow_page_name = get_overflow_page_name(
+            PurePosixPath(self.env.docname).name,
+        )
+        return _parse_document_markup_source(
+            self.state,
+            f'The {max_entries:d} most recent of the '
+            f'{len(fragment_paths):d} unreleased changes are shown below, '
+            f'see :doc:`all of them <{overflow_page_name!s}>`.',
+        ) + draft_nodes
 
-class TowncrierDraftEntriesDirective(SphinxDirective):
-    """Definition of the ``towncrier-draft-entries`` directive."""
+    def _build_draft_nodes(
+            self,
+            target_version: str,
+            towncrier_config: Config,
+            draft_entries: DraftEntries,
+    ) -> List[nodes.Node]:
+        """Generate the draft nodes out of the selected entries."""
+        return build_draft_nodes(
+            state=self.state,
+            docname=self.env.docname,
+            draft_title=get_draft_title(
+                towncrier_config,
+                # A version to be used in the RST title:
+                escape_project_version_rst_substitution(target_version),
+            ),
+            draft_entries=draft_entries,
+            type_titles={
+                category_name: category_definition['name']
+                for category_name, category_definition
+                in towncrier_config.types.items()
+            },
+            unit_cache=(
+                self._get_draft_unit_cache()
+                if self.env.config.towncrier_draft_incremental
+                else None
+            ),
+        )
 
-    has_content = True  # default: False
+    def run(self) -> List[nodes.Node]:
+        """Generate a node tree in place of the directive.
 
-    def run(self) -> List[nodes.Node]:  # noqa: WPS210
-        """Generate a node tree in place of the directive."""
+        With the profile dir configured, this is profiled per document.
+        """
+        with profile_calls(self.env.docname):
+            return self._generate_nodes()
+
+    def _generate_nodes(self) -> List[nodes.Node]:
+        """Render the draft and turn it into nodes."""
         target_version = (
             self.content[:1][0]
             if self.content[:1] else None
@@ -150,57 +1509,292 @@ class TowncrierDraftEntriesDirective(SphinxDirective):
 
         config = self.env.config
         autoversion_mode = config.towncrier_draft_autoversion_mode
-        include_empty = config.towncrier_draft_include_empty
 
-        towncrier_fragment_paths = lookup_towncrier_fragments(
-            working_dir=config.towncrier_draft_working_directory,
-            config_path=config.towncrier_draft_config_path,
+        if SHARD_OPTION_NAME in self.options:
+            return self._build_shard_toctree()
+
+        draft_slice = self._get_draft_slice()
+        shared_cache = _get_shared_draft_cache(config)
+        max_entries = self.options.get(OVERFLOW_OPTION_NAME)
+        git_ref = self.options.get('git-ref', config.towncrier_draft_git_ref)
+        if git_ref:
+            if max_entries is not None:
+                raise self.error(
+                    'The "max-entries" option is not supported with Git '
+                    'refs',
+                )
+            return self._run_for_git_ref(
+                target_version or
+                _get_draft_version_fallback(autoversion_mode, config),
+                git_ref,
+                draft_slice,
+            )
+
+        with track_phase_allocations('discovery'):
+            fragment_contents, towncrier_fragment_paths = (
+                self._discover_fragments(
+                    # Only towncrier needs to see the change note contents
+                    read_contents=(
+                        config.towncrier_draft_output_mode != 'rst'
+                        or draft_slice is not None
+                        or max_entries is not None
+                        or shared_cache is not None
+                    ),
+                )
+            )
+
+        if fragment_contents is not None and draft_slice is not None:
+            self._check_draft_slice(
+                fragment_contents.towncrier_config, draft_slice,
+            )
+        self._track_fragment_dependencies(
+            towncrier_fragment_paths,
+            draft_slice,
+            fragment_categories=(
+                None if fragment_contents is None
+                else fragment_contents.fragment_categories
+            ),
         )
-        for path in towncrier_fragment_paths:
-            # make sphinx discard doctree cache on file changes
-            self.env.note_dependency(str(path))
 
-        try:
-            # pylint: disable-next=line-too-long
-            self.env.towncrier_fragment_paths |= (  # type: ignore[attr-defined]
-                towncrier_fragment_paths
+        target_version = (
+            target_version or
+            _get_draft_version_fallback(autoversion_mode, config)
+        )
+        if fragment_contents is not None and max_entries is not None:
+            return self._build_capped_draft(
+                target_version, fragment_contents, max_entries, draft_slice,
             )
-        except AttributeError:
-            # If the attribute hasn't existed, initialize it instead of
-            # updating
-            self.env.towncrier_fragment_paths = (  # type: ignore[attr-defined]
-                towncrier_fragment_paths
+        if fragment_contents is not None and (
+                draft_slice is not None
+                or self._uses_structured_output(
+                    fragment_contents.towncrier_config,
+                )
+        ):
+            return self._build_structured_draft(
+                target_version,
+                fragment_contents.towncrier_config,
+                fragment_contents.draft_entries,
+                draft_slice,
             )
 
-        try:
-            self.env.towncrier_fragment_docs |= {  # type: ignore[attr-defined]
-                self.env.docname,
-            }
-        except AttributeError:
-            # If the attribute hasn't existed, initialize it instead of
-            # updating
-            self.env.towncrier_fragment_docs = {  # type: ignore[attr-defined]
-                self.env.docname,
-            }
+        return self._render_towncrier_draft(
+            target_version, fragment_contents, shared_cache,
+        )
 
-        try:
-            draft_changes = _get_changelog_draft_entries(
-                target_version or
-                _get_draft_version_fallback(autoversion_mode, config),
-                allow_empty=include_empty,
+    def _discover_fragments(
+            self,
+            read_contents: bool,
+    ) -> Tuple[Optional[TowncrierFragmentContents], Set[Path]]:
+        """Find the change notes, reading them in only if requested."""
+        config = self.env.config
+        if not read_contents:
+            return None, lookup_towncrier_fragments(
                 working_dir=config.towncrier_draft_working_directory,
                 config_path=config.towncrier_draft_config_path,
+                manifest_path=_get_fragment_manifest_path(self.env),
             )
+
+        fragment_contents = _lookup_fragment_contents(self.env)
+        return fragment_contents, (
+            set() if fragment_contents is None
+            else fragment_contents.fragment_paths
+        )
+
+    def _render_towncrier_draft(
+            self,
+            target_version: str,
+            fragment_contents: Optional[TowncrierFragmentContents],
+            shared_cache: Optional[SharedDraftCache],
+    ) -> List[nodes.Node]:
+        """Have towncrier render the draft and parse its output."""
+        config = self.env.config
+        render_job = DraftRenderJob(
+            target_version,
+            config.towncrier_draft_working_directory,
+            config.towncrier_draft_config_path,
+        )
+        try:
+            with track_phase_allocations('render'):
+                draft_changes = _get_changelog_draft_entries(
+                    target_version,
+                    allow_empty=config.towncrier_draft_include_empty,
+                    working_dir=config.towncrier_draft_working_directory,
+                    config_path=config.towncrier_draft_config_path,
+                    shared_cache=shared_cache,
+                    shared_cache_key=(
+                        None
+                        if shared_cache is None or fragment_contents is None
+                        else _compute_draft_cache_key(
+                            target_version,
+                            fragment_contents,
+                            config.towncrier_draft_working_directory,
+                        )
+                    ),
+                    timeout=config.towncrier_draft_render_timeout,
+                )
+        except TowncrierRenderTimeoutError as timeout_err:
+            return self._fall_back_after_timeout(render_job, timeout_err)
         except RuntimeError as runtime_err:
             raise self.error(str(runtime_err)) from runtime_err
         except LookupError:
             return []
 
+        if config.towncrier_draft_render_timeout_fallback == 'cached':
+            self._remember_last_draft(render_job, draft_changes)
+
         return _nodes_from_document_markup_source(
             state=self.state,
             markup_source=draft_changes,
         )
 
+    def _remember_last_draft(
+            self,
+            render_job: DraftRenderJob,
+            draft_changes: str,
+    ) -> None:
+        """Keep the draft around in case the next render times out.
+
+        Only the ``cached`` timeout fallback ever shows it so the drafts
+        aren't pickled into the environment for the other ones.
+        """
+        try:
+            self.env.towncrier_last_drafts[  # type: ignore[attr-defined]
+                render_job
+            ] = draft_changes
+        except AttributeError:
+            # If the attribute hasn't existed, initialize it instead of
+            # updating
+            self.env.towncrier_last_drafts = {  # type: ignore[attr-defined]
+                render_job: draft_changes,
+            }
+
+    def _fall_back_after_timeout(
+            self,
+            render_job: DraftRenderJob,
+            timeout_err: TowncrierRenderTimeoutError,
+    ) -> List[nodes.Node]:
+        """Substitute the draft that towncrier failed to render in time.
+
+        Depending on the configured fallback, this is the last draft
+        rendered successfully for the same version, a placeholder or a
+        build error. The document is going to be re-read next time.
+        """
+        fallback = self.env.config.towncrier_draft_render_timeout_fallback
+        if fallback == 'error':
+            raise self.error(str(timeout_err)) from timeout_err
+
+        self.env.note_reread()
+
+        last_draft = getattr(self.env, 'towncrier_last_drafts', {}).get(
+            render_job,
+        )
+        if fallback == 'cached' and last_draft is not None:
+            logger.warning(
+                f'{timeout_err!s}, showing the last successfully rendered '
+                'draft instead',
+                location=self.get_location(),
+            )
+            return _nodes_from_document_markup_source(
+                state=self.state,
+                markup_source=last_draft,
+            )
+
+        logger.warning(
+            f'{timeout_err!s}, showing a placeholder instead',
+            location=self.get_location(),
+        )
+        return [
+            nodes.paragraph(
+                RENDER_TIMEOUT_PLACEHOLDER_TEXT,
+                RENDER_TIMEOUT_PLACEHOLDER_TEXT,
+            ),
+        ]
+
+
+def _find_open_section(
+        top_nodes: List[nodes.Node],
+        section_depth: int,
+) -> Optional[nodes.section]:
+    """Find the section that the next nodes at some depth belong to.
+
+    That's the last section on each level, down to the depth requested
+    or as deep as the sections go.
+    """
+    open_section = None
+    level_nodes = top_nodes
+    for _level in range(section_depth):
+        if not level_nodes or not isinstance(level_nodes[-1], nodes.section):
+            break
+        open_section = level_nodes[-1]
+        level_nodes = open_section.children
+    return open_section
+
+
+class TowncrierReleasedEntriesDirective(SphinxDirective):
+    """Definition of the ``towncrier-released-entries`` directive.
+
+    It shows the changelog that towncrier has been writing the releases
+    to. The file is parsed one release at a time and the nodes of each
+    one are stored in the doctrees dir keyed by the release text. The
+    released sections never change so when the document is re-read for
+    its draft, only the new releases get parsed.
+    """
+
+    required_arguments = 1
+    final_argument_whitespace = True
+    option_spec = {
+        'start-after': directives.unchanged_required,
+    }
+
+    def run(self) -> List[nodes.Node]:
+        """Generate a node tree in place of the directive."""
+        with profile_calls(self.env.docname):
+            return self._generate_nodes()
+
+    def _generate_nodes(self) -> List[nodes.Node]:
+        """Parse the releases that aren't in the cache yet."""
+        changelog_rel_path, changelog_path = self.env.relfn2path(
+            self.arguments[0],
+        )
+        self.env.note_dependency(changelog_rel_path)
+        try:
+            changelog_text = Path(changelog_path).read_text(encoding='utf-8')
+        except (OSError, UnicodeDecodeError) as read_err:
+            raise self.error(
+                f'Unable to read the changelog {changelog_rel_path!s}: '
+                f'{read_err!s}',
+            ) from read_err
+
+        release_cache = SharedDraftCache(
+            cache_dir=str(
+                Path(self.env.doctreedir) / RELEASE_DOCTREE_CACHE_DIR_NAME,
+            ),
+            max_size=RELEASE_DOCTREE_CACHE_MAX_SIZE,
+        )
+        release_nodes: List[nodes.Node] = []
+        with track_phase_allocations('nodes'):
+            for release_block in split_release_blocks(
+                    changelog_text,
+                    start_after=self.options.get('start-after'),
+            ):
+                block_nodes = _parse_document_markup_source(
+                    self.state,
+                    release_block.markup_source,
+                    release_cache,
+                    source_name=str(changelog_path),
+                    line_offset=release_block.line_offset,
+                    evict_cache=False,
+                )
+                open_section = _find_open_section(
+                    release_nodes, release_block.section_depth,
+                )
+                if open_section is None:
+                    release_nodes.extend(block_nodes)
+                else:
+                    open_section.extend(block_nodes)
+        release_cache.evict()
+        return release_nodes
+
 
 class TowncrierDraftEntriesEnvironmentCollector(EnvironmentCollector):
     r"""Environment collector for ``TowncrierDraftEntriesDirective``.
@@ -212,11 +1806,15 @@ class TowncrierDraftEntriesEnvironmentCollector(EnvironmentCollector):
     directive dependencies by calling :py:meth:`BuildEnvironment.\
     note_dependency <sphinx.environment.BuildEnvironment.\
     note_dependency>` but this will only work for fragments that have
-    existed at the time of that first directive invocation.
+    existed at the time of that first directive invocation. Besides,
+    Sphinx checks every such dependency of every document separately
+    so with many change notes and many documents showing them, these
+    checks add up.
 
-    In order to track newly appearing change fragment dependencies,
-    we need to do so at the time of Sphinx identifying what documents
-    require rebuilding. There's :event:`env-get-outdated` that
+    In order to track the change fragment dependencies, including the
+    newly appearing ones, we need to do so at the time of Sphinx
+    identifying what documents require rebuilding. There's
+    :event:`env-get-outdated` that
     allows to extend this list of planned rebuilds and we could use it
     by assigning a document-to-fragments map from within the directive
     and reading it in the event handler later (since env contents are
@@ -232,6 +1830,7 @@ class TowncrierDraftEntriesEnvironmentCollector(EnvironmentCollector):
     * https://github.com/sphinx-contrib/sphinxcontrib-towncrier/issues/1
     """
 
+    @profiled('collector')
     def clear_doc(
             self,
             app: Sphinx,
@@ -246,7 +1845,16 @@ class TowncrierDraftEntriesEnvironmentCollector(EnvironmentCollector):
             env.towncrier_fragment_docs.remove(  # type: ignore[attr-defined]
                 docname,
             )
+        with suppress_exceptions(AttributeError, KeyError):
+            del env.towncrier_git_ref_docs[  # type: ignore[attr-defined]
+                docname
+            ]
+        with suppress_exceptions(AttributeError, KeyError):
+            del env.towncrier_fragment_slices[  # type: ignore[attr-defined]
+                docname
+            ]
 
+    @profiled('collector')
     def merge_other(
             self,
             app: Sphinx,
@@ -258,6 +1866,95 @@ class TowncrierDraftEntriesEnvironmentCollector(EnvironmentCollector):
 
         This is a handler for :event:`env-merge-info`.
         """
+        with track_phase_allocations('merge'):
+            self._merge_draft_data(env, other)
+
+        with suppress_exceptions(AttributeError):
+            other_memory_profile = (
+                other.towncrier_memory_profile  # type: ignore[attr-defined]
+            )
+            # pylint: disable-next=line-too-long
+            env.towncrier_memory_profile.update(  # type: ignore[attr-defined]
+                other_memory_profile,
+            )
+
+        with suppress_exceptions(AttributeError):
+            env.towncrier_read_times.update(  # type: ignore[attr-defined]
+                other.towncrier_read_times,  # type: ignore[attr-defined]
+            )
+
+        with suppress_exceptions(AttributeError):
+            env.towncrier_work_counts.update(  # type: ignore[attr-defined]
+                other.towncrier_work_counts,  # type: ignore[attr-defined]
+            )
+
+    @staticmethod
+    def _merge_draft_data(
+            env: BuildEnvironment,
+            other: BuildEnvironment,
+    ) -> None:
+        """Combine what the directives recorded in both envs."""
+        with suppress_exceptions(AttributeError):
+            other_unit_cache: DraftUnitCache = (
+                other.towncrier_draft_unit_cache  # type: ignore[attr-defined]
+            )
+            if hasattr(env, 'towncrier_draft_unit_cache'):  # noqa: WPS421
+                env.towncrier_draft_unit_cache.update(other_unit_cache)
+            else:
+                # pylint: disable-next=line-too-long
+                env.towncrier_draft_unit_cache = (  # type: ignore[attr-defined]
+                    other_unit_cache
+                )
+
+        with suppress_exceptions(AttributeError):
+            other_git_ref_docs = (
+                other.towncrier_git_ref_docs  # type: ignore[attr-defined]
+            )
+            if not hasattr(env, 'towncrier_git_ref_docs'):  # noqa: WPS421
+                env.towncrier_git_ref_docs = {}  # type: ignore[attr-defined]
+            env.towncrier_git_ref_docs.update(  # type: ignore[attr-defined]
+                other_git_ref_docs,
+            )
+
+        with suppress_exceptions(AttributeError):
+            other_last_drafts = (
+                other.towncrier_last_drafts  # type: ignore[attr-defined]
+            )
+            if not hasattr(env, 'towncrier_last_drafts'):  # noqa: WPS421
+                env.towncrier_last_drafts = {}  # type: ignore[attr-defined]
+            env.towncrier_last_drafts.update(  # type: ignore[attr-defined]
+                other_last_drafts,
+            )
+
+        with suppress_exceptions(AttributeError):
+            # All the directives in a build record the same stamps but
+            # the readers that haven't run any still carry the ones
+            # from before they were forked
+            other_stamps_build_id = (
+                other.towncrier_fragment_stamps_build_id  # type: ignore[attr-defined]
+            )
+            if other_stamps_build_id == env.towncrier_build_id:  # type: ignore[attr-defined]
+                # pylint: disable-next=line-too-long
+                env.towncrier_fragment_stamps = (  # type: ignore[attr-defined]
+                    other.towncrier_fragment_stamps  # type: ignore[attr-defined]
+                )
+                # pylint: disable-next=line-too-long
+                env.towncrier_fragment_stamps_build_id = (  # type: ignore[attr-defined]
+                    other_stamps_build_id
+                )
+
+        with suppress_exceptions(AttributeError):
+            other_fragment_slices = (
+                other.towncrier_fragment_slices  # type: ignore[attr-defined]
+            )
+            if not hasattr(env, 'towncrier_fragment_slices'):  # noqa: WPS421
+                # pylint: disable-next=line-too-long
+                env.towncrier_fragment_slices = {}  # type: ignore[attr-defined]
+            # pylint: disable-next=line-too-long
+            env.towncrier_fragment_slices.update(  # type: ignore[attr-defined]
+                other_fragment_slices,
+            )
+
         try:
             other_fragment_docs: Set[str] = (
                 other.towncrier_fragment_docs  # type: ignore[attr-defined]
@@ -273,22 +1970,40 @@ class TowncrierDraftEntriesEnvironmentCollector(EnvironmentCollector):
             # at least
             env.towncrier_fragment_docs = set()  # type: ignore[attr-defined]
 
-        if not hasattr(env, 'towncrier_fragment_paths'):  # noqa: WPS421
-            env.towncrier_fragment_paths = set()  # type: ignore[attr-defined]
-
         # Since Sphinx does not pull the same document into multiple
         # processes, we don't care about the same dict key appearing
         # in different envs with different sets of the deps
         env.towncrier_fragment_docs.update(  # type: ignore[attr-defined]
             other_fragment_docs,
         )
-        env.towncrier_fragment_paths.update(  # type: ignore[attr-defined]
-            other.towncrier_fragment_paths,  # type: ignore[attr-defined]
-        )
 
+    @profiled('collector')
     def process_doc(self, app: Sphinx, doctree: nodes.document) -> None:
-        """React to :event:`doctree-read` with no-op."""
+        """Pass the diagnostics of a parallel reader on to the main one.
+
+        This is a handler for :event:`doctree-read`. Besides the work
+        counts, it only passes on the memory profile and the read times
+        when they are enabled.
+        """
+        with suppress_exceptions(AttributeError):
+            app.env.towncrier_work_counts[  # type: ignore[attr-defined]
+                get_process_key()
+            ] = get_work_counts()
+
+        with suppress_exceptions(AttributeError):
+            # pylint: disable-next=line-too-long
+            app.env.towncrier_memory_profile[  # type: ignore[attr-defined]
+                os.getpid()
+            ] = get_phase_allocations()
 
+        read_started_at = _read_started_at.pop(app.env.docname, None)
+        if read_started_at is not None:
+            with suppress_exceptions(AttributeError):
+                app.env.towncrier_read_times[  # type: ignore[attr-defined]
+                    app.env.docname
+                ] = time.monotonic() - read_started_at
+
+    @profiled('collector')
     # pylint: disable-next=too-many-arguments,too-many-positional-arguments
     def get_outdated_docs(  # noqa: WPS211
             self,
@@ -300,31 +2015,223 @@ class TowncrierDraftEntriesEnvironmentCollector(EnvironmentCollector):
     ) -> List[str]:
         """Mark docs with changed fragment deps for rebuild.
 
-        This is a handler for :event:`env-get-outdated`.
+        This is a handler for :event:`env-get-outdated`. The change
+        notes are only looked up when there are documents known to use
+        the directive that aren't being re-read anyway. The added and
+        changed documents are read regardless and record their own
+        dependencies. Each change note is stat'ed once here, regardless
+        of how many documents show it.
+
+        With the rebuild diagnostics enabled, the reasons for re-reading
+        the documents using the directive are noted for the report at
+        the end of the build.
         """
-        towncrier_fragment_paths = lookup_towncrier_fragments(
-            working_dir=env.config.towncrier_draft_working_directory,
+        rebuild_causes: Optional[RebuildCauses] = (
+            {} if env.config.towncrier_draft_rebuild_diagnostics else None
+        )
+        outdated_docs = self._find_outdated_docs(env, changed, rebuild_causes)
+        if rebuild_causes is not None:
+            self._note_rebuild_causes(
+                env, changed, rebuild_causes, outdated_docs,
+            )
+        return list(outdated_docs)
+
+    @staticmethod
+    def _note_rebuild_causes(
+            env: BuildEnvironment,
+            changed: Set[str],
+            rebuild_causes: RebuildCauses,
+            outdated_docs: Set[str],
+    ) -> None:
+        """Keep the causes of re-reading for the build-finished report.
+
+        The directive documents that Sphinx itself found changed are
+        re-read for their own source or its dependencies changing.
+        """
+        directive_docs = (
+            getattr(env, 'towncrier_fragment_docs', set())
+            | set(getattr(env, 'towncrier_fragment_slices', {}))
+            | set(getattr(env, 'towncrier_git_ref_docs', {}))
+        )
+        _rebuild_causes.clear()
+        for docname in directive_docs & changed:
+            _rebuild_causes[docname] = [
+                RebuildCause(
+                    'document-changed',
+                    tuple(
+                        sorted(
+                            str(dependency_path) for dependency_path
+                            in env.dependencies.get(docname, ())
+                        ),
+                    ),
+                ),
+            ]
+        for docname in outdated_docs:
+            _rebuild_causes[docname] = rebuild_causes.get(docname, [])
+
+    def _find_outdated_docs(
+            self,
+            env: BuildEnvironment,
+            changed: Set[str],
+            rebuild_causes: Optional[RebuildCauses] = None,
+    ) -> Set[str]:
+        """Find the docs using the directive whose inputs changed."""
+        outdated_docs = self._get_outdated_git_ref_docs(
+            env, rebuild_causes,
+        ) - changed
+
+        fragment_docs: Set[str] = getattr(
+            env, 'towncrier_fragment_docs', set(),
+        )
+        fragment_slice_docs = set(
+            getattr(env, 'towncrier_fragment_slices', {}),
+        )
+        if not (fragment_docs | fragment_slice_docs) - changed:
+            return outdated_docs
+
+        working_dir = env.config.towncrier_draft_working_directory
+        fragment_path_set = FragmentPathSet.from_paths(
+            resolve_project_path(working_dir),
+            lookup_towncrier_fragments(
+                working_dir=working_dir,
+                config_path=env.config.towncrier_draft_config_path,
+                manifest_path=_get_fragment_manifest_path(env),
+            ),
+        )
+        changed_fragment_paths = self._get_changed_fragment_paths(
+            env, fragment_path_set,
+        )
+
+        outdated_docs |= self._get_outdated_slice_docs(
+            env, changed_fragment_paths, rebuild_causes,
+        ) - changed
+        if changed_fragment_paths:
+            outdated_docs |= fragment_docs - changed
+            if rebuild_causes is not None:
+                fragment_causes = classify_fragment_changes(
+                    getattr(env, 'towncrier_fragment_stamps', {}),
+                    FragmentPathSet(
+                        fragment_path_set.base_dir, changed_fragment_paths,
+                    ).stat(),
+                    changed_fragment_paths,
+                )
+                for docname in fragment_docs - changed:
+                    rebuild_causes.setdefault(docname, []).extend(
+                        fragment_causes,
+                    )
+        return outdated_docs
+
+    @staticmethod
+    def _get_changed_fragment_paths(
+            env: BuildEnvironment,
+            fragment_path_set: FragmentPathSet,
+    ) -> FrozenSet[str]:
+        """Find the change notes added, removed or modified since."""
+        current_stamps = fragment_path_set.stat()
+        recorded_stamps: Mapping[str, Tuple[int, int]] = getattr(
+            env, 'towncrier_fragment_stamps', {},
+        )
+        return frozenset(
+            relative_path
+            for relative_path in current_stamps.keys() | recorded_stamps.keys()
+            if current_stamps.get(relative_path)
+            != recorded_stamps.get(relative_path)
+        )
+
+    @staticmethod
+    def _get_outdated_slice_docs(
+            env: BuildEnvironment,
+            changed_fragment_paths: FrozenSet[str] = frozenset(),
+            rebuild_causes: Optional[RebuildCauses] = None,
+    ) -> Set[str]:
+        """Find docs whose draft slices got change notes changed."""
+        fragment_slices: Dict[str, Dict[DraftSlice, FragmentPathSet]] = (
+            getattr(env, 'towncrier_fragment_slices', {})
+        )
+        if not fragment_slices:
+            return set()
+
+        working_dir = env.config.towncrier_draft_working_directory
+        project_path = resolve_project_path(working_dir)
+        fragment_categories = lookup_towncrier_fragment_categories(
+            working_dir=working_dir,
             config_path=env.config.towncrier_draft_config_path,
+            manifest_path=_get_fragment_manifest_path(env),
         )
 
-        fragments_changed = False
-        with suppress_exceptions(AttributeError):
-            fragments_changed = bool(
-                towncrier_fragment_paths
-                ^ env.towncrier_fragment_paths,  # type: ignore[attr-defined]
-            )
+        current_slice_paths: Dict[DraftSlice, FragmentPathSet] = {}
+        outdated_docs = set()
+        for docname, doc_slices in fragment_slices.items():
+            for draft_slice, slice_paths in doc_slices.items():
+                if draft_slice not in current_slice_paths:
+                    current_slice_paths[draft_slice] = (
+                        FragmentPathSet.from_paths(
+                            project_path,
+                            draft_slice.select_paths(fragment_categories),
+                        )
+                    )
+                changed_slice_paths = (
+                    current_slice_paths[draft_slice] ^ slice_paths
+                ).relative_paths + tuple(
+                    changed_fragment_paths.intersection(
+                        slice_paths.relative_paths,
+                    ),
+                )
+                if not changed_slice_paths:
+                    continue
+                outdated_docs.add(docname)
+                if rebuild_causes is not None:
+                    rebuild_causes.setdefault(docname, []).extend(
+                        classify_fragment_changes(
+                            getattr(env, 'towncrier_fragment_stamps', {}),
+                            FragmentPathSet(
+                                str(project_path), changed_slice_paths,
+                            ).stat(),
+                            set(changed_slice_paths),
+                        ),
+                    )
+        return outdated_docs
 
-        return (
-            list(
-                env.towncrier_fragment_docs  # type: ignore[attr-defined]
-                - changed,
-            )
-            if fragments_changed
-            else []
+    @staticmethod
+    def _get_outdated_git_ref_docs(
+            env: BuildEnvironment,
+            rebuild_causes: Optional[RebuildCauses] = None,
+    ) -> Set[str]:
+        """Find docs rendered from Git refs that have moved since."""
+        git_ref_docs: Dict[str, Tuple[str, str]] = getattr(
+            env, 'towncrier_git_ref_docs', {},
+        )
+        if not git_ref_docs:
+            return set()
+
+        repo_dir = resolve_project_path(
+            env.config.towncrier_draft_working_directory,
         )
 
+        current_commits: Dict[str, Optional[str]] = {}
+        outdated_docs = set()
+        for docname, (git_ref, commit_id) in git_ref_docs.items():
+            if git_ref not in current_commits:
+                current_commits[git_ref] = resolve_git_commit(
+                    repo_dir, git_ref,
+                )
+            if current_commits[git_ref] != commit_id:
+                outdated_docs.add(docname)
+                if rebuild_causes is not None:
+                    rebuild_causes.setdefault(docname, []).append(
+                        RebuildCause(
+                            'git-ref-moved',
+                            (
+                                git_ref,
+                                commit_id,
+                                current_commits[git_ref] or 'unresolvable',
+                            ),
+                        ),
+                    )
+        return outdated_docs
 
-def setup(app: Sphinx) -> Dict[str, Union[bool, str]]:
+
+def setup(app: Sphinx) -> Dict[str, Union[bool, int, str]]:
     """Initialize the extension."""
     rebuild_trigger: Literal[  # rebuild full html on settings change
         'html',
@@ -349,16 +2256,131 @@ def setup(app: Sphinx) -> Dict[str, Union[bool, str]]:
         default=None,
         rebuild=rebuild_trigger,
     )
+    app.add_config_value(
+        'towncrier_draft_git_ref',
+        default=None,
+        rebuild=rebuild_trigger,
+    )
+    app.add_config_value(
+        'towncrier_draft_incremental',
+        default=False,
+        rebuild=rebuild_trigger,
+    )
+    app.add_config_value(
+        'towncrier_draft_doctree_cache',
+        default=False,
+        rebuild='',
+    )
+    app.add_config_value(
+        'towncrier_draft_fragment_read_workers',
+        default=None,
+        rebuild='',
+        types=(int, type(None)),
+    )
+    app.add_config_value(
+        'towncrier_draft_fragment_manifest',
+        default=False,
+        rebuild='',
+        types=(bool, ),
+    )
+    app.add_config_value(
+        'towncrier_draft_output_mode',
+        default='auto',
+        rebuild=rebuild_trigger,
+        types=ENUM('auto', 'rst', 'structured'),
+    )
+    app.add_config_value(
+        'towncrier_draft_shared_cache',
+        default=False,
+        rebuild='',
+    )
+    app.add_config_value(
+        'towncrier_draft_shared_cache_dir',
+        default=None,
+        rebuild='',
+    )
+    app.add_config_value(
+        'towncrier_draft_shared_cache_max_size',
+        default=DEFAULT_DRAFT_CACHE_MAX_SIZE,
+        rebuild='',
+    )
+    app.add_config_value(
+        'towncrier_draft_shared_cache_max_age',
+        default=DEFAULT_DRAFT_CACHE_MAX_AGE,
+        rebuild='',
+    )
+    app.add_config_value(
+        'towncrier_draft_render_concurrency',
+        default=None,
+        rebuild='',
+        types=(int, type(None)),
+    )
+    app.add_config_value(
+        'towncrier_draft_render_timeout',
+        default=None,
+        rebuild='',
+        types=(int, float, type(None)),
+    )
+    app.add_config_value(
+        'towncrier_draft_render_timeout_fallback',
+        default='error',
+        rebuild='',
+        types=ENUM('error', 'cached', 'placeholder'),
+    )
+    app.add_config_value(
+        'towncrier_draft_watched_inputs_file',
+        default=None,
+        rebuild='',
+        types=(str, type(None)),
+    )
+    app.add_config_value(
+        'towncrier_draft_memory_profile',
+        default=False,
+        rebuild='',
+    )
+    app.add_config_value(
+        'towncrier_draft_profile_dir',
+        default=None,
+        rebuild='',
+        types=(str, type(None)),
+    )
+    app.add_config_value(
+        'towncrier_draft_rebuild_diagnostics',
+        default=False,
+        rebuild='',
+    )
     app.add_directive(
         'towncrier-draft-entries',
         TowncrierDraftEntriesDirective,
     )
+    app.add_directive(
+        'towncrier-released-entries',
+        TowncrierReleasedEntriesDirective,
+    )
+
+    app.connect('builder-inited', _reset_lookup_failure_reports)
+    app.connect('builder-inited', _start_memory_profile)
+    app.connect('builder-inited', _start_call_profiles)
+    app.connect('builder-inited', _reset_rebuild_causes)
+    app.connect('builder-inited', _reset_work_counts)
+    app.connect('builder-inited', _generate_draft_pages)
+    app.connect('source-read', _note_read_start)
+    app.connect('env-before-read-docs', _prepare_draft_rendering)
+    app.connect('build-finished', _report_cache_stats)
+    app.connect('build-finished', _report_work_counts)
+    app.connect('build-finished', _write_watched_inputs)
+    app.connect('build-finished', _report_memory_profile)
+    app.connect('build-finished', _merge_call_profiles)
+    app.connect('build-finished', _report_rebuild_causes)
 
     # Register an environment collector to merge data gathered by the
     # directive in parallel builds
     app.add_env_collector(TowncrierDraftEntriesEnvironmentCollector)
 
     return {
+        # Bump this whenever the shape of the data stored in the env
+        # changes so that Sphinx discards the incompatible pickles
+        'env_version': 3,
         'parallel_read_safe': True,
         'parallel_write_safe': True,
         'version': __version__,
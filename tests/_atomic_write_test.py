@@ -0,0 +1,30 @@
+"""Atomic file write tests."""
+
+
+from pathlib import Path
+
+import pytest
+
+from sphinxcontrib.towncrier._atomic_write import write_file_atomically
+
+
+def test_write_file_atomically(tmp_path: Path) -> None:
+    """Check that the file gets replaced in missing parent dirs."""
+    file_path = tmp_path / 'nested' / 'file.json'
+
+    write_file_atomically(file_path, b'old')
+    write_file_atomically(file_path, b'new', temp_suffix='.tmp')
+
+    assert file_path.read_bytes() == b'new'
+    assert list(file_path.parent.iterdir()) == [file_path]
+
+
+def test_write_file_atomically_cleans_up(tmp_path: Path) -> None:
+    """Check that a failed write leaves no temporary files behind."""
+    with pytest.raises(TypeError):
+        write_file_atomically(
+            tmp_path / 'file.json',
+            'not bytes',  # type: ignore[arg-type]
+        )
+
+    assert not list(tmp_path.iterdir())
@@ -0,0 +1,72 @@
+"""Call profile tests."""
+
+
+import os
+import pstats
+from pathlib import Path
+
+from sphinxcontrib.towncrier._call_profile import (
+    MERGED_PROFILE_FILE_NAME, get_profile_file_name, merge_call_profiles,
+    profile_calls, profiled, start_call_profiles,
+)
+
+
+def _profiled_work() -> int:
+    return sum(range(1000))
+
+
+def test_profiles_written_per_label_and_merged(tmp_path: Path) -> None:
+    """Check that nested blocks land in the outer profile."""
+    profile_dir = tmp_path / 'profiles'
+    profile_dir.mkdir()
+    (profile_dir / 'stale.1.pstats').write_bytes(b'')
+
+    @profiled('collector')
+    def _collect() -> int:
+        return _profiled_work()
+
+    start_call_profiles(profile_dir)
+    try:
+        with profile_calls('changes/index'):
+            _profiled_work()
+            with profile_calls('render'):
+                _profiled_work()
+        _collect()
+        merged_profile_path = merge_call_profiles()
+    finally:
+        start_call_profiles(None)
+
+    assert sorted(
+        profile_path.name for profile_path in profile_dir.iterdir()
+    ) == sorted((
+        get_profile_file_name('changes/index', os.getpid()),
+        get_profile_file_name('collector', os.getpid()),
+        MERGED_PROFILE_FILE_NAME,
+    ))
+    assert merged_profile_path == profile_dir / MERGED_PROFILE_FILE_NAME
+    profiled_function_calls = [
+        call_count
+        for (_file_name, _line, function_name), (
+            _prim_calls, call_count, *_timings
+        ) in pstats.Stats(
+            str(merged_profile_path),
+        ).stats.items()  # type: ignore[attr-defined]
+        if function_name == '_profiled_work'
+    ]
+    assert profiled_function_calls == [3]
+
+
+def test_profiling_off(tmp_path: Path) -> None:
+    """Check that nothing is written without a profile dir."""
+    start_call_profiles(None)
+
+    with profile_calls('index'):
+        _profiled_work()
+
+    assert merge_call_profiles() is None
+
+
+def test_get_profile_file_name() -> None:
+    """Check that the labels are made safe to use as file names."""
+    assert get_profile_file_name('a/b c', 42) == 'a_b_c.42.pstats'
+    assert get_profile_file_name('../..', 7) == '_.7.pstats'
@@ -1,8 +1,10 @@
 """Data transformation tests."""
 import pytest
 
+from docutils.statemachine import string2lines
+
 from sphinxcontrib.towncrier._data_transformers import (
-    escape_project_version_rst_substitution,
+    escape_project_version_rst_substitution, iter_markup_lines,
 )
 
 
@@ -28,3 +30,19 @@ def test_escape_version(test_input: str, escaped_input: str) -> None:
     the input is expected to remain unchanged.
     """
     assert escape_project_version_rst_substitution(test_input) == escaped_input
+
+
+@pytest.mark.parametrize(
+    'markup_source',
+    (
+        '',
+        'Title\n=====\n\n- entry\t \n',
+        'no trailing newline\r\nwith\rmixed\x0cbreaks\u2028',
+        '\n\n\tindented\n',
+    ),
+)
+def test_iter_markup_lines(markup_source: str) -> None:
+    """Check that the lines match what docutils would make of them."""
+    assert list(iter_markup_lines(markup_source, tab_width=4)) == (
+        string2lines(markup_source, tab_width=4)
+    )
@@ -0,0 +1,123 @@
+"""Pickled draft node tree tests."""
+
+
+from docutils import nodes
+from docutils.frontend import get_default_settings
+from docutils.parsers.rst import Parser
+from docutils.utils import new_document
+from sphinx import addnodes
+
+from sphinxcontrib.towncrier._doctree_cache import (
+    dump_draft_nodes, load_draft_nodes,
+)
+
+
+def _new_document() -> nodes.document:
+    return new_document('<sentinel>', get_default_settings(Parser))
+
+
+def test_nodes_attached_to_new_document() -> None:
+    """Check that the section targets and refs are registered again."""
+    old_document = _new_document()
+    section = nodes.section('', nodes.title('Bugfixes', 'Bugfixes'))
+    section['names'].append('bugfixes')
+    old_document.note_implicit_target(section, section)
+    pending_xref = addnodes.pending_xref('', refdoc='old-doc')
+    reference = nodes.reference('', 'PR', refname='pr')
+    section += nodes.paragraph('', '', pending_xref, reference)
+
+    pickled_nodes = dump_draft_nodes([section])
+    assert pickled_nodes is not None
+
+    new_document = _new_document()
+    loaded_nodes = load_draft_nodes(pickled_nodes, new_document, 'new-doc')
+
+    assert loaded_nodes is not None
+    loaded_section = loaded_nodes[0]
+    assert loaded_section.document is new_document
+    assert new_document.ids == {'bugfixes': loaded_section}
+    assert new_document.nameids == {'bugfixes': 'bugfixes'}
+    assert list(new_document.refnames) == ['pr']
+    assert next(
+        loaded_section.findall(addnodes.pending_xref),
+    )['refdoc'] == 'new-doc'
+
+
+def _parse(rst_source: str) -> nodes.document:
+    document = _new_document()
+    Parser().parse(rst_source, document)
+    return document
+
+
+def test_hyperlink_targets_registered_anew() -> None:
+    """Check that the loaded targets get ids unique in the new doc."""
+    old_document = _parse(
+        'Fixed `#1 <https://example.com/1>`_ and `#1 '
+        '<https://example.com/1>`_ again, see `docs`_ and `here`__.\n'
+        '\n'
+        '.. _docs: https://example.com/docs\n'
+        '__ https://example.com/anon\n',
+    )
+    draft_nodes = [  # the parse messages go to the outer document
+        draft_node for draft_node in old_document.children
+        if not isinstance(draft_node, nodes.system_message)
+    ]
+    pickled_nodes = dump_draft_nodes(draft_nodes, line_offset=1)
+    assert pickled_nodes is not None
+
+    new_document = _parse('.. _docs: https://example.com/other\n')
+    loaded_nodes = load_draft_nodes(
+        pickled_nodes, new_document, 'new-doc', line_offset=10,
+    )
+
+    assert loaded_nodes is not None
+    loaded_targets = [
+        target
+        for loaded_node in loaded_nodes
+        for target in loaded_node.findall(nodes.target)
+    ]
+    loaded_ids = [
+        target_id
+        for target in loaded_targets
+        for target_id in target['ids']
+    ]
+    assert len(loaded_ids) == len(set(loaded_ids)) == 4
+    assert new_document.ids.keys() >= set(loaded_ids)
+    assert new_document.nameids['#1'] == loaded_targets[0]['ids'][0]
+    assert loaded_targets[1]['dupnames'] == ['#1']
+    assert new_document.nameids['docs'] is None  # clashes like in a parse
+    assert loaded_nodes[0].line == 10
+
+
+def test_document_specific_nodes_not_dumped() -> None:
+    """Check that the footnotes make the nodes non-reusable."""
+    document = _parse('Fixed [#]_.\n\n.. [#] In a footnote.\n')
+
+    assert dump_draft_nodes(document.children) is None
+
+
+def test_duplicate_section_names_redone_on_load() -> None:
+    """Check that a section titled like an earlier one is reusable."""
+    old_document = _new_document()
+    first_section = nodes.section('', nodes.title('Features', 'Features'))
+    first_section['names'].append('features')
+    old_document.note_implicit_target(first_section, first_section)
+    second_section = nodes.section('', nodes.title('Features', 'Features'))
+    second_section['names'].append('features')
+    old_document.note_implicit_target(second_section, second_section)
+    assert second_section['dupnames'] == ['features']
+
+    pickled_nodes = dump_draft_nodes([second_section])
+    assert pickled_nodes is not None
+
+    new_document = _new_document()
+    loaded_nodes = load_draft_nodes(pickled_nodes, new_document, 'new-doc')
+
+    assert loaded_nodes is not None
+    assert loaded_nodes[0]['names'] == ['features']
+    assert not list(loaded_nodes[0].findall(nodes.system_message))
+
+
+def test_broken_pickle_ignored() -> None:
+    """Check that an unusable cache entry is treated as a miss."""
+    assert load_draft_nodes(b'garbage', _new_document(), 'doc') is None
@@ -0,0 +1,71 @@
+"""Shared draft cache tests."""
+
+
+import os
+import time
+from pathlib import Path
+
+import pytest
+
+from sphinxcontrib.towncrier._draft_cache import (
+    DRAFT_CACHE_DIR_NAME, SharedDraftCache, compute_draft_cache_key,
+    get_default_draft_cache_dir,
+)
+
+
+def test_default_draft_cache_dir(
+        monkeypatch: pytest.MonkeyPatch,
+        tmp_path: Path,
+) -> None:
+    """Check that the XDG cache home is respected."""
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path))
+    assert get_default_draft_cache_dir() == tmp_path / DRAFT_CACHE_DIR_NAME
+
+
+def test_compute_draft_cache_key() -> None:
+    """Check that the key parts are not simply concatenated."""
+    assert compute_draft_cache_key(('ab', 'c')) != compute_draft_cache_key(
+        ('a', 'bc'),
+    )
+
+
+def test_put_and_get(tmp_path: Path) -> None:
+    """Check that a stored draft can be read back."""
+    shared_cache = SharedDraftCache(str(tmp_path))
+    cache_key = compute_draft_cache_key(('draft',))
+
+    assert shared_cache.get(cache_key) is None
+    shared_cache.put(cache_key, 'Draft ✨')
+    assert shared_cache.get(cache_key) == 'Draft ✨'
+    assert not list(tmp_path.rglob('*.tmp'))
+
+
+def test_evict_least_recently_used(tmp_path: Path) -> None:
+    """Check that the oldest entries are dropped above the size limit."""
+    shared_cache = SharedDraftCache(str(tmp_path), max_size=20)
+    first_key, second_key, third_key = (
+        compute_draft_cache_key((key_part,))
+        for key_part in ('first', 'second', 'third')
+    )
+    long_ago = time.time() - 100
+    shared_cache.put(first_key, 'x' * 8)
+    shared_cache.put(second_key, 'y' * 8)
+    os.utime(shared_cache._get_entry_path(second_key), (long_ago, long_ago))
+    shared_cache.put(third_key, 'z' * 8)
+
+    assert shared_cache.get(first_key) == 'x' * 8
+    assert shared_cache.get(second_key) is None
+    assert shared_cache.get(third_key) == 'z' * 8
+
+
+def test_evict_expired(tmp_path: Path) -> None:
+    """Check that the entries unused for too long are dropped."""
+    shared_cache = SharedDraftCache(str(tmp_path), max_age=60)
+    stale_key = compute_draft_cache_key(('stale',))
+    shared_cache.put(stale_key, 'stale')
+    long_ago = time.time() - 120
+    os.utime(shared_cache._get_entry_path(stale_key), (long_ago, long_ago))
+
+    shared_cache.evict()
+
+    assert shared_cache.get(stale_key) is None
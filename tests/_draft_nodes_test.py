@@ -0,0 +1,71 @@
+"""Draft node tree construction tests."""
+
+
+from typing import List
+
+import pytest
+
+from docutils import nodes
+
+from sphinxcontrib.towncrier._draft_nodes import (
+    DraftUnitCache, render_draft_entry_markup,
+)
+
+
+UNIT_KEY = '', 'feature', 'digest-sentinel'
+
+
+@pytest.mark.parametrize(
+    ('entry_text', 'issues', 'expected_markup'),
+    (
+        ('Fixed a thing', ['#1', '#2'], 'Fixed a thing (#1, #2)'),
+        ('Fixed a thing', [], 'Fixed a thing'),
+        ('', ['#1', '#2'], '#1, #2'),
+    ),
+    ids=('text-and-issues', 'orphan', 'no-content'),
+)
+def test_render_draft_entry_markup(
+        entry_text: str,
+        issues: List[str],
+        expected_markup: str,
+) -> None:
+    """Check that entries are rendered like the stock template does."""
+    assert render_draft_entry_markup(entry_text, issues) == expected_markup
+
+
+def test_draft_unit_cache_returns_copies() -> None:
+    """Check that cached entries aren't shared between node trees."""
+    unit_cache = DraftUnitCache()
+    list_item = nodes.list_item('', nodes.paragraph('sentinel', 'sentinel'))
+
+    assert unit_cache.get(UNIT_KEY) is None
+    unit_cache.put(UNIT_KEY, list_item)
+    cached_list_item = unit_cache.get(UNIT_KEY)
+
+    assert cached_list_item is not None
+    assert cached_list_item is not list_item
+    assert cached_list_item.astext() == 'sentinel'
+    assert (unit_cache.hits, unit_cache.misses) == (1, 1)
+
+
+def test_draft_unit_cache_skips_document_specific_entries() -> None:
+    """Check that entries with targets aren't cached."""
+    unit_cache = DraftUnitCache()
+    list_item = nodes.list_item('', nodes.target(ids=['sentinel']))
+
+    unit_cache.put(UNIT_KEY, list_item)
+
+    assert not unit_cache
+
+
+def test_draft_unit_cache_evicts_least_recently_used() -> None:
+    """Check that the cache size is bounded."""
+    unit_cache = DraftUnitCache(maxsize=2)
+    for unit_number in range(3):
+        unit_cache.put(
+            ('', 'feature', str(unit_number)),
+            nodes.list_item(),
+        )
+
+    assert len(unit_cache) == 2
+    assert unit_cache.get(('', 'feature', '0')) is None
@@ -0,0 +1,117 @@
+"""Draft sharding tests."""
+
+
+from pathlib import Path
+from typing import Any, List
+
+import pytest
+
+from sphinxcontrib.towncrier import _draft_shards as draft_shards_module
+from sphinxcontrib.towncrier._draft_shards import (
+    DraftShard, find_paged_draft_directives, get_draft_shards,
+    render_overflow_page_source, render_shard_toctree, sync_generated_pages,
+)
+
+
+def test_find_paged_draft_directives() -> None:
+    """Check that only the directives needing pages are collected."""
+    assert find_paged_draft_directives((
+        ('v1.0', {'shard-by': 'sections'}),
+        (None, {'shard-by': 'fragments'}),
+        (None, {'max-entries': '10'}),
+        (None, {}),
+    )) == [
+        ('v1.0', {'shard-by': 'sections'}),
+        (None, {'max-entries': '10'}),
+    ]
+
+
+def test_get_draft_shards_unique_page_names() -> None:
+    """Check that the shards with similar names get distinct pages."""
+    assert get_draft_shards(
+        'changelog', {'Back end': 'Back end', 'back-end': 'Other'},
+    ) == [
+        DraftShard('Back end', 'Back end', 'changelog-draft-back-end'),
+        DraftShard('back-end', 'Other', 'changelog-draft-back-end-2'),
+    ]
+
+
+def test_render_shard_source_and_toctree() -> None:
+    """Check that the sub-page keeps the options of the parent."""
+    draft_shard = DraftShard('bugfix', 'Bugfixes', 'index-draft-bugfix')
+
+    assert draft_shard.render_source(
+        'types',
+        '|release|',
+        {'shard-by': 'types', 'types': 'bugfix', 'git-ref': 'main'},
+    ).splitlines()[2:] == [
+        '.. towncrier-draft-entries:: |release|',
+        '   :git-ref: main',
+        '   :types: bugfix',
+    ]
+    assert render_shard_toctree([draft_shard]) == (
+        '.. toctree::\n\n   Bugfixes <index-draft-bugfix>\n'
+    )
+
+
+def test_render_overflow_page_source() -> None:
+    """Check that the whole draft page is an orphan without the cap."""
+    assert render_overflow_page_source(
+        None, {'max-entries': '10', 'types': 'feature'},
+    ).splitlines()[2:] == [
+        ':orphan:',
+        '',
+        '.. towncrier-draft-entries::',
+        '   :types: feature',
+    ]
+
+
+def test_sync_generated_pages(tmp_path: Path) -> None:
+    """Check that only the changed and the stale pages are touched."""
+    parent_path = tmp_path / 'index.rst'
+    kept_path = tmp_path / 'index-draft-feature.rst'
+    stale_path = tmp_path / 'index-draft-removal.rst'
+    hand_written_path = tmp_path / 'index-draft-notes.rst'
+    page_source = DraftShard(
+        'feature', 'Features', 'index-draft-feature',
+    ).render_source('types', None, {})
+    kept_path.write_text(page_source, encoding='utf-8')
+    stale_path.write_text(page_source, encoding='utf-8')
+    hand_written_path.write_text('Notes\n=====\n', encoding='utf-8')
+
+    assert sync_generated_pages(
+        parent_path,
+        {
+            'index-draft-feature': page_source,
+            'index-draft-bugfix': page_source,
+        },
+        '.rst',
+    ) == 2
+    assert kept_path.exists()
+    assert (tmp_path / 'index-draft-bugfix.rst').exists()
+    assert not stale_path.exists()
+    assert hand_written_path.exists()
+
+
+def test_sync_generated_pages_unwritable(
+        monkeypatch: pytest.MonkeyPatch,
+        tmp_path: Path,
+) -> None:
+    """Check that an unwritable source dir is reported, not raised."""
+    warning_messages: List[str] = []
+    monkeypatch.setattr(
+        draft_shards_module.logger, 'warning', warning_messages.append,
+    )
+
+    def _deny_writing(*args: Any, **kwargs: Any) -> None:
+        raise PermissionError('read-only file system')
+
+    monkeypatch.setattr(Path, 'write_text', _deny_writing)
+
+    assert not sync_generated_pages(
+        tmp_path / 'index.rst', {'index-draft-bugfix': 'Bugfixes'}, '.rst',
+    )
+    assert warning_messages == [
+        'Unable to write the draft page '
+        f'{tmp_path / "index-draft-bugfix.rst"!s}: read-only file system',
+    ]
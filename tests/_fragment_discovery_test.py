@@ -1,13 +1,18 @@
 """Unit tests of the fragment discovery logic."""
 
 
+import subprocess  # noqa: S404
 from pathlib import Path
-from typing import Set, Union
+from typing import List, Set, Union
 
 import pytest
 
+from sphinxcontrib.towncrier import _fragment_discovery
 from sphinxcontrib.towncrier._fragment_discovery import (
-    _find_config_file, _resolve_spec_config, lookup_towncrier_fragments,
+    _find_config_file, _resolve_spec_config,
+    lookup_towncrier_config, lookup_towncrier_fragment_categories,
+    lookup_towncrier_fragments, lookup_towncrier_fragments_in_git,
+    lookup_towncrier_watched_inputs, reset_reported_lookup_failures,
 )
 
 
@@ -160,3 +165,164 @@ def test_lookup_towncrier_fragments_unset_dir(tmp_path: Path) -> None:
         TOWNCRIER_TOML_FILENAME,
     )
     assert discovered_fragment_paths == set()
+
+
+def test_lookup_towncrier_fragments_duplicate(tmp_path: Path) -> None:
+    """Test that the change notes towncrier rejects aren't discovered."""
+    change_notes_dir_path = tmp_path / 'newsfragments'
+    change_notes_dir_path.mkdir()
+    for change_note_name in ('1.feature.rst', '001.feature.rst'):
+        (change_notes_dir_path / change_note_name).write_text(
+            'duplicate', encoding=UTF8_ENCODING,
+        )
+    (tmp_path / TOWNCRIER_TOML_FILENAME).write_text(
+        '[tool.towncrier]\ndirectory="newsfragments"',
+        encoding=UTF8_ENCODING,
+    )
+
+    reset_reported_lookup_failures()
+    discovered_fragment_paths = lookup_towncrier_fragments.__wrapped__(
+        str(tmp_path),
+        TOWNCRIER_TOML_FILENAME,
+    )
+    assert discovered_fragment_paths == set()
+
+
+def test_lookup_towncrier_fragments_in_git(tmp_path: Path) -> None:
+    """Test that fragments are read from a Git ref, not the work tree."""
+    change_notes_dir_path = tmp_path / 'newsfragments-sentinel'
+    change_notes_dir_path.mkdir()
+    (change_notes_dir_path / '1.feature.rst').write_text(
+        'committed', encoding=UTF8_ENCODING,
+    )
+    (tmp_path / TOWNCRIER_TOML_FILENAME).write_text(
+        '[tool.towncrier]\ndirectory="newsfragments-sentinel"',
+        encoding=UTF8_ENCODING,
+    )
+    for git_cmd in (
+            ('init', '--quiet'),
+            ('add', '--all'),
+            (
+                '-c', 'user.name=Test', '-c', 'user.email=test@example.com',
+                'commit', '--quiet', '--message=Initial commit',
+            ),
+    ):
+        subprocess.check_call(('git', *git_cmd), cwd=tmp_path)  # noqa: S603
+    (change_notes_dir_path / '2.bugfix.rst').write_text(
+        'uncommitted', encoding=UTF8_ENCODING,
+    )
+
+    draft_inputs = lookup_towncrier_fragments_in_git('HEAD', str(tmp_path))
+
+    assert draft_inputs.fragment_contents == {
+        '': {('1', 'feature', 0): 'committed'},
+    }
+    assert draft_inputs.template_source is None
+
+
+def test_lookup_towncrier_fragments_in_git_metadata(tmp_path: Path) -> None:
+    """Test that a Git ref gets the project name like the work tree."""
+    (tmp_path / PYPROJECT_TOML_FILENAME).write_text(
+        '[project]\nname="sentinel-project"\n'
+        '[tool.towncrier]\ndirectory="newsfragments"',
+        encoding=UTF8_ENCODING,
+    )
+    for git_cmd in (
+            ('init', '--quiet'),
+            ('add', '--all'),
+            (
+                '-c', 'user.name=Test', '-c', 'user.email=test@example.com',
+                'commit', '--quiet', '--message=Initial commit',
+            ),
+    ):
+        subprocess.check_call(('git', *git_cmd), cwd=tmp_path)  # noqa: S603
+
+    draft_inputs = lookup_towncrier_fragments_in_git('HEAD', str(tmp_path))
+    work_tree_config = lookup_towncrier_config(str(tmp_path))
+
+    assert work_tree_config is not None
+    assert draft_inputs.towncrier_config.name == 'sentinel-project'
+    assert draft_inputs.towncrier_config.package == work_tree_config.package
+    assert draft_inputs.towncrier_config.name == work_tree_config.name
+
+
+def test_lookup_towncrier_fragments_in_git_bad_ref(tmp_path: Path) -> None:
+    """Test that an unresolvable Git ref is reported."""
+    subprocess.check_call(  # noqa: S603, S607
+        ('git', 'init', '--quiet'), cwd=tmp_path,
+    )
+    with pytest.raises(LookupError, match='^Unable to resolve Git ref'):
+        lookup_towncrier_fragments_in_git('HEAD', str(tmp_path))
+
+
+def test_config_lookup_failure_cached(
+        monkeypatch: pytest.MonkeyPatch,
+        tmp_path: Path,
+) -> None:
+    """Check that a broken config is parsed and reported only once."""
+    config_file_path = tmp_path / TOWNCRIER_TOML_FILENAME
+    config_file_path.write_text('[tool.towncrier', encoding=UTF8_ENCODING)
+
+    parsed_config_paths: List[Path] = []
+    reported_warnings: List[str] = []
+    parse_config = _fragment_discovery._parse_project_towncrier_config
+
+    def _count_config_parsing(project_path: Path, *args: object) -> object:
+        parsed_config_paths.append(project_path)
+        return parse_config(project_path, *args)  # type: ignore[arg-type]
+
+    monkeypatch.setattr(
+        _fragment_discovery,
+        '_parse_project_towncrier_config',
+        _count_config_parsing,
+    )
+    monkeypatch.setattr(
+        _fragment_discovery.logger, 'warning', reported_warnings.append,
+    )
+    reset_reported_lookup_failures()
+
+    for _build_number in range(2):
+        assert not lookup_towncrier_fragments.__wrapped__(str(tmp_path))
+        assert not lookup_towncrier_fragment_categories.__wrapped__(
+            str(tmp_path),
+        )
+    assert len(parsed_config_paths) == 1
+    assert len(reported_warnings) == 1
+
+    reset_reported_lookup_failures()
+    config_file_path.write_text(
+        '[tool.towncrier]\ndirectory = "changes"\n',
+        encoding=UTF8_ENCODING,
+    )
+    assert not lookup_towncrier_fragments.__wrapped__(str(tmp_path))
+    assert len(parsed_config_paths) == 2
+    assert len(reported_warnings) == 1
+
+
+def test_watched_inputs_of_broken_config(tmp_path: Path) -> None:
+    """Check that only the config is watched until it gets fixed."""
+    config_file_path = tmp_path / PYPROJECT_TOML_FILENAME
+    config_file_path.write_text('[tool.towncrier', encoding=UTF8_ENCODING)
+    reset_reported_lookup_failures()
+
+    watched_inputs = lookup_towncrier_watched_inputs(str(tmp_path))
+
+    assert watched_inputs.config_file == config_file_path
+    assert not watched_inputs.fragment_dirs
+    assert watched_inputs.template_file is None
+
+    config_file_path.write_text(
+        '[tool.towncrier]\n'
+        'directory = "changes"\n'
+        'template = "changes/template.rst"\n',
+        encoding=UTF8_ENCODING,
+    )
+    (tmp_path / 'changes').mkdir()
+    (tmp_path / 'changes' / 'template.rst').touch()
+
+    watched_inputs = lookup_towncrier_watched_inputs(str(tmp_path))
+
+    assert watched_inputs.fragment_dirs == (tmp_path / 'changes', )
+    assert watched_inputs.template_file == (
+        tmp_path / 'changes' / 'template.rst'
+    )
@@ -0,0 +1,59 @@
+"""Change note file reading tests."""
+
+
+import hashlib
+from pathlib import Path
+from typing import Optional
+
+import pytest
+
+from sphinxcontrib.towncrier._fragment_io import (
+    MAX_FRAGMENT_READ_WORKERS, get_fragment_read_workers, read_fragment_files,
+)
+
+
+@pytest.mark.parametrize('max_workers', (1, 4), ids=('sequential', 'pooled'))
+def test_read_fragment_files(max_workers: int, tmp_path: Path) -> None:
+    """Check that the files are decoded and hashed in any mode."""
+    fragment_paths = []
+    for fragment_number in range(10):
+        fragment_path = tmp_path / f'{fragment_number}.feature.rst'
+        fragment_path.write_bytes(f'Ünïcode {fragment_number}'.encode())
+        fragment_paths.append(fragment_path)
+
+    fragment_files = read_fragment_files(
+        fragment_paths, max_workers=max_workers,
+    )
+
+    assert list(fragment_files) == fragment_paths
+    assert fragment_files[fragment_paths[3]].text == 'Ünïcode 3'
+    assert fragment_files[fragment_paths[3]].digest == hashlib.sha256(
+        'Ünïcode 3'.encode(),
+    ).hexdigest()
+
+
+def test_read_fragment_files_invalid_utf8(tmp_path: Path) -> None:
+    """Check that undecodable bytes are replaced like towncrier does."""
+    fragment_path = tmp_path / '1.bugfix.rst'
+    fragment_path.write_bytes(b'broken \xff')
+
+    fragment_file = read_fragment_files([fragment_path])[fragment_path]
+
+    assert fragment_file.text == 'broken �'
+
+
+@pytest.mark.parametrize(
+    ('configured_workers', 'expected_workers'),
+    ((0, 1), (1, 1), (64, 64)),
+)
+def test_get_fragment_read_workers_configured(
+        configured_workers: Optional[int],
+        expected_workers: int,
+) -> None:
+    """Check that the configured pool size is respected."""
+    assert get_fragment_read_workers(configured_workers) == expected_workers
+
+
+def test_get_fragment_read_workers_default() -> None:
+    """Check that the default pool size is bounded."""
+    assert 1 < get_fragment_read_workers(None) <= MAX_FRAGMENT_READ_WORKERS
@@ -0,0 +1,107 @@
+"""Change note manifest tests."""
+
+
+import os
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from sphinxcontrib.towncrier import _fragment_discovery
+from sphinxcontrib.towncrier._fragment_discovery import (
+    lookup_towncrier_fragments,
+)
+from sphinxcontrib.towncrier._fragment_manifest import (
+    build_fragment_manifest, list_fresh_manifest_dirs, load_fragment_manifest,
+    write_fragment_manifest,
+)
+
+
+UTF8_ENCODING = 'utf-8'
+
+
+def test_manifest_roundtrip(tmp_path: Path) -> None:
+    """Check that the listings survive being stored and loaded."""
+    (tmp_path / 'changes').mkdir()
+    (tmp_path / 'changes' / '1.feature.rst').write_bytes(b'Feature.')
+
+    fragment_manifest = build_fragment_manifest(
+        tmp_path, ('changes', 'missing'),
+    )
+    write_fragment_manifest(tmp_path / 'fragments.json', fragment_manifest)
+
+    assert load_fragment_manifest(
+        tmp_path / 'fragments.json',
+    ) == fragment_manifest
+    assert fragment_manifest['changes'].files == ('1.feature.rst', )
+    assert fragment_manifest['missing'].mtime_ns is None
+
+
+@pytest.mark.parametrize(
+    'manifest_text',
+    ('', '[]', '{"version": 1}', '{"version": 2, "directories": []}'),
+)
+def test_unusable_manifest_ignored(manifest_text: str, tmp_path: Path) -> None:
+    """Check that malformed manifests are treated as missing."""
+    manifest_path = tmp_path / 'fragments.json'
+    manifest_path.write_text(manifest_text, encoding=UTF8_ENCODING)
+
+    assert load_fragment_manifest(manifest_path) is None
+
+
+def test_manifest_invalidated_by_dir_mtime(tmp_path: Path) -> None:
+    """Check that adding a file to a fragment dir makes it stale."""
+    (tmp_path / 'changes').mkdir()
+    fragment_manifest = build_fragment_manifest(tmp_path, ('changes', ))
+
+    assert list_fresh_manifest_dirs(
+        fragment_manifest, tmp_path, ('changes', ),
+    ) == {'changes': ()}
+    assert list_fresh_manifest_dirs(
+        fragment_manifest, tmp_path, ('changes', 'other'),
+    ) is None
+
+    (tmp_path / 'changes' / '1.feature.rst').touch()
+    os.utime(tmp_path / 'changes', ns=(0, 0))
+    assert list_fresh_manifest_dirs(
+        fragment_manifest, tmp_path, ('changes', ),
+    ) is None
+
+
+def test_lookup_skips_listing_with_fresh_manifest(
+        monkeypatch: pytest.MonkeyPatch,
+        tmp_path: Path,
+) -> None:
+    """Check that the discovery reads the manifest instead of the dirs."""
+    (tmp_path / 'towncrier.toml').write_text(
+        '[tool.towncrier]\ndirectory = "changes"\n',
+        encoding=UTF8_ENCODING,
+    )
+    (tmp_path / 'changes').mkdir()
+    (tmp_path / 'changes' / '1.feature.rst').write_text(
+        'Feature.', encoding=UTF8_ENCODING,
+    )
+
+    manifest_path = tmp_path / 'doctrees' / 'fragments.json'
+    assert lookup_towncrier_fragments.__wrapped__(
+        str(tmp_path), manifest_path=str(manifest_path),
+    ) == {tmp_path / 'changes' / '1.feature.rst'}
+    assert manifest_path.is_file()
+
+    def _fail_building(*args: object, **kwargs: object) -> None:
+        raise AssertionError('the manifest was regenerated')
+
+    list_dir = os.listdir
+
+    def _fail_listing(dir_path: Path) -> List[str]:
+        assert Path(dir_path) != tmp_path / 'changes'
+        return list_dir(dir_path)
+
+    monkeypatch.setattr(
+        _fragment_discovery, 'build_fragment_manifest', _fail_building,
+    )
+    monkeypatch.setattr(os, 'listdir', _fail_listing)
+
+    assert lookup_towncrier_fragments.__wrapped__(
+        str(tmp_path), manifest_path=str(manifest_path),
+    ) == {tmp_path / 'changes' / '1.feature.rst'}
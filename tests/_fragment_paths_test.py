@@ -0,0 +1,89 @@
+"""Compact change note path set tests."""
+
+
+import pickle  # noqa: S403
+from pathlib import Path
+
+from sphinxcontrib.towncrier._fragment_paths import (
+    FragmentPathSet, FragmentStamps,
+)
+
+
+def test_paths_stored_relative_and_sorted(tmp_path: Path) -> None:
+    """Check that absolute paths are kept relative to the base dir."""
+    path_set = FragmentPathSet.from_paths(
+        tmp_path,
+        (
+            tmp_path / 'changes' / '2.bugfix.rst',
+            tmp_path / 'changes' / '1.feature.rst',
+            tmp_path / 'changes' / 'sub' / '3.misc.rst',
+        ),
+    )
+
+    assert path_set.relative_paths == (
+        'changes/1.feature.rst',
+        'changes/2.bugfix.rst',
+        'changes/sub/3.misc.rst',
+    )
+    assert set(path_set) == {
+        tmp_path / 'changes' / '1.feature.rst',
+        tmp_path / 'changes' / '2.bugfix.rst',
+        tmp_path / 'changes' / 'sub' / '3.misc.rst',
+    }
+
+
+def test_pickle_roundtrip() -> None:
+    """Check that the directory-grouped pickle state is lossless."""
+    path_set = FragmentPathSet(
+        '/project',
+        ('top.rst', 'changes/1.feature.rst', 'changes/2.bugfix.rst'),
+    )
+
+    assert path_set.__getstate__() == (
+        '/project',
+        (('changes', ('1.feature.rst', '2.bugfix.rst')), ('', ('top.rst',))),
+    )
+
+    unpickled_set = pickle.loads(pickle.dumps(path_set))  # noqa: S301
+    assert unpickled_set == path_set
+    assert unpickled_set.relative_paths == path_set.relative_paths
+    assert unpickled_set.digest == path_set.digest
+
+
+def test_digest_comparison() -> None:
+    """Check that the sets only compare equal with the same contents."""
+    path_set = FragmentPathSet('/project', ('a.rst', 'b.rst'))
+
+    assert path_set == FragmentPathSet('/project', ('b.rst', 'a.rst'))
+    assert path_set != FragmentPathSet('/project', ('a.rst',))
+    assert path_set != FragmentPathSet('/other-project', ('a.rst', 'b.rst'))
+    assert path_set != {Path('/project/a.rst'), Path('/project/b.rst')}
+
+
+def test_symmetric_difference() -> None:
+    """Check that the symmetric difference works path-wise."""
+    first_set = FragmentPathSet('/project', ('a.rst', 'b.rst'))
+    second_set = FragmentPathSet('/project', ('b.rst', 'c.rst'))
+
+    assert (first_set ^ second_set).relative_paths == ('a.rst', 'c.rst')
+    assert not first_set ^ first_set
+
+
+def test_stamps_pickle_roundtrip() -> None:
+    """Check that the stamps get pickled with the paths grouped."""
+    fragment_stamps = FragmentStamps({
+        'changes/2.bugfix.rst': (2, 20),
+        'top.rst': (3, 30),
+        'changes/1.feature.rst': (1, 10),
+    })
+
+    assert fragment_stamps.__reduce__()[1] == (
+        (('changes', ('1.feature.rst', '2.bugfix.rst')), ('', ('top.rst',))),
+        ((1, 10), (2, 20), (3, 30)),
+    )
+
+    unpickled_stamps = pickle.loads(  # noqa: S301
+        pickle.dumps(fragment_stamps),
+    )
+    assert isinstance(unpickled_stamps, FragmentStamps)
+    assert unpickled_stamps == fragment_stamps
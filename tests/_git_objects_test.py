@@ -0,0 +1,93 @@
+"""Git object database reader tests."""
+
+
+import subprocess  # noqa: S404
+from pathlib import Path
+
+import pytest
+
+from sphinxcontrib.towncrier._git_objects import (
+    GitObjectReader, iter_tree_entries, resolve_git_commit,
+)
+
+
+UTF8_ENCODING = 'utf-8'
+
+
+@pytest.fixture
+def git_repo_path(tmp_path: Path) -> Path:
+    """Initialize a Git repository with a couple of committed files."""
+    (tmp_path / 'sub-dir').mkdir()
+    (tmp_path / 'sub-dir' / 'nested').mkdir()
+    (tmp_path / 'sub-dir' / 'first.txt').write_text(
+        'first', encoding=UTF8_ENCODING,
+    )
+    (tmp_path / 'sub-dir' / 'second.txt').write_text(
+        'second\n', encoding=UTF8_ENCODING,
+    )
+    (tmp_path / 'sub-dir' / 'nested' / 'third.txt').write_text(
+        'third', encoding=UTF8_ENCODING,
+    )
+    for git_cmd in (
+            ('init', '--quiet'),
+            ('add', '--all'),
+            (
+                '-c', 'user.name=Test', '-c', 'user.email=test@example.com',
+                'commit', '--quiet', '--message=Initial commit',
+            ),
+    ):
+        subprocess.check_call(('git', *git_cmd), cwd=tmp_path)  # noqa: S603
+    return tmp_path
+
+
+def test_read_objects_pipelined(git_repo_path: Path) -> None:
+    """Check that missing objects are reported in place as ``None``."""
+    with GitObjectReader(git_repo_path) as git_reader:
+        first, missing, second = git_reader.read_objects((
+            'HEAD:./sub-dir/first.txt',
+            'HEAD:./sub-dir/missing.txt',
+            'HEAD:./sub-dir/second.txt',
+        ))
+
+    assert first is not None
+    assert first.object_type == 'blob'
+    assert first.data == b'first'
+    assert missing is None
+    assert second is not None
+    assert second.data == b'second\n'
+
+
+def test_read_tree_blobs_skips_subtrees(git_repo_path: Path) -> None:
+    """Check that only the files directly inside the tree are read."""
+    with GitObjectReader(git_repo_path / 'sub-dir') as git_reader:
+        tree_blobs = git_reader.read_tree_blobs('HEAD:./')
+
+    assert tree_blobs == {'first.txt': b'first', 'second.txt': b'second\n'}
+
+
+def test_read_tree_blobs_missing_tree(git_repo_path: Path) -> None:
+    """Check that a missing tree is treated as an empty one."""
+    with GitObjectReader(git_repo_path) as git_reader:
+        assert not git_reader.read_tree_blobs('HEAD:./non-existing-dir')
+
+
+def test_iter_tree_entries() -> None:
+    """Check that raw tree objects are parsed as expected."""
+    raw_tree = (
+        b'100644 file.rst\0' + bytes(range(20)) +
+        b'40000 dir\0' + bytes(20)
+    )
+    assert list(iter_tree_entries(raw_tree, object_id_size=20)) == [
+        (b'100644', 'file.rst', bytes(range(20)).hex()),
+        (b'40000', 'dir', '00' * 20),
+    ]
+
+
+def test_resolve_git_commit(git_repo_path: Path) -> None:
+    """Check that refs are resolved into commit IDs."""
+    head_commit_id = subprocess.check_output(  # noqa: S603, S607
+        ('git', 'rev-parse', 'HEAD'), cwd=git_repo_path, text=True,
+    ).strip()
+
+    assert resolve_git_commit(git_repo_path, 'HEAD') == head_commit_id
+    assert resolve_git_commit(git_repo_path, 'non-existing-ref') is None
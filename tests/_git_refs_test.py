@@ -0,0 +1,109 @@
+"""Git ref reader tests."""
+
+
+import subprocess  # noqa: S404
+from pathlib import Path
+
+import pytest
+
+from packaging.version import Version
+
+from sphinxcontrib.towncrier._git_refs import (
+    find_git_dirs, get_scm_version, guess_next_version, read_packed_refs,
+    stat_version_refs,
+)
+
+
+def _git(repo_path: Path, *git_args: str) -> str:
+    return subprocess.check_output(  # noqa: S603
+        (
+            'git', '-c', 'user.name=Test', '-c', 'user.email=test@example.com',
+            *git_args,
+        ),
+        cwd=repo_path,
+        text=True,
+    ).strip()
+
+
+@pytest.fixture
+def git_repo_path(tmp_path: Path) -> Path:
+    """Initialize a Git repository with a couple of version tags."""
+    _git(tmp_path, 'init', '--quiet')
+    _git(tmp_path, 'commit', '--quiet', '--allow-empty', '--message=First')
+    _git(tmp_path, 'tag', 'v1.0.0')
+    _git(tmp_path, 'commit', '--quiet', '--allow-empty', '--message=Second')
+    _git(tmp_path, 'tag', '--annotate', '--message=Release', 'v1.1.0')
+    _git(tmp_path, 'tag', 'not-a-version')
+    return tmp_path
+
+
+@pytest.mark.parametrize(
+    ('last_version', 'expected_next_version'),
+    (
+        ('1.2.3', '1.2.4'),
+        ('2', '3'),
+        ('2.0.0rc1', '2.0.0'),
+        ('2.0.0.dev3', '2.0.0'),
+        ('1.0.post1', '1.1'),
+    ),
+)
+def test_guess_next_version(
+        last_version: str,
+        expected_next_version: str,
+) -> None:
+    """Check that the next release is guessed like setuptools-scm does."""
+    assert guess_next_version(Version(last_version)) == expected_next_version
+
+
+@pytest.mark.parametrize('pack_refs', (False, True), ids=('loose', 'packed'))
+def test_get_scm_version(git_repo_path: Path, pack_refs: bool) -> None:
+    """Check that the version is derived from loose and packed tags."""
+    if pack_refs:
+        _git(git_repo_path, 'pack-refs', '--all')
+        assert 'refs/tags/v1.1.0' in read_packed_refs(
+            find_git_dirs(git_repo_path).common_dir,  # type: ignore[union-attr]
+        )
+
+    # The HEAD commit is tagged by the annotated tag
+    (git_repo_path / 'docs').mkdir()
+    assert get_scm_version(git_repo_path / 'docs') == '1.1.0'
+
+    _git(git_repo_path, 'commit', '--quiet', '--allow-empty', '--message=Next')
+    assert get_scm_version(git_repo_path) == '1.1.1'
+
+
+def test_get_scm_version_packed_tag_object(git_repo_path: Path) -> None:
+    """Check that a loose ref to a packed annotated tag is peeled."""
+    _git(git_repo_path, 'repack', '-a', '-d', '--quiet')
+    _git(git_repo_path, 'prune-packed')
+    assert not list((git_repo_path / '.git' / 'objects').glob('??/*'))
+    assert (git_repo_path / '.git' / 'refs' / 'tags' / 'v1.1.0').is_file()
+
+    assert get_scm_version(git_repo_path) == '1.1.0'
+
+
+def test_get_scm_version_without_tags(tmp_path: Path) -> None:
+    """Check that no version is derived without any version tags."""
+    _git(tmp_path, 'init', '--quiet')
+    assert get_scm_version(tmp_path) is None
+
+
+def test_get_scm_version_on_maintenance_branch(git_repo_path: Path) -> None:
+    """Check that the tags of the other branches are left out."""
+    _git(git_repo_path, 'checkout', '--quiet', '-b', 'stable/1.0.x', 'v1.0.0')
+    _git(git_repo_path, 'commit', '--quiet', '--allow-empty', '--message=Fix')
+
+    assert get_scm_version(git_repo_path) == '1.0.1'
+
+
+def test_stat_version_refs(git_repo_path: Path) -> None:
+    """Check that committing and tagging change the refs snapshot."""
+    initial_stamps = stat_version_refs(git_repo_path)
+    assert initial_stamps == stat_version_refs(git_repo_path)
+
+    _git(git_repo_path, 'commit', '--quiet', '--allow-empty', '--message=Next')
+    committed_stamps = stat_version_refs(git_repo_path)
+    assert committed_stamps != initial_stamps
+
+    _git(git_repo_path, 'tag', 'v1.2.0')
+    assert stat_version_refs(git_repo_path) != committed_stamps
@@ -0,0 +1,90 @@
+"""Memory profile tests."""
+
+
+import tracemalloc
+
+import pytest
+
+from sphinxcontrib.towncrier._memory_profile import (
+    MEMORY_PROFILE_ENV_VAR, PhaseAllocations, combine_phase_profiles,
+    format_byte_size, get_phase_allocations, is_memory_profile_requested,
+    start_memory_profile, stop_memory_profile, track_phase_allocations,
+)
+
+
+def test_phase_allocations_tracked() -> None:
+    """Check that the peak and the retained memory are told apart."""
+    start_memory_profile()
+    try:
+        retained_buffers = []
+        with track_phase_allocations('render'):
+            temporary_buffer = bytearray(4 * 1024 * 1024)
+            del temporary_buffer  # noqa: WPS420
+            retained_buffers.append(bytearray(1024 * 1024))
+        with track_phase_allocations('nodes'):
+            with track_phase_allocations('render'):
+                retained_buffers.append(bytearray(1024 * 1024))
+        phase_profile = get_phase_allocations()
+    finally:
+        stop_memory_profile()
+
+    assert not tracemalloc.is_tracing()
+    assert phase_profile['render'].calls == 1
+    assert phase_profile['render'].peak >= 4 * 1024 * 1024
+    assert 1024 * 1024 <= phase_profile['render'].retained < 2 * 1024 * 1024
+    assert phase_profile['nodes'].calls == 1
+    assert phase_profile['nodes'].retained >= 1024 * 1024
+
+
+def test_phases_not_tracked_without_tracing() -> None:
+    """Check that nothing is recorded unless the profile is started."""
+    start_memory_profile()
+    stop_memory_profile()
+
+    with track_phase_allocations('discovery'):
+        bytearray(1024)  # noqa: WPS428
+
+    assert get_phase_allocations() == {}
+
+
+def test_combine_phase_profiles() -> None:
+    """Check that the processes add up and the largest peak is kept."""
+    assert combine_phase_profiles((
+        {'render': PhaseAllocations(calls=1, peak=10, retained=5)},
+        {
+            'render': PhaseAllocations(calls=2, peak=30, retained=1),
+            'merge': PhaseAllocations(calls=1, peak=3, retained=0),
+        },
+    )) == {
+        'render': PhaseAllocations(calls=3, peak=30, retained=6),
+        'merge': PhaseAllocations(calls=1, peak=3, retained=0),
+    }
+
+
+@pytest.mark.parametrize(
+    ('env_value', 'config_flag', 'expected_request'),
+    (
+        ('', False, False),
+        ('0', False, False),
+        ('false', False, False),
+        ('', True, True),
+        ('1', False, True),
+    ),
+)
+def test_is_memory_profile_requested(
+        env_value: str,
+        config_flag: bool,
+        expected_request: bool,
+        monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Check that either the config or the env var enables the profile."""
+    monkeypatch.setenv(MEMORY_PROFILE_ENV_VAR, env_value)
+
+    assert is_memory_profile_requested(config_flag) is expected_request
+
+
+def test_format_byte_size() -> None:
+    """Check that the byte counts are rendered in readable units."""
+    assert format_byte_size(512) == '512.0 B'
+    assert format_byte_size(3 * 1024 * 1024) == '3.0 MiB'
+    assert format_byte_size(-2048) == '-2.0 KiB'
@@ -0,0 +1,72 @@
+"""Rebuild cause tests."""
+
+
+import json
+from pathlib import Path
+
+from sphinxcontrib.towncrier._rebuild_causes import (
+    RebuildCause, classify_fragment_changes, write_rebuild_causes,
+)
+
+
+def test_classify_fragment_changes() -> None:
+    """Check that the change note changes are told apart by their stamps."""
+    assert classify_fragment_changes(
+        {
+            'a.rst': (1, 10), 'b.rst': (1, 10),
+            'c.rst': (1, 10), 'd.rst': (1, 1),
+        },
+        {
+            'a.rst': (2, 11), 'b.rst': (2, 10),
+            'd.rst': (1, 1), 'e.rst': (3, 1),
+        },
+    ) == [
+        RebuildCause('fragment-added', ('e.rst',)),
+        RebuildCause('fragment-removed', ('c.rst',)),
+        RebuildCause('fragment-modified', ('a.rst',)),
+        RebuildCause('fragment-touched', ('b.rst',)),
+        RebuildCause('slice-changed', ('d.rst',)),
+    ]
+
+
+def test_classify_fragment_changes_limited_to_paths() -> None:
+    """Check that only the given paths are looked at."""
+    assert classify_fragment_changes(
+        {'a.rst': (1, 10)}, {'b.rst': (1, 10)}, {'b.rst'},
+    ) == [RebuildCause('fragment-added', ('b.rst',))]
+
+
+def test_describe_rebuild_cause() -> None:
+    """Check that long input lists are shortened in the log lines."""
+    assert RebuildCause('document-changed').describe() == 'document-changed'
+    assert RebuildCause(
+        'fragment-added', tuple(f'{num:d}.rst' for num in range(7)),
+    ).describe() == (
+        'fragment-added (0.rst, 1.rst, 2.rst, 3.rst, 4.rst and 2 more)'
+    )
+
+
+def test_write_rebuild_causes(tmp_path: Path) -> None:
+    """Check that the causes are dumped along with the read times."""
+    causes_path = tmp_path / 'doctrees' / 'causes.json'
+
+    write_rebuild_causes(
+        causes_path,
+        {
+            'changelog': [RebuildCause('git-ref-moved', ('main', 'a', 'b'))],
+            'index': [],
+        },
+        {'changelog': 0.5},
+    )
+
+    assert json.loads(causes_path.read_text(encoding='utf-8')) == {
+        'documents': {
+            'changelog': {
+                'causes': [
+                    {'kind': 'git-ref-moved', 'inputs': ['main', 'a', 'b']},
+                ],
+                'read_time': 0.5,
+            },
+            'index': {'causes': [], 'read_time': None},
+        },
+    }
@@ -0,0 +1,106 @@
+"""Released changelog splitting tests."""
+
+
+from sphinxcontrib.towncrier._release_history import (
+    ReleaseBlock, split_release_blocks,
+)
+
+
+CHANGELOG_TEXT = '''Changelog
+=========
+
+.. towncrier release notes start
+
+v2.0 (2024-02-02)
+=================
+
+Features
+--------
+
+- New thing
+
+v1.0 (2024-01-01)
+=================
+
+- Old thing
+'''
+
+
+def test_split_release_blocks() -> None:
+    """Check that the blocks start at the release titles."""
+    assert split_release_blocks(CHANGELOG_TEXT) == [
+        ReleaseBlock(
+            'Changelog\n=========\n\n.. towncrier release notes start\n', 0,
+        ),
+        ReleaseBlock(
+            'v2.0 (2024-02-02)\n=================\n\n'
+            'Features\n--------\n\n- New thing\n',
+            5,
+        ),
+        ReleaseBlock(
+            'v1.0 (2024-01-01)\n=================\n\n- Old thing', 13,
+        ),
+    ]
+
+
+def test_split_release_blocks_start_after() -> None:
+    """Check that the text up to the marker line is left out."""
+    release_blocks = split_release_blocks(
+        CHANGELOG_TEXT, start_after='towncrier release notes start',
+    )
+
+    assert [
+        release_block.line_offset for release_block in release_blocks
+    ] == [5, 13]
+
+
+def test_split_below_document_title() -> None:
+    """Check that the document title level is not taken for releases."""
+    assert split_release_blocks(
+        'Changelog\n=========\n\nIntro\n\n'
+        '1.0 (2024-01-02)\n----------------\n\nNew\n^^^\n\n- text\n\n'
+        '0.9 (2024-01-01)\n----------------\n\n- old\n',
+    ) == [
+        ReleaseBlock('Changelog\n=========\n\nIntro\n', 0),
+        ReleaseBlock(
+            '1.0 (2024-01-02)\n----------------\n\nNew\n^^^\n\n- text\n',
+            5,
+            section_depth=1,
+        ),
+        ReleaseBlock(
+            '0.9 (2024-01-01)\n----------------\n\n- old', 13,
+            section_depth=1,
+        ),
+    ]
+
+
+def test_split_unversioned_below_document_title() -> None:
+    """Check that the level after a one-off top title is for releases."""
+    release_blocks = split_release_blocks(
+        '=======\nHistory\n=======\n\n'
+        'Latest\n======\n\nNew\n---\n\nOldest\n======\n\nold\n',
+    )
+
+    assert [
+        (release_block.line_offset, release_block.section_depth)
+        for release_block in release_blocks
+    ] == [(0, 0), (4, 1), (10, 1)]
+
+
+def test_split_overlined_release_blocks() -> None:
+    """Check that the overlined titles are matched by their style."""
+    assert split_release_blocks(
+        '=====\n 1.0\n=====\n\nNew\n---\n\ntext\n\n'
+        '=====\n 0.9\n=====\n\nold\n',
+    ) == [
+        ReleaseBlock('=====\n 1.0\n=====\n\nNew\n---\n\ntext\n', 0),
+        ReleaseBlock('=====\n 0.9\n=====\n\nold', 9),
+    ]
+
+
+def test_split_without_titles() -> None:
+    """Check that a changelog without sections is a single block."""
+    assert split_release_blocks('- just\n- a list\n') == [
+        ReleaseBlock('- just\n- a list', 0),
+    ]
+    assert split_release_blocks('') == []
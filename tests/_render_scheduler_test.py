@@ -0,0 +1,213 @@
+"""Concurrent draft rendering tests."""
+
+
+import io
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+from sphinxcontrib.towncrier._render_scheduler import (
+    DraftDirectiveUsage, DraftRenderJob, TowncrierRenderTimeoutError,
+    find_draft_directive_arguments, get_render_concurrency,
+    iter_draft_directives, read_stripped_text, render_towncrier_drafts,
+    run_towncrier_process, scan_draft_directive_usage,
+)
+
+
+PRINT_ARGV_CMD = (
+    sys.executable, '-I', '-c',
+    'import json, os, sys; print(json.dumps([os.getcwd()] + sys.argv[1:]))',
+)
+SLEEP_CMD = (sys.executable, '-I', '-c', 'import time; time.sleep(60)')
+
+
+def test_find_draft_directive_arguments() -> None:
+    """Check that only the directives running towncrier are collected."""
+    assert find_draft_directive_arguments(
+        'Title\n=====\n\n'
+        '.. towncrier-draft-entries:: |release|\n\n'
+        '.. towncrier-draft-entries::\n\n'
+        '  .. towncrier-draft-entries:: v2.0\n'
+        '     :git-ref: origin/stable\n\n'
+        '.. towncrier-draft-entries:: v3.0\n'
+        '   :types: feature\n\n'
+        '.. towncrier-draft-entries:: v4.0\n'
+        ':not-an-option: of this directive\n',
+    ) == {'|release|', None, 'v4.0'}
+
+
+def test_iter_draft_directives_option_values() -> None:
+    """Check that the option values are collected as written."""
+    assert list(
+        iter_draft_directives(
+            '.. towncrier-draft-entries:: v1.0\n'
+            '   :shard-by: types\n'
+            '   :sections:  Frontend, Backend \n'
+            '   :git-ref:\n\n'
+            '.. towncrier-draft-entries::\n',
+        ),
+    ) == [
+        (
+            'v1.0',
+            {
+                'shard-by': 'types',
+                'sections': 'Frontend, Backend',
+                'git-ref': '',
+            },
+        ),
+        (None, {}),
+    ]
+
+
+def test_scan_draft_directive_usage(tmp_path: Path) -> None:
+    """Check that in-process directives count as directive usage."""
+    plain_doc_path = tmp_path / 'plain.rst'
+    git_ref_doc_path = tmp_path / 'git-ref.rst'
+    plain_doc_path.write_text('Title\n=====\n', encoding='utf-8')
+    git_ref_doc_path.write_text(
+        '.. towncrier-draft-entries::\n   :git-ref: main\n',
+        encoding='utf-8',
+    )
+
+    assert scan_draft_directive_usage(
+        (plain_doc_path, tmp_path / 'missing.rst'),
+    ) == DraftDirectiveUsage()
+    assert scan_draft_directive_usage(
+        (plain_doc_path, git_ref_doc_path),
+    ) == DraftDirectiveUsage(directive_found=True)
+
+    sliced_doc_path = tmp_path / 'sliced.rst'
+    sliced_doc_path.write_text(
+        '.. towncrier-draft-entries::\n   :types: feature\n\n'
+        '.. towncrier-draft-entries:: v1.0\n',
+        encoding='utf-8',
+    )
+    assert scan_draft_directive_usage(
+        (sliced_doc_path,),
+    ) == DraftDirectiveUsage(
+        directive_found=True,
+        towncrier_arguments=frozenset(('v1.0',)),
+        reads_fragments=True,
+    )
+
+
+def test_get_render_concurrency() -> None:
+    """Check that the concurrency limit is at least one."""
+    assert get_render_concurrency(0) == 1
+    assert get_render_concurrency(3) == 3
+    assert get_render_concurrency(None) >= 1
+
+
+def test_render_towncrier_drafts(tmp_path: Path) -> None:
+    """Check that every job gets its own invocation and result."""
+    render_jobs = [
+        DraftRenderJob('1.0', str(tmp_path)),
+        DraftRenderJob('|release|', str(tmp_path), 'towncrier.toml'),
+    ]
+
+    rendered_drafts = render_towncrier_drafts(
+        render_jobs, PRINT_ARGV_CMD, max_concurrency=1,
+    )
+
+    assert {
+        render_job: json.loads(render_result.towncrier_output or 'null')
+        for render_job, render_result in rendered_drafts.items()
+    } == {
+        render_jobs[0]: [str(tmp_path), '--version', '1.0'],
+        render_jobs[1]: [
+            str(tmp_path),
+            '--version', r'\ |release|',
+            '--config', 'towncrier.toml',
+        ],
+    }
+
+
+def test_render_towncrier_drafts_failure() -> None:
+    """Check that the failed renders have no output."""
+    render_job = DraftRenderJob('1.0')
+    render_result = render_towncrier_drafts(
+        [render_job],
+        (sys.executable, '-I', '-c', 'raise SystemExit(1)'),
+    )[render_job]
+
+    assert render_result.towncrier_output is None
+    assert not render_result.timed_out
+
+
+def test_render_towncrier_drafts_timeout() -> None:
+    """Check that the hung renders are cancelled."""
+    render_job = DraftRenderJob('1.0')
+    render_result = render_towncrier_drafts(
+        [render_job], SLEEP_CMD, timeout=0.2,
+    )[render_job]
+
+    assert render_result.towncrier_output is None
+    assert render_result.timed_out
+    assert 0.2 <= render_result.elapsed_time < 30
+
+
+@pytest.mark.parametrize(
+    ('text', 'chunk_size'),
+    (
+        ('', 4),
+        (' \n\t ', 2),
+        ('Added', 64),
+        ('\n\n  Added\n-----\n\n', 64),
+        ('\n\n  Added\n-----\n\n', 1),
+        ('\n\n\n\nAdded \n\n\n\n  Fixed\n\n\n\n', 3),
+    ),
+)
+def test_read_stripped_text(text: str, chunk_size: int) -> None:
+    """Check that any chunking strips the text like ``str.strip()``."""
+    assert read_stripped_text(
+        io.StringIO(text), chunk_size=chunk_size,
+    ) == text.strip()
+
+
+def test_run_towncrier_process_output() -> None:
+    """Check that the spooled output is decoded like a text mode pipe."""
+    towncrier_proc = run_towncrier_process((
+        sys.executable, '-I', '-c',
+        'import sys; '
+        "sys.stdout.buffer.write(b'\\r\\n Added\\r\\n-----\\r\\n' * 50000); "
+        "sys.stderr.write('warning')",
+    ))
+
+    assert towncrier_proc.returncode == 0
+    assert towncrier_proc.stdout == (
+        '\n Added\n-----\n' * 50000
+    ).strip()
+    assert towncrier_proc.stderr == 'warning'
+
+
+@pytest.mark.skipif(
+    sys.platform == 'win32',
+    reason='Process groups are POSIX-specific',
+)
+def test_run_towncrier_process_kills_tree(tmp_path: Path) -> None:
+    """Check that the children of a hung process are killed too."""
+    child_pid_path = tmp_path / 'child.pid'
+    spawn_child_cmd = (
+        sys.executable, '-I', '-c',
+        'import pathlib, subprocess, sys, time; '
+        f'child = subprocess.Popen({list(SLEEP_CMD)!r}); '
+        f'pathlib.Path({str(child_pid_path)!r}).write_text(str(child.pid)); '
+        'time.sleep(60)',
+    )
+
+    with pytest.raises(TowncrierRenderTimeoutError, match='killed after'):
+        run_towncrier_process(spawn_child_cmd, timeout=1)
+
+    child_pid = int(child_pid_path.read_text())
+    for _attempt in range(50):
+        try:
+            os.kill(child_pid, 0)
+        except ProcessLookupError:
+            break
+        time.sleep(0.1)
+    else:
+        pytest.fail('The child process survived the timeout')
@@ -0,0 +1,108 @@
+"""Single-flight cache tests."""
+
+
+import threading
+import time
+from typing import List
+
+import pytest
+
+from sphinxcontrib.towncrier._single_flight import (
+    SingleFlightCacheInfo, iter_single_flight_caches, single_flight_cache,
+)
+
+
+def test_concurrent_callers_share_one_computation() -> None:
+    """Check that the callers missing the same key wait for the first."""
+    computation_calls: List[int] = []
+    computation_may_finish = threading.Event()
+
+    @single_flight_cache()
+    def _compute(cache_arg: int) -> int:
+        computation_calls.append(cache_arg)
+        computation_may_finish.wait(timeout=10)
+        return cache_arg * 2
+
+    results: List[int] = []
+    caller_threads = [
+        threading.Thread(target=lambda: results.append(_compute(21)))
+        for _thread_num in range(8)
+    ]
+    for caller_thread in caller_threads:
+        caller_thread.start()
+    for _attempt in range(500):
+        if _compute.cache_info().waits == 7:
+            break
+        time.sleep(0.01)
+    computation_may_finish.set()
+    for caller_thread in caller_threads:
+        caller_thread.join()
+
+    assert computation_calls == [21]
+    assert results == [42] * 8
+    assert _compute.cache_info() == SingleFlightCacheInfo(
+        hits=0, misses=1, waits=7, maxsize=128, currsize=1,
+    )
+    assert _compute(21) == 42
+    assert _compute.cache_info().hits == 1
+    assert _compute in list(iter_single_flight_caches())
+
+
+def test_errors_are_not_cached() -> None:
+    """Check that a failed computation is retried by the next caller."""
+    computation_calls: List[int] = []
+
+    @single_flight_cache(maxsize=1)
+    def _fail(cache_arg: int) -> int:
+        computation_calls.append(cache_arg)
+        raise LookupError(cache_arg)
+
+    for _attempt in range(2):
+        with pytest.raises(LookupError):
+            _fail(1)
+
+    assert computation_calls == [1, 1]
+    assert _fail.cache_info().currsize == 0
+
+
+def test_lru_eviction_and_keys() -> None:
+    """Check that the keys distinguish types and keyword arguments."""
+    computation_calls: List[object] = []
+
+    @single_flight_cache(maxsize=2, typed=True)
+    def _identity(cache_arg: object, other_arg: object = None) -> object:
+        computation_calls.append(cache_arg)
+        return cache_arg
+
+    _identity(1)
+    _identity(1.0)
+    _identity(1)
+    _identity(1, other_arg=None)
+    assert computation_calls == [1, 1.0, 1]
+
+    _identity.cache_clear()
+    assert _identity.cache_info() == SingleFlightCacheInfo(
+        hits=0, misses=0, waits=0, maxsize=2, currsize=0,
+    )
+    assert _identity.__wrapped__(3) == 3
+
+
+def test_results_capped_by_size() -> None:
+    """Check that the total size of the results is kept under a limit."""
+    @single_flight_cache(maxbytes=3000)
+    def _make_text(text_length: int) -> str:
+        return 'x' * text_length
+
+    _make_text(1000)
+    _make_text(1500)
+    assert _make_text.cache_info().currsize == 2
+
+    _make_text(1000)  # mark as recently used
+    _make_text(1200)  # evicts the 1500 bytes long text
+    _make_text(5000)  # too big for caching
+    cache_info = _make_text.cache_info()
+    assert cache_info.currsize == 2
+    assert cache_info.currbytes <= 3000
+
+    _make_text(1000)
+    assert _make_text.cache_info().hits == 2
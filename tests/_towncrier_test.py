@@ -1,15 +1,20 @@
 """Towncrier config reader tests."""
 
 
+import subprocess  # noqa: S404
+import sys
 from importlib.metadata import version as _get_installed_project_version
 from pathlib import Path
-from typing import Union
+from typing import Tuple, Union
 
 import pytest
 
 from towncrier._settings.load import Config  # noqa: WPS436
 
-from sphinxcontrib.towncrier._towncrier import get_towncrier_config
+from sphinxcontrib.towncrier._towncrier import (
+    DraftEntries, DraftSlice, collect_fragment_contents, get_towncrier_config,
+    parse_fragment_file_names, parse_towncrier_config, render_towncrier_draft,
+)
 
 
 _TOWNCRIER_VERSION = _get_installed_project_version('towncrier')
@@ -71,3 +76,148 @@ def test_towncrier_config_file_missing(
 
     with pytest.raises(LookupError, match=expected_error_msg):
         get_towncrier_config(tmp_path, config_file_name)
+
+
+def test_render_towncrier_draft_matches_cli(
+        monkeypatch: pytest.MonkeyPatch,
+        tmp_path: Path,
+) -> None:
+    """Test that in-process rendering matches ``towncrier build``."""
+    monkeypatch.setenv('SOURCE_DATE_EPOCH', '0')
+    config_source = (
+        '[tool.towncrier]\nname = "sentinel"\ndirectory = "fragments"\n'
+    )
+    (tmp_path / 'pyproject.toml').write_text(config_source, encoding='utf-8')
+    fragment_texts = {
+        '1.feature.rst': 'Feature sentinel',
+        '2.bugfix.rst': 'Bugfix sentinel',
+        '+orphan.misc.rst': 'Orphan sentinel',
+    }
+    (tmp_path / 'fragments').mkdir()
+    for fragment_name, fragment_text in fragment_texts.items():
+        (tmp_path / 'fragments' / fragment_name).write_text(
+            fragment_text, encoding='utf-8',
+        )
+
+    towncrier_config, template_path = parse_towncrier_config(
+        tmp_path, config_source,
+    )
+    rendered_draft = render_towncrier_draft(
+        towncrier_config,
+        collect_fragment_contents(towncrier_config, {'': fragment_texts}),
+        'v1.0',
+    )
+    cli_draft = subprocess.check_output(  # noqa: S603
+        (
+            sys.executable, '-m', 'towncrier', 'build',
+            '--draft', '--version', 'v1.0',
+        ),
+        cwd=tmp_path,
+        stderr=subprocess.DEVNULL,
+        text=True,
+    )
+
+    assert template_path is None
+    assert rendered_draft.strip() == cli_draft.strip()
+
+
+def test_parse_towncrier_config_detached_template(tmp_path: Path) -> None:
+    """Test that a file template doesn't need to exist on disk."""
+    towncrier_config, template_path = parse_towncrier_config(
+        tmp_path,
+        '[tool.towncrier]\ntemplate = "changelog.d/template.j2"\n',
+    )
+    assert template_path == 'changelog.d/template.j2'
+    assert towncrier_config.template == str(
+        tmp_path / 'changelog.d' / 'template.j2',
+    )
+
+
+def test_parse_fragment_file_names(tmp_path: Path) -> None:
+    """Test that change note file names are identified like towncrier."""
+    towncrier_config, _template_path = parse_towncrier_config(
+        tmp_path, '[tool.towncrier]\n',
+    )
+
+    assert parse_fragment_file_names(
+        towncrier_config,
+        (
+            '+second.misc.rst',
+            '+first.misc.rst',
+            '012.feature.rst',
+            '3.bugfix.2.rst',
+            'README.rst',
+            'not-a-fragment.txt',
+        ),
+    ) == {
+        ('', 'misc', 0): '+first.misc.rst',
+        ('', 'misc', 1): '+second.misc.rst',
+        ('12', 'feature', 0): '012.feature.rst',
+        ('3', 'bugfix', 2): '3.bugfix.2.rst',
+    }
+
+
+@pytest.mark.parametrize(
+    ('config_source', 'file_names', 'expected_error_msg'),
+    (
+        pytest.param(
+            '[tool.towncrier]\n',
+            ('1.feature.rst', '01.feature.rst'),
+            '^Multiple files for 1.feature: ',
+            id='duplicate-change-note',
+        ),
+        pytest.param(
+            '[tool.towncrier]\nignore = ["notes.txt"]\n',
+            ('1.feature.rst', 'not-a-fragment.txt'),
+            '^Invalid news fragment name: not-a-fragment.txt',
+            id='strict-invalid-name',
+        ),
+        pytest.param(
+            '[tool.towncrier]\nissue_pattern = "\\\\d+"\n',
+            ('+orphan.misc.rst', 'gh-1.feature.rst'),
+            "^Issue name 'gh-1' does not match the configured pattern",
+            id='issue-pattern-mismatch',
+        ),
+    ),
+)
+def test_parse_fragment_file_names_rejected(
+        tmp_path: Path,
+        config_source: str,
+        file_names: Tuple[str, ...],
+        expected_error_msg: str,
+) -> None:
+    """Test that the names towncrier fails on are reported."""
+    towncrier_config, _template_path = parse_towncrier_config(
+        tmp_path, config_source,
+    )
+    if 'issue_pattern' in config_source and not getattr(
+            towncrier_config, 'issue_pattern', '',
+    ):
+        pytest.skip('This towncrier version has no issue pattern setting')
+
+    with pytest.raises(LookupError, match=expected_error_msg):
+        parse_fragment_file_names(towncrier_config, file_names)
+
+
+def test_draft_slice() -> None:
+    """Test that a draft slice keeps the section and type order."""
+    draft_entries: DraftEntries = {
+        'Library': {
+            'feature': [('Added a thing.', ['#1'])],
+            'bugfix': [('Fixed a thing.', [])],
+        },
+        'Tools': {'bugfix': [('Fixed a tool.', ['#2'])]},
+    }
+    draft_slice = DraftSlice(types=frozenset(('bugfix',)))
+
+    assert draft_slice.apply(draft_entries) == {
+        'Library': {'bugfix': [('Fixed a thing.', [])]},
+        'Tools': {'bugfix': [('Fixed a tool.', ['#2'])]},
+    }
+    assert DraftSlice(sections=frozenset(('Tools',))).apply(
+        draft_entries,
+    ) == {'Tools': {'bugfix': [('Fixed a tool.', ['#2'])]}}
+    assert draft_slice.select_paths({
+        Path('1.feature.rst'): ('Library', 'feature'),
+        Path('2.bugfix.rst'): ('Tools', 'bugfix'),
+    }) == [Path('2.bugfix.rst')]
@@ -0,0 +1,31 @@
+"""Work counter tests."""
+
+
+from sphinxcontrib.towncrier._work_counters import (
+    FRAGMENT_SCANS_COUNTER, TOWNCRIER_RENDERS_COUNTER, combine_work_counts,
+    count_work, get_work_counts, reset_work_counts,
+)
+
+
+def test_work_counted_until_reset() -> None:
+    """Check that each piece of work is counted under its kind."""
+    reset_work_counts()
+    count_work(TOWNCRIER_RENDERS_COUNTER)
+    count_work(TOWNCRIER_RENDERS_COUNTER)
+    count_work(FRAGMENT_SCANS_COUNTER)
+
+    assert get_work_counts() == {
+        TOWNCRIER_RENDERS_COUNTER: 2,
+        FRAGMENT_SCANS_COUNTER: 1,
+    }
+    reset_work_counts()
+    assert not get_work_counts()
+
+
+def test_combine_work_counts() -> None:
+    """Check that the counts of the processes add up."""
+    assert combine_work_counts((
+        {TOWNCRIER_RENDERS_COUNTER: 2},
+        {TOWNCRIER_RENDERS_COUNTER: 1, FRAGMENT_SCANS_COUNTER: 1},
+        {},
+    )) == {TOWNCRIER_RENDERS_COUNTER: 3, FRAGMENT_SCANS_COUNTER: 1}
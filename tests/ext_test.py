@@ -1,11 +1,35 @@
 """The Sphinx extension interface module tests."""
 
+import json
+import os
+import pstats
+import subprocess  # noqa: S404
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
 import pytest
 
+from sphinx.application import Sphinx
 from sphinx.config import Config as SphinxConfig
 
-from sphinxcontrib.towncrier.ext import _get_draft_version_fallback
+from sphinxcontrib.towncrier import ext as ext_module
+from sphinxcontrib.towncrier._fragment_discovery import (
+    lookup_towncrier_fragment_categories, lookup_towncrier_fragment_contents,
+)
+from sphinxcontrib.towncrier._work_counters import (
+    FRAGMENT_SCANS_COUNTER, TOWNCRIER_RENDERS_COUNTER,
+)
+from sphinxcontrib.towncrier.ext import (
+    TowncrierDraftEntriesEnvironmentCollector, _get_draft_version_fallback,
+    _get_scm_version, _lookup_scm_version, get_towncrier_work_counts,
+)
+
 
+UTF8_ENCODING = 'utf-8'
+SCALING_DOC_COUNT = 48
+SCALING_DRAFT_VERSIONS = ('1.0', '1.1', '2.0')
 
 release_sentinel = object()
 version_sentinel = object()
@@ -56,3 +80,945 @@ def test__get_draft_version_fallback_invalid_strategy(  # noqa: WPS116, WPS118
             autoversion_mode,
             sphinx_config,
         )
+
+
+@pytest.fixture
+def towncrier_project_path(tmp_path: Path) -> Path:
+    """Create a project with change notes and docs using the directive."""
+    project_path = tmp_path / 'project'
+    fragments_path = project_path / 'changelog-fragments'
+    docs_path = project_path / 'docs'
+    fragments_path.mkdir(parents=True)
+    docs_path.mkdir()
+
+    (project_path / 'towncrier.toml').write_text(
+        '[tool.towncrier]\n'
+        'name = "sentinel-project"\n'
+        'directory = "changelog-fragments"\n',
+        encoding=UTF8_ENCODING,
+    )
+    for fragment_name, fragment_text in (
+            ('1.feature.rst', 'Added *a* feature.'),
+            ('2.bugfix.rst', 'Fixed a bug\nspanning two lines.'),
+            ('+orphan.misc.rst', 'Misc change.\n\n- nested\n- list'),
+    ):
+        (fragments_path / fragment_name).write_text(
+            fragment_text, encoding=UTF8_ENCODING,
+        )
+
+    (docs_path / 'conf.py').write_text(
+        "extensions = ['sphinxcontrib.towncrier.ext']\n"
+        f'towncrier_draft_working_directory = {str(project_path)!r}\n',
+        encoding=UTF8_ENCODING,
+    )
+    (docs_path / 'index.rst').write_text(
+        'Changelog\n=========\n\n.. towncrier-draft-entries:: |release|\n',
+        encoding=UTF8_ENCODING,
+    )
+    return project_path
+
+
+def _build_pseudoxml(
+        project_path: Path,
+        out_dir_name: str,
+        *,
+        freshenv: bool = True,
+        **conf_overrides: object,
+) -> str:
+    """Build the project docs and return the index doctree dump."""
+    out_path = project_path / out_dir_name
+    sphinx_app = Sphinx(
+        srcdir=project_path / 'docs',
+        confdir=project_path / 'docs',
+        outdir=out_path,
+        doctreedir=out_path / '.doctrees',
+        buildername='pseudoxml',
+        confoverrides={'release': '1.0', **conf_overrides},
+        status=None,
+        warning=None,
+        freshenv=freshenv,
+    )
+    sphinx_app.build()
+    return (out_path / 'index.pseudoxml').read_text(encoding=UTF8_ENCODING)
+
+
+@pytest.mark.parametrize(
+    'conf_overrides',
+    (
+        {},
+        {'towncrier_draft_output_mode': 'structured'},
+        {'towncrier_draft_incremental': True},
+    ),
+    ids=('auto', 'structured', 'incremental'),
+)
+def test_structured_draft_matches_towncrier_render(
+        conf_overrides: Dict[str, Any],
+        monkeypatch: pytest.MonkeyPatch,
+        towncrier_project_path: Path,
+) -> None:
+    """Check that building nodes directly matches a towncrier render."""
+    monkeypatch.setenv('SOURCE_DATE_EPOCH', '0')
+
+    towncrier_render = _build_pseudoxml(
+        towncrier_project_path,
+        'rst',
+        towncrier_draft_output_mode='rst',
+    )
+    structured_render = _build_pseudoxml(
+        towncrier_project_path,
+        'structured',
+        **conf_overrides,
+    )
+
+    assert 'Added' in towncrier_render
+    assert structured_render == towncrier_render
+
+
+def test_draft_slices_share_one_render(
+        monkeypatch: pytest.MonkeyPatch,
+        towncrier_project_path: Path,
+) -> None:
+    """Check that the sliced drafts only track their own change notes."""
+    monkeypatch.setenv('SOURCE_DATE_EPOCH', '0')
+    docs_path = towncrier_project_path / 'docs'
+    (docs_path / 'index.rst').write_text(
+        'Changelog\n=========\n\n'
+        '.. towncrier-draft-entries:: |release|\n'
+        '   :types: feature, misc\n',
+        encoding=UTF8_ENCODING,
+    )
+    (docs_path / 'bugfixes.rst').write_text(
+        ':orphan:\n\n'
+        '.. towncrier-draft-entries:: |release|\n'
+        '   :types: bugfix\n',
+        encoding=UTF8_ENCODING,
+    )
+
+    sliced_render = _build_pseudoxml(towncrier_project_path, 'sliced')
+    assert 'Added' in sliced_render
+    assert 'Misc change.' in sliced_render
+    assert 'Fixed a bug' not in sliced_render
+
+    out_path = towncrier_project_path / 'sliced'
+    sphinx_app = Sphinx(
+        srcdir=docs_path,
+        confdir=docs_path,
+        outdir=out_path,
+        doctreedir=out_path / '.doctrees',
+        buildername='pseudoxml',
+        confoverrides={'release': '1.0'},
+        status=None,
+        warning=None,
+    )
+    towncrier_env: Any = sphinx_app.env
+    assert set(towncrier_env.towncrier_fragment_slices) == {
+        'bugfixes', 'index',
+    }
+
+    fragments_path = towncrier_project_path / 'changelog-fragments'
+    (fragments_path / '3.bugfix.rst').write_text(
+        'Fixed another bug.', encoding=UTF8_ENCODING,
+    )
+    lookup_towncrier_fragment_categories.cache_clear()
+    outdated_docs = (
+        # pylint: disable-next=protected-access
+        TowncrierDraftEntriesEnvironmentCollector._get_outdated_slice_docs(
+            sphinx_app.env,
+        )
+    )
+    assert outdated_docs == {'bugfixes'}
+
+
+def test_shared_draft_cache_reused_across_builds(
+        monkeypatch: pytest.MonkeyPatch,
+        tmp_path: Path,
+        towncrier_project_path: Path,
+) -> None:
+    """Check that builds with identical inputs only run towncrier once."""
+    towncrier_runs: List[Tuple[Any, ...]] = []
+    run_towncrier_draft = ext_module._run_towncrier_draft
+
+    def _count_towncrier_runs(*args: Any, **kwargs: Any) -> str:
+        towncrier_runs.append(args)
+        return run_towncrier_draft(*args, **kwargs)
+
+    monkeypatch.setattr(
+        ext_module, '_run_towncrier_draft', _count_towncrier_runs,
+    )
+    shared_cache_conf: Dict[str, Any] = {
+        'towncrier_draft_output_mode': 'rst',
+        'towncrier_draft_shared_cache': True,
+        'towncrier_draft_shared_cache_dir': str(tmp_path / 'shared-cache'),
+    }
+
+    first_render = _build_pseudoxml(
+        towncrier_project_path, 'first', **shared_cache_conf,
+    )
+    ext_module._get_changelog_draft_entries.cache_clear()
+    second_render = _build_pseudoxml(
+        towncrier_project_path, 'second', **shared_cache_conf,
+    )
+
+    assert len(towncrier_runs) == 1
+    assert 'Added' in first_render
+    assert second_render == first_render
+
+    # A reproducible build gets a draft dated like it, not today's one
+    monkeypatch.setenv('SOURCE_DATE_EPOCH', '0')
+    ext_module._get_changelog_draft_entries.cache_clear()
+    reproducible_render = _build_pseudoxml(
+        towncrier_project_path, 'reproducible', **shared_cache_conf,
+    )
+
+    assert len(towncrier_runs) == 2
+    assert '1970-01-01' in reproducible_render
+
+
+@pytest.mark.parametrize(
+    ('autoversion_mode', 'expected_version'),
+    (
+        ('scm', '1.0.1'),
+        ('scm-draft', '1.0.1 [UNRELEASED DRAFT]'),
+    ),
+)
+def test__get_draft_version_fallback_scm(  # noqa: WPS116, WPS118
+        autoversion_mode: str,
+        expected_version: str,
+        tmp_path: Path,
+) -> None:
+    """Check that the SCM strategies derive the version from Git tags."""
+    _lookup_scm_version.cache_clear()
+    for git_cmd in (
+            ('init', '--quiet'),
+            ('commit', '--quiet', '--allow-empty', '--message=Release'),
+            ('tag', 'v1.0.0'),
+            ('commit', '--quiet', '--allow-empty', '--message=Change'),
+    ):
+        subprocess.check_call(  # noqa: S603, S607
+            (
+                'git', '-c', 'user.name=Test',
+                '-c', 'user.email=test@example.com', *git_cmd,
+            ),
+            cwd=tmp_path,
+        )
+    sphinx_config = SphinxConfig(
+        {'towncrier_draft_working_directory': str(tmp_path)},
+    )
+    sphinx_config.add(
+        'towncrier_draft_working_directory', None, '', (),
+    )
+    sphinx_config.init_values()
+
+    computed_version = _get_draft_version_fallback.__wrapped__(
+        autoversion_mode,
+        sphinx_config,
+    )
+    assert computed_version == expected_version
+
+    # A long-running process notices the new tag
+    subprocess.check_call(  # noqa: S603, S607
+        ('git', 'tag', 'v1.1.0'), cwd=tmp_path,
+    )
+    assert _get_scm_version(str(tmp_path)) == '1.1.0'
+
+
+def test_drafts_prerendered_before_reading(
+        monkeypatch: pytest.MonkeyPatch,
+        towncrier_project_path: Path,
+) -> None:
+    """Check that the directives use the drafts rendered in advance."""
+    def _fail_towncrier_run(*args: object, **kwargs: object) -> str:
+        raise AssertionError('towncrier was invoked synchronously')
+
+    monkeypatch.setattr(
+        ext_module, 'run_towncrier_process', _fail_towncrier_run,
+    )
+    ext_module._get_changelog_draft_entries.cache_clear()
+
+    rst_render = _build_pseudoxml(
+        towncrier_project_path,
+        'prerendered',
+        towncrier_draft_output_mode='rst',
+    )
+
+    assert 'Added' in rst_render
+
+
+@pytest.mark.parametrize(
+    ('fallback', 'expected_text'),
+    (
+        ('placeholder', ext_module.RENDER_TIMEOUT_PLACEHOLDER_TEXT),
+        ('cached', 'Added'),
+    ),
+)
+def test_render_timeout_fallback(
+        fallback: str,
+        expected_text: str,
+        monkeypatch: pytest.MonkeyPatch,
+        towncrier_project_path: Path,
+) -> None:
+    """Check that a hung towncrier gets replaced by the fallback."""
+    out_dir_name = f'timeout-{fallback!s}'
+    _build_pseudoxml(
+        towncrier_project_path,
+        out_dir_name,
+        towncrier_draft_output_mode='rst',
+        towncrier_draft_render_timeout_fallback=fallback,
+    )
+    index_path = towncrier_project_path / 'docs' / 'index.rst'
+    index_path.write_text(
+        index_path.read_text(encoding=UTF8_ENCODING) + '\n',
+        encoding=UTF8_ENCODING,
+    )
+
+    monkeypatch.setattr(
+        ext_module,
+        'TOWNCRIER_DRAFT_CMD',
+        (sys.executable, '-I', '-c', 'import time; time.sleep(60)'),
+    )
+    ext_module._get_changelog_draft_entries.cache_clear()
+
+    rst_render = _build_pseudoxml(
+        towncrier_project_path,
+        out_dir_name,
+        freshenv=False,
+        towncrier_draft_output_mode='rst',
+        towncrier_draft_render_timeout=0.5,
+        towncrier_draft_render_timeout_fallback=fallback,
+    )
+
+    assert expected_text in rst_render
+    assert all(
+        render_result.timed_out
+        for render_result in ext_module._towncrier_draft_renders.values()
+    )
+
+
+def test_unused_extension_looks_nothing_up(
+        monkeypatch: pytest.MonkeyPatch,
+        towncrier_project_path: Path,
+) -> None:
+    """Check that docs not using the directive cost no lookups."""
+    lookup_calls: Dict[str, int] = {}
+
+    def _count_lookup(lookup_name: str) -> None:
+        def _lookup(*args: object, **kwargs: object) -> None:
+            lookup_calls[lookup_name] = lookup_calls.get(lookup_name, 0) + 1
+        monkeypatch.setattr(ext_module, lookup_name, _lookup)
+
+    for lookup_name in (
+            'get_scm_version',
+            'lookup_towncrier_fragment_categories',
+            'lookup_towncrier_fragment_contents',
+            'lookup_towncrier_fragments',
+            'resolve_git_commit',
+            'run_towncrier_process',
+    ):
+        _count_lookup(lookup_name)
+    ext_module._lookup_scm_version.cache_clear()
+
+    read_sources: List[str] = []
+    read_draft_directives = ext_module.read_draft_directives
+
+    def _record_read(source_path: str) -> object:
+        read_sources.append(Path(source_path).stem)
+        return read_draft_directives(source_path)
+
+    monkeypatch.setattr(ext_module, 'read_draft_directives', _record_read)
+
+    docs_path = towncrier_project_path / 'docs'
+    index_path = docs_path / 'index.rst'
+    index_path.write_text(
+        'Docs\n====\n\n.. toctree::\n\n   other\n', encoding=UTF8_ENCODING,
+    )
+    (docs_path / 'other.rst').write_text(
+        'Other\n=====\n', encoding=UTF8_ENCODING,
+    )
+    _build_pseudoxml(towncrier_project_path, 'unused')
+    assert sorted(read_sources) == ['index', 'other']
+
+    read_sources.clear()
+    index_path.write_text(
+        index_path.read_text(encoding=UTF8_ENCODING) + '\nChanged.\n',
+        encoding=UTF8_ENCODING,
+    )
+    (towncrier_project_path / 'changelog-fragments' / '3.misc.rst').touch()
+    _build_pseudoxml(towncrier_project_path, 'unused', freshenv=False)
+
+    assert not lookup_calls
+    assert read_sources == ['index']
+
+
+def test_watched_inputs_written_at_build_end(
+        towncrier_project_path: Path,
+) -> None:
+    """Check that the draft input paths are dumped for file watchers."""
+    _build_pseudoxml(towncrier_project_path, 'watched')
+
+    watched_inputs = json.loads(
+        (
+            towncrier_project_path / 'watched' / '.doctrees'
+            / ext_module.WATCHED_INPUTS_FILE_NAME
+        ).read_text(encoding=UTF8_ENCODING),
+    )
+
+    assert watched_inputs['projects'] == [
+        {
+            'config_file': str(towncrier_project_path / 'towncrier.toml'),
+            'fragment_dirs': [
+                str(towncrier_project_path / 'changelog-fragments'),
+            ],
+            'project_dir': str(towncrier_project_path),
+            'template_file': watched_inputs['projects'][0]['template_file'],
+        },
+    ]
+    assert watched_inputs['projects'][0]['template_file'].endswith(
+        'default.rst',
+    )
+
+
+def test_fragment_edit_rebuilds_without_per_fragment_deps(
+        towncrier_project_path: Path,
+) -> None:
+    """Check that change note edits are caught by the collector alone."""
+    docs_path = towncrier_project_path / 'docs'
+    out_path = towncrier_project_path / 'stamps'
+    lookup_towncrier_fragment_contents.cache_clear()
+    assert 'Added' in _build_pseudoxml(
+        towncrier_project_path, 'stamps',
+        towncrier_draft_output_mode='structured',
+    )
+
+    fragment_path = (
+        towncrier_project_path / 'changelog-fragments' / '1.feature.rst'
+    )
+    fragment_path.write_text('Reworded *a* feature.', encoding=UTF8_ENCODING)
+    lookup_towncrier_fragment_contents.cache_clear()
+    assert 'Reworded' in _build_pseudoxml(
+        towncrier_project_path, 'stamps',
+        freshenv=False,
+        towncrier_draft_output_mode='structured',
+    )
+
+    sphinx_app = Sphinx(
+        srcdir=docs_path,
+        confdir=docs_path,
+        outdir=out_path,
+        doctreedir=out_path / '.doctrees',
+        buildername='pseudoxml',
+        confoverrides={
+            'release': '1.0', 'towncrier_draft_output_mode': 'structured',
+        },
+        status=None,
+        warning=None,
+    )
+    towncrier_env: Any = sphinx_app.env
+    assert not towncrier_env.dependencies['index']
+    assert len(towncrier_env.towncrier_fragment_stamps) == 3
+
+
+def test_parsed_draft_reused_from_doctree_cache(
+        monkeypatch: pytest.MonkeyPatch,
+        towncrier_project_path: Path,
+) -> None:
+    """Check that an unchanged draft is unpickled instead of parsed."""
+    towncrier_config_path = towncrier_project_path / 'towncrier.toml'
+    towncrier_config_path.write_text(
+        towncrier_config_path.read_text(encoding=UTF8_ENCODING)
+        + 'issue_format = "`#{issue} <https://example.com/{issue}>`_"\n',
+        encoding=UTF8_ENCODING,
+    )
+    doctree_cache_conf: Dict[str, Any] = {
+        'towncrier_draft_output_mode': 'rst',
+        'towncrier_draft_doctree_cache': True,
+    }
+    first_render = _build_pseudoxml(
+        towncrier_project_path, 'doctree-cache', **doctree_cache_conf,
+    )
+
+    def _fail_parsing(*args: object, **kwargs: object) -> None:
+        raise AssertionError('the draft was parsed again')
+
+    monkeypatch.setattr(ext_module, 'nested_parse_with_titles', _fail_parsing)
+    second_render = _build_pseudoxml(
+        towncrier_project_path, 'doctree-cache', **doctree_cache_conf,
+    )
+
+    assert second_render == first_render
+    assert 'ids="' in second_render
+    assert 'refuri="https://example.com/1"' in second_render
+
+
+def test_memory_profile_reported_by_phase(
+        monkeypatch: pytest.MonkeyPatch,
+        towncrier_project_path: Path,
+) -> None:
+    """Check that the opt-in memory profile covers the directive phases."""
+    profile_lines: List[str] = []
+    monkeypatch.setattr(ext_module.logger, 'info', profile_lines.append)
+    ext_module._get_changelog_draft_entries.cache_clear()
+
+    _build_pseudoxml(
+        towncrier_project_path,
+        'memory-profile',
+        towncrier_draft_output_mode='rst',
+        towncrier_draft_memory_profile=True,
+    )
+
+    phase_lines = [
+        profile_line for profile_line in profile_lines
+        if ' memory: ' in profile_line
+    ]
+    assert [
+        phase_line.split()[1] for phase_line in phase_lines
+    ] == ['discovery', 'render', 'nodes']
+    assert all('1 calls' in phase_line for phase_line in phase_lines)
+    assert any(
+        'memory in process' in profile_line for profile_line in profile_lines
+    )
+
+
+def test_directive_profiles_written_per_document(
+        towncrier_project_path: Path,
+) -> None:
+    """Check that each document using the directive gets a profile."""
+    _build_pseudoxml(
+        towncrier_project_path,
+        'call-profile',
+        towncrier_draft_output_mode='rst',
+        towncrier_draft_profile_dir='../call-profiles',
+    )
+
+    profile_dir = towncrier_project_path / 'call-profiles'
+    assert (profile_dir / f'index.{os.getpid():d}.pstats').is_file()
+    assert (profile_dir / f'collector.{os.getpid():d}.pstats').is_file()
+    merged_stats = pstats.Stats(str(profile_dir / 'merged.pstats'))
+    assert any(
+        function_name == '_generate_nodes'
+        for _file_name, _line, function_name
+        in merged_stats.stats  # type: ignore[attr-defined]
+    )
+
+
+def test_rebuild_causes_reported(
+        monkeypatch: pytest.MonkeyPatch,
+        towncrier_project_path: Path,
+) -> None:
+    """Check that the re-read documents come with their reasons."""
+    diagnostics_conf: Dict[str, Any] = {
+        'towncrier_draft_output_mode': 'structured',
+        'towncrier_draft_rebuild_diagnostics': True,
+    }
+    lookup_towncrier_fragment_contents.cache_clear()
+    _build_pseudoxml(
+        towncrier_project_path, 'rebuild-causes', **diagnostics_conf,
+    )
+
+    fragments_path = towncrier_project_path / 'changelog-fragments'
+    (fragments_path / '3.bugfix.rst').write_text(
+        'Fixed another bug.', encoding=UTF8_ENCODING,
+    )
+    touched_path = fragments_path / '2.bugfix.rst'
+    touched_stat = touched_path.stat()
+    os.utime(
+        touched_path,
+        ns=(touched_stat.st_atime_ns, touched_stat.st_mtime_ns + 10**9),
+    )
+    lookup_towncrier_fragment_contents.cache_clear()
+    log_lines: List[str] = []
+    monkeypatch.setattr(ext_module.logger, 'info', log_lines.append)
+    _build_pseudoxml(
+        towncrier_project_path,
+        'rebuild-causes',
+        freshenv=False,
+        **diagnostics_conf,
+    )
+
+    causes_path = (
+        towncrier_project_path / 'rebuild-causes' / '.doctrees'
+        / 'towncrier-rebuild-causes.json'
+    )
+    rebuild_causes = json.loads(causes_path.read_text(encoding=UTF8_ENCODING))
+    index_causes = rebuild_causes['documents']['index']
+    assert index_causes['causes'] == [
+        {
+            'kind': 'fragment-added',
+            'inputs': ['changelog-fragments/3.bugfix.rst'],
+        },
+        {
+            'kind': 'fragment-touched',
+            'inputs': ['changelog-fragments/2.bugfix.rst'],
+        },
+    ]
+    assert index_causes['read_time'] >= 0
+    assert any(
+        "'index' re-read in " in log_line and 'fragment-touched' in log_line
+        for log_line in log_lines
+    )
+
+
+@pytest.mark.parametrize(
+    ('changelog_text', 'directive_options'),
+    (
+        (
+            '=========\nChangelog\n=========\n\nIntro.\n\n'
+            'v2.0 (2024-02-02)\n=================\n\n'
+            'Features\n--------\n\n'
+            '- New thing (`#2 <https://example.com/2>`_)\n\n'
+            'v1.0 (2024-01-01)\n=================\n\n- Old thing\n',
+            '',
+        ),
+        (
+            'Changelog\n=========\n\n'
+            'v2.0 (2024-02-02)\n=================\n\n- New thing\n\n'
+            'v1.0 (2024-01-01)\n=================\n\n- Old thing\n',
+            '',
+        ),
+        (
+            'Changelog\n=========\n\n'
+            '.. towncrier release notes start\n\n'
+            'v2.0 (2024-02-02)\n-----------------\n\n'
+            'Features\n^^^^^^^^\n\n- New thing\n',
+            '   :start-after: towncrier release notes start\n',
+        ),
+    ),
+    ids=('overlined-document-title', 'same-style-title', 'start-after'),
+)
+def test_released_entries_nested_like_include(
+        changelog_text: str,
+        directive_options: str,
+        towncrier_project_path: Path,
+) -> None:
+    """Check that the releases end up where ``include`` puts them."""
+    (towncrier_project_path / 'CHANGES.rst').write_text(
+        changelog_text, encoding=UTF8_ENCODING,
+    )
+    index_path = towncrier_project_path / 'docs' / 'index.rst'
+    index_path.write_text(
+        f'.. include:: ../CHANGES.rst\n{directive_options!s}',
+        encoding=UTF8_ENCODING,
+    )
+    include_render = _build_pseudoxml(towncrier_project_path, 'include')
+
+    index_path.write_text(
+        '.. towncrier-released-entries:: ../CHANGES.rst\n'
+        f'{directive_options!s}',
+        encoding=UTF8_ENCODING,
+    )
+    released_render = _build_pseudoxml(towncrier_project_path, 'released')
+
+    assert released_render == include_render
+
+
+def test_released_entries_parsed_once_per_release(
+        monkeypatch: pytest.MonkeyPatch,
+        towncrier_project_path: Path,
+) -> None:
+    """Check that the released history is reused release by release."""
+    (towncrier_project_path / 'CHANGES.rst').write_text(
+        'Changelog\n=========\n\n'
+        '.. towncrier release notes start\n\n'
+        'v2.0 (2024-02-02)\n-----------------\n\n'
+        'Features\n^^^^^^^^\n\n'
+        '- New thing (`#2 <https://example.com/2>`_)\n\n'
+        'v1.0 (2024-01-01)\n-----------------\n\n'
+        'Features\n^^^^^^^^\n\n'
+        '- Old thing (`#1 <https://example.com/1>`_)\n',
+        encoding=UTF8_ENCODING,
+    )
+    index_path = towncrier_project_path / 'docs' / 'index.rst'
+    index_path.write_text(
+        'History\n=======\n\n'
+        '.. towncrier-released-entries:: ../CHANGES.rst\n',
+        encoding=UTF8_ENCODING,
+    )
+    first_render = _build_pseudoxml(towncrier_project_path, 'released')
+    assert 'Old thing' in first_render
+
+    cache_path = (
+        towncrier_project_path / 'released' / '.doctrees'
+        / 'towncrier-release-doctrees'
+    )
+    assert len(list(cache_path.glob('*/*'))) == 3  # the title and releases
+
+    parsed_sources: List[object] = []
+    nested_parse_with_titles = ext_module.nested_parse_with_titles
+
+    def _record_parsing(*args: Any, **kwargs: Any) -> Any:
+        parsed_sources.append(kwargs['content'])
+        return nested_parse_with_titles(*args, **kwargs)
+
+    monkeypatch.setattr(
+        ext_module, 'nested_parse_with_titles', _record_parsing,
+    )
+    index_path.write_text(
+        index_path.read_text(encoding=UTF8_ENCODING) + '\n',
+        encoding=UTF8_ENCODING,
+    )
+    second_render = _build_pseudoxml(
+        towncrier_project_path, 'released', freshenv=False,
+    )
+
+    assert not parsed_sources
+    assert second_render == first_render
+
+
+def test_draft_sharded_into_sub_pages(
+        monkeypatch: pytest.MonkeyPatch,
+        towncrier_project_path: Path,
+) -> None:
+    """Check that each sub-page only tracks its own change notes."""
+    monkeypatch.setenv('SOURCE_DATE_EPOCH', '0')
+    docs_path = towncrier_project_path / 'docs'
+    (docs_path / 'index.rst').write_text(
+        'Changelog\n=========\n\n'
+        '.. towncrier-draft-entries:: |release|\n'
+        '   :shard-by: types\n'
+        '   :types: feature, bugfix\n',
+        encoding=UTF8_ENCODING,
+    )
+    (docs_path / 'index-draft-removal.rst').write_text(
+        '.. This page is generated by sphinxcontrib-towncrier, do not edit.\n',
+        encoding=UTF8_ENCODING,
+    )
+    lookup_towncrier_fragment_contents.cache_clear()
+    index_render = _build_pseudoxml(towncrier_project_path, 'sharded')
+
+    assert 'Added' not in index_render
+    assert 'index-draft-feature' in index_render
+    assert not (docs_path / 'index-draft-removal.rst').exists()
+    assert (docs_path / 'index-draft-bugfix.rst').read_text(
+        encoding=UTF8_ENCODING,
+    ).endswith(
+        '.. towncrier-draft-entries:: |release|\n'
+        '   :types: bugfix\n',
+    )
+    feature_render = (
+        towncrier_project_path / 'sharded' / 'index-draft-feature.pseudoxml'
+    ).read_text(encoding=UTF8_ENCODING)
+    assert 'Added' in feature_render
+    assert 'Fixed a bug' not in feature_render
+
+    out_path = towncrier_project_path / 'sharded'
+    sphinx_app = Sphinx(
+        srcdir=docs_path,
+        confdir=docs_path,
+        outdir=out_path,
+        doctreedir=out_path / '.doctrees',
+        buildername='pseudoxml',
+        confoverrides={'release': '1.0'},
+        status=None,
+        warning=None,
+    )
+    towncrier_env: Any = sphinx_app.env
+    assert not getattr(towncrier_env, 'towncrier_fragment_docs', set())
+    assert set(towncrier_env.towncrier_fragment_slices) == {
+        'index-draft-bugfix', 'index-draft-feature',
+    }
+
+    fragments_path = towncrier_project_path / 'changelog-fragments'
+    (fragments_path / '3.bugfix.rst').write_text(
+        'Fixed another bug.', encoding=UTF8_ENCODING,
+    )
+    lookup_towncrier_fragment_categories.cache_clear()
+    outdated_docs = (
+        # pylint: disable-next=protected-access
+        TowncrierDraftEntriesEnvironmentCollector._get_outdated_slice_docs(
+            sphinx_app.env,
+        )
+    )
+    assert outdated_docs == {'index-draft-bugfix'}
+
+
+def test_capped_draft_links_whole_draft(
+        monkeypatch: pytest.MonkeyPatch,
+        towncrier_project_path: Path,
+) -> None:
+    """Check that only the newest change notes are embedded."""
+    monkeypatch.setenv('SOURCE_DATE_EPOCH', '0')
+    docs_path = towncrier_project_path / 'docs'
+    (docs_path / 'index.rst').write_text(
+        'Changelog\n=========\n\n'
+        '.. towncrier-draft-entries:: |release|\n'
+        '   :max-entries: 1\n',
+        encoding=UTF8_ENCODING,
+    )
+    newest_path = (
+        towncrier_project_path / 'changelog-fragments' / '2.bugfix.rst'
+    )
+    newest_stat = newest_path.stat()
+    os.utime(
+        newest_path,
+        ns=(newest_stat.st_atime_ns, newest_stat.st_mtime_ns + 10**9),
+    )
+    lookup_towncrier_fragment_contents.cache_clear()
+    index_render = _build_pseudoxml(towncrier_project_path, 'capped')
+
+    assert 'Fixed a bug' in index_render
+    assert 'Added' not in index_render
+    assert 'The 1 most recent of the 3 unreleased changes' in index_render
+    assert 'index-draft-all' in index_render
+    whole_draft_render = (
+        towncrier_project_path / 'capped' / 'index-draft-all.pseudoxml'
+    ).read_text(encoding=UTF8_ENCODING)
+    assert 'Fixed a bug' in whole_draft_render
+    assert 'Added' in whole_draft_render
+
+
+@pytest.mark.filterwarnings(
+    r'ignore:.*use of fork\(\) may lead to deadlocks:DeprecationWarning',
+)
+def test_parallel_incremental_build_keeps_stamps_current(
+        towncrier_project_path: Path,
+) -> None:
+    """Check that readers without drafts don't bring back old stamps.
+
+    Only the reader showing the draft records the change notes as of
+    the current build. The other ones still carry the stamps from
+    before they were forked, which must not win when merged last.
+    """
+    docs_path = towncrier_project_path / 'docs'
+    plain_doc_paths = [
+        docs_path / f'plain-{doc_number:02d}.rst'
+        for doc_number in range(SCALING_DOC_COUNT)
+    ]
+    (docs_path / 'changelog.rst').write_text(
+        'Changelog\n=========\n\n.. towncrier-draft-entries:: |release|\n',
+        encoding=UTF8_ENCODING,
+    )
+    (docs_path / 'index.rst').write_text(
+        'Docs\n====\n\n.. toctree::\n   :glob:\n\n   *\n',
+        encoding=UTF8_ENCODING,
+    )
+
+    def _build_in_parallel(plain_doc_text: str) -> List[str]:
+        for plain_doc_path in plain_doc_paths:
+            plain_doc_source = (
+                f'{plain_doc_path.stem!s}\n========\n\n{plain_doc_text!s}\n'
+            )
+            if not plain_doc_path.is_file() or plain_doc_path.read_text(
+                    encoding=UTF8_ENCODING,
+            ) != plain_doc_source:
+                plain_doc_path.write_text(
+                    plain_doc_source, encoding=UTF8_ENCODING,
+                )
+        lookup_towncrier_fragment_contents.cache_clear()
+        out_path = towncrier_project_path / 'parallel-incremental'
+        sphinx_app = Sphinx(
+            srcdir=docs_path,
+            confdir=docs_path,
+            outdir=out_path,
+            doctreedir=out_path / '.doctrees',
+            buildername='pseudoxml',
+            confoverrides={
+                'release': '1.0',
+                'towncrier_draft_output_mode': 'structured',
+            },
+            status=None,
+            warning=None,
+            parallel=4,
+        )
+        read_docnames: List[str] = []
+        sphinx_app.connect(
+            'env-before-read-docs',
+            lambda _app, _env, docnames: read_docnames.extend(docnames),
+        )
+        sphinx_app.build()
+        return read_docnames
+
+    assert 'changelog' in _build_in_parallel('First.')
+
+    fragments_path = towncrier_project_path / 'changelog-fragments'
+    (fragments_path / '3.feature.rst').write_text(
+        'Added another feature.', encoding=UTF8_ENCODING,
+    )
+    assert 'changelog' in _build_in_parallel('Second.')
+    assert 'Added another feature.' in (
+        towncrier_project_path / 'parallel-incremental' / 'changelog.pseudoxml'
+    ).read_text(encoding=UTF8_ENCODING)
+
+    assert not _build_in_parallel('Second.')
+
+
+@pytest.mark.filterwarnings(
+    r'ignore:.*use of fork\(\) may lead to deadlocks:DeprecationWarning',
+)
+@pytest.mark.parametrize('parallel_jobs', (1, 2, 4, 8, 16))
+@pytest.mark.parametrize(
+    ('output_mode', 'expected_renders', 'max_fragment_scans'),
+    (
+        ('rst', len(SCALING_DRAFT_VERSIONS), 2),
+        ('structured', 0, 1),
+    ),
+)
+def test_parallel_build_scaling(  # noqa: WPS211, WPS210
+        output_mode: str,
+        expected_renders: int,
+        max_fragment_scans: int,
+        parallel_jobs: int,
+        record_property: Callable[[str, object], None],
+        towncrier_project_path: Path,
+) -> None:
+    """Check that the parallel readers don't redo the shared work.
+
+    Every distinct draft is rendered once regardless of the number of
+    readers and the change notes are only listed for the kinds of
+    lookups the documents need. Whatever the readers record in their
+    envs has to be merged back into the one of the main process.
+    """
+    docs_path = towncrier_project_path / 'docs'
+    sliced_docnames = set()
+    fragment_docnames = set()
+    for doc_number in range(SCALING_DOC_COUNT):
+        docname = f'draft-{doc_number:02d}'
+        directive_options = ''
+        if doc_number % 4 == 0:
+            directive_options = '   :types: feature, misc\n'
+            sliced_docnames.add(docname)
+        else:
+            fragment_docnames.add(docname)
+        (docs_path / f'{docname!s}.rst').write_text(
+            f'Draft {doc_number:d}\n==========\n\n'
+            '.. towncrier-draft-entries:: '
+            f'{SCALING_DRAFT_VERSIONS[doc_number % 3]!s}\n'
+            + directive_options,
+            encoding=UTF8_ENCODING,
+        )
+    (docs_path / 'index.rst').write_text(
+        'Changelog\n=========\n\n.. toctree::\n   :glob:\n\n   draft-*\n',
+        encoding=UTF8_ENCODING,
+    )
+
+    out_path = towncrier_project_path / f'scaling-j{parallel_jobs:d}'
+    sphinx_app = Sphinx(
+        srcdir=docs_path,
+        confdir=docs_path,
+        outdir=out_path,
+        doctreedir=out_path / '.doctrees',
+        buildername='pseudoxml',
+        confoverrides={'towncrier_draft_output_mode': output_mode},
+        status=None,
+        warning=None,
+        freshenv=True,
+        parallel=parallel_jobs,
+    )
+    started_at = time.monotonic()
+    sphinx_app.build()
+    record_property('wall_time', time.monotonic() - started_at)
+
+    work_counts = get_towncrier_work_counts(sphinx_app.env)
+    record_property('work_counts', work_counts)
+    assert work_counts.get(TOWNCRIER_RENDERS_COUNTER, 0) == expected_renders
+    assert 1 <= work_counts[FRAGMENT_SCANS_COUNTER] <= max_fragment_scans
+    towncrier_env: Any = sphinx_app.env
+    if parallel_jobs > 1:
+        # The forked readers have passed their counts on
+        assert len(towncrier_env.towncrier_work_counts) > 1
+
+    assert towncrier_env.towncrier_fragment_docs == fragment_docnames
+    assert set(towncrier_env.towncrier_fragment_slices) == sliced_docnames
+    assert len(towncrier_env.towncrier_fragment_stamps) == 3
+    for docname in ('draft-00', 'draft-01'):
+        assert 'Added' in (out_path / f'{docname!s}.pseudoxml').read_text(
+            encoding=UTF8_ENCODING,
+        )